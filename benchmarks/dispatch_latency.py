@@ -0,0 +1,236 @@
+"""Dispatch round-trip time against background location volume
+
+Starts the hub on its own (``control_room/hub_server.py``) and runs:
+
+- flood processes publishing ``location`` updates as fast as the hub
+  accepts them, from ``--flooders`` connections per process,
+- a responder process with ``--responders`` ERT-like clients that answer
+  ``incident`` requests and publish their own locations meanwhile,
+- a Control Room-like client (in this process) subscribed to
+  ``location`` that sends an ``incident`` request every ``--interval``
+  seconds and records the time until all responders answered.
+
+Stages add flood processes one by one (``--stages``), so the dispatch
+round trip can be read against the location rate. With priority lanes
+(``communication/priority.py``) it should stay flat; ``--fifo`` puts every
+topic in one lane for comparison.
+
+Usage:
+    python benchmarks/dispatch_latency.py --stages 0 1 2 4 --duration 10
+    python benchmarks/dispatch_latency.py --stages 0 2 4 --fifo
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+HUB_URL = "ws://127.0.0.1:8765"
+# Starts the hub, optionally with a single lane for everything (must run before the hub is imported)
+HUB_BOOTSTRAP = (
+    "import sys, runpy; sys.path.insert(0, {root!r}); sys.path.insert(0, {benchmarks!r});"
+    "{fifo}"
+    "runpy.run_path({hub!r}, run_name='__main__')"
+)
+
+
+def single_lane():
+    """
+    Send every frame through the normal lane: plain FIFO, as without priorities
+
+    Call before the communication modules are imported; they bind the
+    priority constants at import.
+    """
+    from communication import priority
+    priority.TOPIC_PRIORITIES.clear()
+    priority.PRIORITY_CRITICAL = priority.PRIORITY_BULK = priority.PRIORITY_NORMAL
+
+
+def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Hub did not open port {port}")
+
+
+def _location(ert_id: str, n: int) -> dict:
+    return {"ert_id": ert_id, "x": float(n % 1000), "y": float(n // 1000 % 1000), "sent_at": time.time()}
+
+
+# ---------------- Client processes ----------------
+
+def _flood_process(index: int, connections: int, stop_at: float, fifo: bool, results):
+    if fifo:
+        single_lane()
+    from communication.websocket_communication import WebSocketCommunication
+
+    async def flood(ert_id: str) -> int:
+        comms = WebSocketCommunication(reconnect=False)
+        await comms.connect(HUB_URL, client_type="ert", client_id=ert_id)
+        sent = 0
+        while time.time() < stop_at:
+            await comms.publish("location", _location(ert_id, sent))
+            sent += 1
+            if sent % 50 == 0:
+                await asyncio.sleep(0)  # let the outbox writer run
+        await comms.disconnect()
+        return sent
+
+    async def run():
+        return sum(await asyncio.gather(*(flood(f"FLOOD-{index}-{i}") for i in range(connections))))
+    results.put(("flood", asyncio.run(run())))
+
+
+def _responder_process(count: int, stop_at: float, location_interval: float, fifo: bool, results):
+    if fifo:
+        single_lane()
+    from communication.websocket_communication import WebSocketCommunication
+
+    async def responder(ert_id: str) -> int:
+        comms = WebSocketCommunication(reconnect=False)
+        await comms.connect(HUB_URL, client_type="ert", client_id=ert_id)
+        answered = 0
+
+        async def on_incident(data):
+            nonlocal answered
+            answered += 1
+            return {"ert_id": ert_id, "incident_id": data["id"], "status": "acknowledged"}
+
+        await comms.subscribe("incident", on_incident)
+        n = 0
+        while time.time() < stop_at:
+            await comms.publish("location", _location(ert_id, n))
+            n += 1
+            await asyncio.sleep(location_interval)
+        await comms.disconnect()
+        return answered
+
+    async def run():
+        return sum(await asyncio.gather(*(responder(f"ERT-{i:03d}") for i in range(count))))
+    results.put(("responder", asyncio.run(run())))
+
+
+# ---------------- Stages ----------------
+
+async def _dispatch_loop(args, start_at: float, stop_at: float) -> dict:
+    from communication.websocket_communication import WebSocketCommunication
+    comms = WebSocketCommunication(reconnect=False)
+    await comms.connect(HUB_URL, client_type="cr", client_id="control_room")
+    locations = 0
+
+    async def on_location(data):
+        nonlocal locations
+        locations += 1
+
+    comms.configure_topic("location", concurrency=4, key="ert_id", max_queue=5000, drop_oldest=True)
+    await comms.subscribe("location", on_location)
+    await asyncio.sleep(max(0.0, start_at - time.time()))
+
+    rtts = []
+    incomplete = 0
+    n = 0
+    counted_from = locations
+    while time.time() < stop_at:
+        n += 1
+        started = time.perf_counter()
+        responses = await comms.request(
+            "incident", {"id": f"INC-{n}", "x": 1.0, "y": 2.0, "status": "dispatched"},
+            timeout=args.timeout, expected=args.responders
+        )
+        if len(responses) < args.responders:
+            incomplete += 1
+        else:
+            rtts.append(time.perf_counter() - started)
+        await asyncio.sleep(args.interval)
+    locations_received = locations - counted_from
+    await comms.disconnect()
+    rtts.sort()
+    return {
+        "dispatches": n,
+        "incomplete": incomplete,
+        "rtt_p50_ms": round(rtts[len(rtts) // 2] * 1000, 2) if rtts else None,
+        "rtt_p99_ms": round(rtts[int(len(rtts) * 0.99)] * 1000, 2) if rtts else None,
+        "rtt_max_ms": round(rtts[-1] * 1000, 2) if rtts else None,
+        "locations_received_per_second": round(locations_received / args.duration, 1),
+    }
+
+
+def run_stage(flooders: int, args) -> dict:
+    env = dict(os.environ, LOG_LEVEL="WARNING")
+    hub_path = REPO_ROOT / "control_room" / "hub_server.py"
+    bootstrap = HUB_BOOTSTRAP.format(
+        root=str(REPO_ROOT), benchmarks=str(REPO_ROOT / "benchmarks"), hub=str(hub_path),
+        fifo="from dispatch_latency import single_lane; single_lane();" if args.fifo else ""
+    )
+    hub = subprocess.Popen([sys.executable, "-c", bootstrap], env=env)
+    try:
+        wait_for_port(8765)
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        start_at = time.time() + args.warmup
+        stop_at = start_at + args.duration
+        processes = [context.Process(
+            target=_responder_process,
+            args=(args.responders, stop_at + 1.0, args.responder_interval, args.fifo, results)
+        )]
+        for index in range(flooders):
+            processes.append(context.Process(
+                target=_flood_process, args=(index, args.connections, stop_at, args.fifo, results)
+            ))
+        for process in processes:
+            process.start()
+        stage = asyncio.run(_dispatch_loop(args, start_at, stop_at))
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    finally:
+        hub.terminate()
+        hub.wait()
+
+    flooded = sum(count for role, count in outcomes if role == "flood")
+    return {
+        "flood_processes": flooders,
+        "fifo": args.fifo,
+        "locations_sent_per_second": round(flooded / args.duration, 1),
+        **stage,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure dispatch round trips under location load")
+    parser.add_argument("--stages", type=int, nargs="+", default=[0, 1, 2, 4], help="Flood processes per stage")
+    parser.add_argument("--connections", type=int, default=8, help="Flooding connections per process")
+    parser.add_argument("--responders", type=int, default=5)
+    parser.add_argument("--responder-interval", type=float, default=0.01,
+                        help="Seconds between a responder's own location updates")
+    parser.add_argument("--interval", type=float, default=0.2, help="Seconds between dispatches")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Seconds to wait for all responders")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--fifo", action="store_true", help="One lane for all topics (no priorities)")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+    if args.fifo:
+        single_lane()
+
+    stages = []
+    for flood_processes in args.stages:
+        stage = run_stage(flood_processes, args)
+        print(json.dumps(stage))
+        stages.append(stage)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(stages, f, indent=2)
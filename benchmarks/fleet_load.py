@@ -0,0 +1,328 @@
+"""Fleet load generator and end-to-end benchmark
+
+Starts the Control Room (which runs the hub in-process), connects N
+simulated ERT units (``ert/simulator.py``), and for a fixed
+duration:
+
+- every unit publishes its GPS position at ``--gps-rate`` Hz,
+- incidents are created and dispatched through the REST API at
+  ``--incident-rate`` per second; units acknowledge and send a resolution
+  ``--resolve-after`` seconds later.
+
+Reported per fleet size:
+
+- location throughput (sent vs. processed by the Control Room),
+- p50/p99 location-to-repository latency, from the Control Room's
+  ``cr_location_latency_seconds`` histogram,
+- p50/p99 dispatch-to-ack latency (the RTT of the dispatch request) and
+  the HTTP time of the dispatch call,
+- CPU and peak RSS of the Control Room process (hub + API + CR client).
+
+Usage:
+    python benchmarks/fleet_load.py --units 50 200 800 --duration 20
+    python benchmarks/fleet_load.py --units 100 --json results.json
+
+Everything runs on localhost; several fleet sizes run one after another,
+each against a fresh Control Room process, to find where it falls over.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from ert.simulator import Simulator
+
+API_URL = "http://127.0.0.1:5001"
+HUB_URL = "ws://127.0.0.1:8765"
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+# ---------------- HTTP helpers ----------------
+
+def http_json(method: str, url: str, body: Optional[dict] = None, timeout: float = 30.0) -> Tuple[int, dict]:
+    """Send a JSON request; returns (status, decoded body)"""
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read() or b"{}")
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+
+
+def scrape_metrics(api_url: str) -> str:
+    with urllib.request.urlopen(f"{api_url}/metrics", timeout=10) as resp:
+        return resp.read().decode()
+
+
+def parse_histogram(text: str, name: str, label_filter: str = "") -> Tuple[List[Tuple[float, float]], float]:
+    """
+    Extract cumulative buckets of one histogram series from Prometheus text
+
+    Returns:
+        ([(upper bound, cumulative count)], total count)
+    """
+    buckets = []
+    count = 0.0
+    for line in text.splitlines():
+        if line.startswith(f"{name}_bucket") and label_filter in line:
+            le = line.split('le="', 1)[1].split('"', 1)[0]
+            bound = float("inf") if le == "+Inf" else float(le)
+            buckets.append((bound, float(line.rsplit(" ", 1)[1])))
+        elif line.startswith(f"{name}_count") and label_filter in line:
+            count = float(line.rsplit(" ", 1)[1])
+    return sorted(buckets), count
+
+
+def histogram_delta(before, after) -> List[Tuple[float, float]]:
+    previous = dict(before[0])
+    return [(bound, value - previous.get(bound, 0.0)) for bound, value in after[0]]
+
+
+def bucket_quantile(buckets: List[Tuple[float, float]], q: float) -> Optional[float]:
+    """Quantile from cumulative buckets, interpolating linearly inside a bucket"""
+    if not buckets or buckets[-1][1] <= 0:
+        return None
+    target = q * buckets[-1][1]
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, cumulative in buckets:
+        if cumulative >= target:
+            if bound == float("inf"):
+                return lower_bound
+            in_bucket = cumulative - lower_count
+            fraction = (target - lower_count) / in_bucket if in_bucket else 1.0
+            return lower_bound + (bound - lower_bound) * fraction
+        lower_bound, lower_count = bound, cumulative
+    return lower_bound
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# ---------------- Process sampling ----------------
+
+class ProcessSampler:
+    """Samples CPU time and RSS of a process from /proc"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.peak_rss_mb = 0.0
+
+    def cpu_seconds(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        # utime and stime are fields 14 and 15 (1-based); fields[0] is field 3
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+    def rss_mb(self) -> float:
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) / 1024
+                    self.peak_rss_mb = max(self.peak_rss_mb, rss)
+                    return rss
+        return 0.0
+
+
+# ---------------- Incidents ----------------
+
+async def drive_incidents(api_url: str, rate: float, stop_at: float, stats: dict):
+    """Create and dispatch incidents through the REST API"""
+    loop = asyncio.get_running_loop()
+    interval = 1.0 / rate
+    while loop.time() < stop_at:
+        started = loop.time()
+        status, body = await asyncio.to_thread(
+            http_json, "POST", f"{api_url}/cr/incidents", {"x": random.uniform(0, 1000), "y": random.uniform(0, 1000)}
+        )
+        if status != 201:
+            stats["errors"] += 1
+        else:
+            dispatch_started = time.perf_counter()
+            status, body = await asyncio.to_thread(
+                http_json, "POST", f"{api_url}/cr/incidents/dispatch", {"incident_id": body["id"]}
+            )
+            stats["dispatch_http_ms"].append((time.perf_counter() - dispatch_started) * 1000)
+            if status == 200:
+                stats["dispatched"] += 1
+                stats["ack_rtt_ms"].extend(a["rtt_ms"] for a in body.get("acknowledged_by", []))
+            else:
+                stats["errors"] += 1
+        await asyncio.sleep(max(0.0, interval - (loop.time() - started)))
+
+
+# ---------------- Control Room process ----------------
+
+def start_control_room(api_url: str, log_path: Path) -> subprocess.Popen:
+    env = dict(os.environ, LOG_LEVEL="WARNING")
+    log = open(log_path, "w")
+    proc = subprocess.Popen(
+        [sys.executable, str(REPO_ROOT / "control_room" / "cr_main.py")],
+        cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Control Room exited early; see {log_path}")
+        try:
+            if http_json("GET", f"{api_url}/health", timeout=1)[0] == 200:
+                # The CR client subscribes right after the API comes up
+                time.sleep(1.0)
+                return proc
+        except OSError:
+            pass
+        time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"Control Room did not become healthy; see {log_path}")
+
+
+def stop_control_room(proc: subprocess.Popen):
+    proc.terminate()
+    try:
+        proc.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+# ---------------- One stage ----------------
+
+async def run_stage(args, units: int, pid: Optional[int]) -> Dict[str, object]:
+    stats = {"dispatched": 0, "errors": 0, "ack_rtt_ms": [], "dispatch_http_ms": []}
+    simulator = Simulator(
+        units, seed=args.seed, id_prefix="LOAD", hub_url=args.hub_url, resolve_after=args.resolve_after
+    )
+
+    connect_started = time.perf_counter()
+    await simulator.start()
+    connect_seconds = time.perf_counter() - connect_started
+
+    sampler = ProcessSampler(pid) if pid else None
+    before = await asyncio.to_thread(scrape_metrics, args.api_url)
+    cpu_before = sampler.cpu_seconds() if sampler else 0.0
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    stop_at = started + args.duration
+    tasks = [asyncio.create_task(simulator.run(1.0 / args.gps_rate, args.duration))]
+    if args.incident_rate > 0:
+        tasks.append(asyncio.create_task(drive_incidents(args.api_url, args.incident_rate, stop_at, stats)))
+
+    while loop.time() < stop_at:
+        if sampler:
+            sampler.rss_mb()
+        await asyncio.sleep(0.5)
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - started
+    cpu_used = (sampler.cpu_seconds() - cpu_before) if sampler else None
+
+    # Let queued updates drain before the final scrape
+    await asyncio.sleep(args.drain)
+    after = await asyncio.to_thread(scrape_metrics, args.api_url)
+
+    await simulator.stop()
+    fleet = simulator.summary()
+
+    latency_name = "cr_location_latency_seconds"
+    latency = histogram_delta(parse_histogram(before, latency_name), parse_histogram(after, latency_name))
+    processed = parse_histogram(after, latency_name)[1] - parse_histogram(before, latency_name)[1]
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    def rounded(value):
+        return round(value, 2) if value is not None else None
+
+    return {
+        "units": units,
+        "duration_s": round(elapsed, 2),
+        "connect_s": round(connect_seconds, 2),
+        "locations_sent_per_s": round(fleet["locations_sent"] / elapsed, 1),
+        "locations_processed_per_s": round(processed / (elapsed + args.drain), 1),
+        "locations_lost": int(fleet["locations_sent"] - processed),
+        "gps_ticks_late": fleet["late_ticks"],
+        "location_p50_ms": ms(bucket_quantile(latency, 0.50)),
+        "location_p99_ms": ms(bucket_quantile(latency, 0.99)),
+        "dispatched": stats["dispatched"],
+        "ack_p50_ms": rounded(percentile(stats["ack_rtt_ms"], 0.50)),
+        "ack_p99_ms": rounded(percentile(stats["ack_rtt_ms"], 0.99)),
+        "dispatch_http_p50_ms": rounded(percentile(stats["dispatch_http_ms"], 0.50)),
+        "dispatch_http_p99_ms": rounded(percentile(stats["dispatch_http_ms"], 0.99)),
+        "resolutions_sent": fleet["resolutions_sent"],
+        "errors": stats["errors"],
+        "cr_cpu_percent": round(100 * cpu_used / elapsed, 1) if cpu_used is not None else None,
+        "cr_peak_rss_mb": round(sampler.peak_rss_mb, 1) if sampler else None,
+    }
+
+
+def print_table(results: List[Dict[str, object]]):
+    columns = [
+        ("units", "units"), ("locations_sent_per_s", "sent/s"), ("locations_processed_per_s", "done/s"),
+        ("locations_lost", "lost"), ("location_p50_ms", "loc p50"), ("location_p99_ms", "loc p99"),
+        ("dispatched", "disp"), ("ack_p50_ms", "ack p50"), ("ack_p99_ms", "ack p99"),
+        ("dispatch_http_p99_ms", "http p99"), ("cr_cpu_percent", "cpu %"), ("cr_peak_rss_mb", "rss MB"),
+    ]
+    widths = [max(len(title), 8) for _, title in columns]
+    print("  ".join(title.rjust(w) for (_, title), w in zip(columns, widths)))
+    for row in results:
+        print("  ".join(str(row[key] if row[key] is not None else "-").rjust(w) for (key, _), w in zip(columns, widths)))
+    print("latencies in ms; cpu/rss are for the Control Room process (hub + API + CR client)")
+
+
+async def main_async(args) -> List[Dict[str, object]]:
+    results = []
+    for units in args.units:
+        proc = None
+        if not args.external:
+            proc = start_control_room(args.api_url, Path(args.log))
+        try:
+            print(f"Running {units} units for {args.duration}s ...", file=sys.stderr)
+            results.append(await run_stage(args, units, proc.pid if proc else args.pid))
+        finally:
+            if proc:
+                stop_control_room(proc)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end fleet load test for the Control Room and hub")
+    parser.add_argument("--units", type=int, nargs="+", default=[50], help="Fleet sizes to run, one stage each")
+    parser.add_argument("--duration", type=float, default=15.0, help="Measured seconds per stage")
+    parser.add_argument("--gps-rate", type=float, default=1.0, help="Location updates per unit per second")
+    parser.add_argument("--incident-rate", type=float, default=0.5, help="Incidents created and dispatched per second")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the simulated fleet")
+    parser.add_argument("--resolve-after", type=float, default=2.0, help="Seconds between ack and resolution")
+    parser.add_argument("--drain", type=float, default=2.0, help="Seconds to wait for queues to drain after a stage")
+    parser.add_argument("--api-url", default=API_URL)
+    parser.add_argument("--hub-url", default=HUB_URL)
+    parser.add_argument("--external", action="store_true", help="Use an already running Control Room")
+    parser.add_argument("--pid", type=int, help="PID of the external Control Room, for CPU/RSS sampling")
+    parser.add_argument("--log", default="fleet_load_cr.log", help="Control Room output file")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Hub message throughput against the number of hub shards
+
+Starts the hub on its own (``control_room/hub_server.py``) with
+``HUB_SHARDS=N``, connects subscriber and publisher clients from several
+client processes, and lets the publishers publish as fast as the hub
+accepts for a fixed duration. Connections land on shards as the kernel
+spreads them, so most publishes cross a shard boundary.
+
+Reported per shard count:
+
+- publishes/s sent and deliveries/s received by all subscribers (the
+  hub's real throughput; sends only measure the socket buffers),
+- ordering: every subscriber must see each of its topics' sequence
+  numbers without gaps or reordering.
+
+With ``--batch N`` publishers send ``publish_batch`` frames of N messages
+and subscribers receive them as ``batch`` frames, to measure batching.
+
+Usage:
+    python benchmarks/hub_scaling.py --shards 1 2 4 --duration 10
+    python benchmarks/hub_scaling.py --shards 1 --batch 10
+
+Exits with status 1 if a subscriber saw a gap or out-of-order frame.
+Run it on a machine with at least as many cores as shards plus client
+processes; on fewer cores the clients and shards compete for the CPU.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import websockets
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+HUB_URL = "ws://127.0.0.1:8765"
+
+
+def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Hub did not open port {port}")
+
+
+# ---------------- Client processes ----------------
+
+async def _subscribe(index: int, topics: list, stop_at: float) -> dict:
+    connection = await websockets.connect(HUB_URL, max_queue=None)
+    await connection.send(json.dumps({"type": "register", "client_type": "bench", "client_id": f"sub-{index}"}))
+    for topic in topics:
+        await connection.send(json.dumps({"type": "subscribe", "topic": topic}))
+    received = violations = 0
+    last_seq = {}
+    try:
+        while True:
+            timeout = stop_at - time.time()
+            if timeout <= 0:
+                break
+            frame = json.loads(await asyncio.wait_for(connection.recv(), timeout))
+            for message in frame["frames"] if frame.get("type") == "batch" else (frame,):
+                if "seq" not in message:
+                    continue  # "subscribed" replies
+                received += 1
+                topic, seq = message["topic"], message["seq"]
+                if topic in last_seq and seq != last_seq[topic] + 1:
+                    violations += 1
+                last_seq[topic] = seq
+    except asyncio.TimeoutError:
+        pass
+    await connection.close()
+    return {"received": received, "violations": violations}
+
+
+async def _publish(index: int, topics: list, start_at: float, stop_at: float, payload_size: int,
+                   batch: int) -> dict:
+    connection = await websockets.connect(HUB_URL)
+    await connection.send(json.dumps({"type": "register", "client_type": "bench", "client_id": f"pub-{index}"}))
+    await asyncio.sleep(max(0.0, start_at - time.time()))
+    padding = "x" * payload_size
+    sent = 0
+    while time.time() < stop_at:
+        for topic in topics:
+            if batch > 1:
+                await connection.send(json.dumps({"type": "publish_batch", "messages": [
+                    {"topic": topic, "payload": {"n": sent + i, "pad": padding}} for i in range(batch)
+                ]}))
+                sent += batch
+                continue
+            await connection.send(json.dumps({
+                "type": "publish", "topic": topic, "payload": {"n": sent, "pad": padding}
+            }))
+            sent += 1
+    await connection.close()
+    return {"sent": sent}
+
+
+def _client_process(role: str, indexes: list, topics_for: dict, start_at: float, stop_at: float,
+                    payload_size: int, batch: int, results):
+    async def run():
+        if role == "sub":
+            # Keep reading a little longer so frames still in flight are counted
+            tasks = [_subscribe(i, topics_for[i], stop_at + 2.0) for i in indexes]
+        else:
+            tasks = [_publish(i, topics_for[i], start_at, stop_at, payload_size, batch) for i in indexes]
+        return await asyncio.gather(*tasks)
+    results.put((role, asyncio.run(run())))
+
+
+# ---------------- Stages ----------------
+
+def run_stage(shards: int, args) -> dict:
+    env = dict(os.environ, HUB_SHARDS=str(shards), LOG_LEVEL="WARNING")
+    hub = subprocess.Popen([sys.executable, str(REPO_ROOT / "control_room" / "hub_server.py")], env=env)
+    try:
+        wait_for_port(8765)
+        time.sleep(1.0 + 0.5 * shards)  # every shard linked and listening
+
+        topics = [f"bench-{i}" for i in range(args.topics)]
+        sub_topics = {i: [topics[i % len(topics)]] for i in range(args.subscribers)}
+        pub_topics = {i: [topics[i % len(topics)]] for i in range(args.publishers)}
+
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        start_at = time.time() + args.warmup
+        stop_at = start_at + args.duration
+        processes = []
+        for role, count, topics_for in (("sub", args.subscribers, sub_topics), ("pub", args.publishers, pub_topics)):
+            for p in range(args.client_processes):
+                indexes = list(range(p, count, args.client_processes))
+                if indexes:
+                    processes.append(context.Process(
+                        target=_client_process,
+                        args=(role, indexes, topics_for, start_at, stop_at, args.payload_size, args.batch,
+                              results)
+                    ))
+        for process in processes:
+            process.start()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    finally:
+        hub.terminate()
+        hub.wait()
+
+    subscribers = [r for role, batch in outcomes if role == "sub" for r in batch]
+    publishers = [r for role, batch in outcomes if role == "pub" for r in batch]
+    return {
+        "shards": shards,
+        "batch": args.batch,
+        "publishes_sent_per_second": round(sum(p["sent"] for p in publishers) / args.duration, 1),
+        "deliveries_per_second": round(sum(s["received"] for s in subscribers) / args.duration, 1),
+        "order_violations": sum(s["violations"] for s in subscribers),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure hub throughput against the number of shards")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--topics", type=int, default=16)
+    parser.add_argument("--publishers", type=int, default=32)
+    parser.add_argument("--subscribers", type=int, default=64)
+    parser.add_argument("--client-processes", type=int, default=2, help="Processes per role running the clients")
+    parser.add_argument("--payload-size", type=int, default=100, help="Bytes of padding per payload")
+    parser.add_argument("--batch", type=int, default=1, help="Messages per publish_batch frame (1: plain publishes)")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds for the clients to connect")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    stages = []
+    for shard_count in args.shards:
+        stage = run_stage(shard_count, args)
+        print(json.dumps(stage))
+        stages.append(stage)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(stages, f, indent=2)
+    sys.exit(1 if any(stage["order_violations"] for stage in stages) else 0)
@@ -0,0 +1,460 @@
+"""Microbenchmarks for the Control Room's inner loops
+
+Covers repository CRUD and ``get_all`` at several sizes, the WebSocket
+message handlers, model serialization and the hub's envelope handling.
+Each case is timed over several rounds and the best round is kept, which
+is the most stable figure on a noisy machine.
+
+Usage:
+    python benchmarks/micro.py --output results.json
+    python benchmarks/micro.py --baseline baseline.json --threshold 0.25
+    python benchmarks/micro.py --filter repo.unit --sizes 1000 10000
+
+With ``--baseline`` every case is compared against the stored results and
+the exit status is 1 when any case got slower than the threshold allows,
+so the suite can gate CI.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from control_room.model.incident import Incident, IncidentStatus
+from control_room.model.unit import Unit, UnitStatus
+from control_room.repository.in_memory_incident_repository import InMemoryIncidentRepository
+from control_room.repository.in_memory_unit_repository import InMemoryUnitRepository
+from control_room.service.incident_service import IncidentService
+from control_room.service.unit_service import UnitService
+from control_room.service.candidate_service import CandidateService
+from control_room.service.assignment_service import AssignmentService
+from control_room.service.geofence_service import GeofenceEngine
+from communication.handlers import WebSocketHandlers
+from communication import serialization
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+# Builds the fixture for one entity count and returns the function to time
+Case = Callable[[int], Callable[[], object]]
+
+
+class Suite:
+    """Registry of benchmark cases and the runner that times them"""
+
+    def __init__(self):
+        self.cases: List[tuple] = []
+
+    def case(self, name: str, sized: bool = True, ops: int = 1):
+        """Register a case; sized cases run once per entity count"""
+        def decorator(setup: Case):
+            self.cases.append((name, setup, sized, ops))
+            return setup
+        return decorator
+
+    def run(self, sizes, name_filter: Optional[str], rounds: int, min_time: float) -> Dict[str, dict]:
+        results = {}
+        for name, setup, sized, ops in self.cases:
+            for size in (sizes if sized else (None,)):
+                full_name = f"{name}[{size}]" if size is not None else name
+                if name_filter and name_filter not in full_name:
+                    continue
+                fn = setup(size)
+                results[full_name] = measure(fn, ops, rounds, min_time)
+                print(f"{full_name:45s} {format_ns(results[full_name]['ns_per_op']):>12s}", file=sys.stderr)
+        return results
+
+
+def measure(fn: Callable[[], object], ops: int, rounds: int, min_time: float) -> dict:
+    """Time ``fn`` (which performs ``ops`` operations) and keep the best round"""
+    # Calibrate the loop count so one round takes about min_time
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / 4 or loops >= 1 << 20:
+            break
+        loops *= 2
+    loops = max(1, int(loops * (min_time / max(elapsed, 1e-9))))
+
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - started) / (loops * ops))
+    return {"ns_per_op": round(best * 1e9, 1), "ops_per_s": round(1 / best, 1), "loops": loops, "rounds": rounds}
+
+
+def format_ns(ns: float) -> str:
+    if ns >= 1e6:
+        return f"{ns / 1e6:.2f} ms"
+    if ns >= 1e3:
+        return f"{ns / 1e3:.2f} us"
+    return f"{ns:.0f} ns"
+
+
+suite = Suite()
+
+
+# ---------------- Fixtures ----------------
+
+def unit_repository(size: int) -> InMemoryUnitRepository:
+    repo = InMemoryUnitRepository()
+    for i in range(size):
+        repo.create(Unit(id=f"ERT-{i}", x=float(i % 1000), y=float(i // 1000)))
+    return repo
+
+
+def incident_repository(size: int) -> InMemoryIncidentRepository:
+    repo = InMemoryIncidentRepository()
+    for i in range(size):
+        repo.create(Incident(x=float(i % 1000), y=float(i // 1000)))
+    return repo
+
+
+def run_async(handler, payloads: List[dict]) -> Callable[[], None]:
+    """Wrap an async handler so one call awaits it for every payload"""
+    loop = asyncio.new_event_loop()
+
+    async def batch():
+        for payload in payloads:
+            await handler(payload)
+
+    return lambda: loop.run_until_complete(batch())
+
+
+# ---------------- Repositories ----------------
+
+@suite.case("repo.unit.get_by_id", ops=100)
+def _(size):
+    repo = unit_repository(size)
+    ids = [f"ERT-{i}" for i in range(0, size, max(1, size // 100))]
+    return lambda: [repo.get_by_id(i) for i in ids]
+
+
+@suite.case("repo.unit.update")
+def _(size):
+    repo = unit_repository(size)
+    unit = repo.get_by_id("ERT-0")
+    return lambda: repo.update(unit)
+
+
+@suite.case("repo.unit.create_delete")
+def _(size):
+    repo = unit_repository(size)
+    unit = Unit(id="ERT-bench", x=1.0, y=2.0)
+
+    def fn():
+        repo.create(unit)
+        repo.delete(unit.id)
+    return fn
+
+
+@suite.case("repo.unit.get_all")
+def _(size):
+    repo = unit_repository(size)
+    return repo.get_all
+
+
+@suite.case("repo.incident.create_delete")
+def _(size):
+    repo = incident_repository(size)
+
+    def fn():
+        repo.delete(repo.create(Incident(x=1.0, y=2.0)).id)
+    return fn
+
+
+@suite.case("repo.incident.get_by_id", ops=100)
+def _(size):
+    repo = incident_repository(size)
+    ids = [incident.id for incident in repo.get_all()[::max(1, size // 100)]]
+    return lambda: [repo.get_by_id(i) for i in ids]
+
+
+@suite.case("repo.incident.get_all")
+def _(size):
+    repo = incident_repository(size)
+    return repo.get_all
+
+
+# ---------------- Handlers ----------------
+
+def handlers_for(size: int) -> WebSocketHandlers:
+    units = unit_repository(size)
+    incidents = incident_repository(0)
+    return WebSocketHandlers(
+        incident_service=IncidentService(incidents, None),
+        incident_repository=incidents,
+        unit_service=UnitService(units, None)
+    )
+
+
+@suite.case("handler.location", ops=100)
+def _(size):
+    handlers = handlers_for(size)
+    payloads = [{"ert_id": f"ERT-{i % size}", "x": 1.0, "y": 2.0} for i in range(100)]
+    return run_async(handlers.handle_location, payloads)
+
+
+@suite.case("handler.resolution", ops=10)
+def _(size):
+    handlers = handlers_for(size)
+    incident = handlers.incident_repository.create(Incident(x=1.0, y=2.0, status=IncidentStatus.ACKNOWLEDGED))
+    ids = [f"ERT-{i}" for i in range(10)]
+    for ert_id in ids:
+        handlers.unit_service.get_unit_by_id(ert_id).assigned_incident = incident.id
+    run_batch = run_async(handlers.handle_resolution, [{"ert_id": ert_id} for ert_id in ids])
+
+    def fn():
+        # Resolution scans every unit to see whether the incident is done
+        for ert_id in ids:
+            handlers.unit_service.get_unit_by_id(ert_id).status = UnitStatus.ACTIVE
+        run_batch()
+    return fn
+
+
+# ---------------- Candidate ranking ----------------
+
+CANDIDATE_FLEET = 50_000
+
+
+@suite.case("candidates.rank_50k", sized=False)
+def _(size):
+    service = CandidateService(unit_repository(CANDIDATE_FLEET).positions)
+    return lambda: service.rank(512.0, 37.0, limit=10)
+
+
+@suite.case("candidates.python_loop_50k", sized=False)
+def _(size):
+    # The loop over get_all_units() that the vectorized ranking replaces
+    units = UnitService(unit_repository(CANDIDATE_FLEET), None)
+    model = CandidateService(None).speed_model
+
+    def fn():
+        scored = []
+        for unit in units.get_all_units():
+            if unit.status == UnitStatus.UNAVAILABLE:
+                continue
+            distance = ((unit.x - 512.0) ** 2 + (unit.y - 37.0) ** 2) ** 0.5
+            scored.append((distance * model.detour_factor / model.speed + model.turnout_seconds, unit.id))
+        return sorted(scored)[:10]
+    return fn
+
+
+@suite.case("candidates.index_update", sized=False)
+def _(size):
+    repo = unit_repository(CANDIDATE_FLEET)
+    unit = repo.get_by_id("ERT-100")
+    return lambda: repo.positions.upsert(unit)
+
+
+@suite.case("assignment.plan_300x5000", sized=False)
+def _(size):
+    # 300 incidents needing 1-3 units each against 5000 available units
+    rng = random.Random(1)
+    repo = InMemoryUnitRepository()
+    for i in range(5000):
+        repo.create(Unit(id=f"ERT-{i}", x=rng.uniform(0, 1000), y=rng.uniform(0, 1000)))
+    incidents = [
+        Incident(x=rng.uniform(0, 1000), y=rng.uniform(0, 1000), id=f"INC-{i}", required_units=rng.randint(1, 3))
+        for i in range(300)
+    ]
+    service = AssignmentService(repo.positions)
+    return lambda: service.plan(incidents)
+
+
+@suite.case("geofence.update_500_fences", sized=False, ops=1000)
+def _(size):
+    rng = random.Random(2)
+    engine = GeofenceEngine()
+    for i in range(500):
+        engine.add_fence(f"INC-{i}", rng.uniform(0, 1000), rng.uniform(0, 1000))
+    moves = [(f"ERT-{i % 200}", rng.uniform(0, 1000), rng.uniform(0, 1000)) for i in range(1000)]
+
+    def fn():
+        for unit_id, x, y in moves:
+            engine.update(unit_id, x, y)
+    return fn
+
+
+# ---------------- Serialization ----------------
+
+@suite.case("model.incident.to_dict", sized=False)
+def _(size):
+    incident = Incident(x=1.5, y=2.5, id="3f1c", created_at=datetime(2025, 1, 1, 12, 0))
+    return incident.to_dict
+
+
+@suite.case("model.incident.to_json", sized=False)
+def _(size):
+    incident = Incident(x=1.5, y=2.5, id="3f1c", created_at=datetime(2025, 1, 1, 12, 0))
+    return incident.to_json
+
+
+@suite.case("model.incident.to_json_changed", sized=False)
+def _(size):
+    incident = Incident(x=1.5, y=2.5, id="3f1c", created_at=datetime(2025, 1, 1, 12, 0))
+
+    def fn():
+        incident.x = 1.5  # new version every call: the uncached path
+        return incident.to_json()
+    return fn
+
+
+@suite.case("model.unit.to_dict", sized=False)
+def _(size):
+    unit = Unit(id="ERT-1", x=1.5, y=2.5, assigned_incident="3f1c")
+    return unit.to_dict
+
+
+@suite.case("model.unit.to_json", sized=False)
+def _(size):
+    unit = Unit(id="ERT-1", x=1.5, y=2.5, assigned_incident="3f1c")
+    return unit.to_json
+
+
+@suite.case("model.units.to_json", ops=1)
+def _(size):
+    units = unit_repository(min(size, 10_000)).get_all()
+    return lambda: serialization.dumps(units)
+
+
+# ---------------- Hub envelopes ----------------
+
+LOCATION_FRAME = json.dumps({
+    "type": "publish", "topic": "location",
+    "payload": {"ert_id": "ERT-1", "x": 12.5, "y": 40.25, "sent_at": 1700000000.0}
+})
+
+
+@suite.case("hub.parse_publish", sized=False)
+def _(size):
+    def fn():
+        data = json.loads(LOCATION_FRAME)
+        return data.get("type"), data.get("topic"), data.get("payload"), data.get("msg_id")
+    return fn
+
+
+@suite.case("hub.parse_frame_validated", sized=False)
+def _(size):
+    from control_room.hub.schemas import parse_frame
+    return lambda: parse_frame(LOCATION_FRAME)
+
+
+class _NullSocket:
+    """Stands in for a subscriber connection; sending costs nothing"""
+    remote_address = ("127.0.0.1", 0)
+
+    async def send(self, frame):
+        pass
+
+
+def _fanout(publish_all):
+    """100 messages to 10 subscribers, published by publish_all(hub_server, topic, payloads)"""
+    from control_room import hub_server
+    from communication.priority import PriorityOutbox
+    loop = asyncio.new_event_loop()
+    subscribers = {_NullSocket() for _ in range(10)}
+    hub_server.subscriptions["bench"] = subscribers
+
+    async def attach():
+        for subscriber in subscribers:
+            hub_server.outboxes[subscriber] = PriorityOutbox(subscriber.send)
+    loop.run_until_complete(attach())
+    payloads = [json.loads(LOCATION_FRAME)["payload"] for _ in range(100)]
+
+    async def batch():
+        await publish_all(hub_server, "bench", payloads)
+        # Include the outbox writers handing the frames to the sockets
+        while any(len(hub_server.outboxes[subscriber]) for subscriber in subscribers):
+            await asyncio.sleep(0)
+    return lambda: loop.run_until_complete(batch())
+
+
+@suite.case("hub.broadcast_fanout", sized=False, ops=100)
+def _(size):
+    async def publish_all(hub_server, topic, payloads):
+        for payload in payloads:
+            await hub_server.broadcast(None, topic, payload)
+    return _fanout(publish_all)
+
+
+@suite.case("hub.publish_batch_fanout", sized=False, ops=100)
+def _(size):
+    async def publish_all(hub_server, topic, payloads):
+        # Ten publish_batch frames of ten messages each
+        for start in range(0, len(payloads), 10):
+            await hub_server.publish_batch(None, [(topic, payload) for payload in payloads[start:start + 10]])
+    return _fanout(publish_all)
+
+
+# ---------------- Comparison ----------------
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> bool:
+    """Print the change against a baseline; returns True if nothing regressed"""
+    ok = True
+    print(f"{'case':45s} {'baseline':>12s} {'current':>12s} {'change':>8s}")
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:45s} {'-':>12s} {format_ns(current['ns_per_op']):>12s} {'new':>8s}")
+            continue
+        change = current["ns_per_op"] / base["ns_per_op"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{name:45s} {format_ns(base['ns_per_op']):>12s} {format_ns(current['ns_per_op']):>12s} "
+              f"{change * 100:+7.1f}%{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Control Room microbenchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Entity counts")
+    parser.add_argument("--filter", help="Only run cases whose name contains this string")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.1, help="Target seconds per round")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against a results file written by --output")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before failing (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    # Handlers log every acknowledgment/resolution; keep the output to results
+    logging.disable(logging.CRITICAL)
+
+    results = suite.run(args.sizes, args.filter, args.rounds, args.min_time)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        if not compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Read throughput of the multi-process fleet API
+
+Fills a shared-memory fleet table with synthetic units, keeps a writer
+thread publishing changes (as the Control Room does during location
+ingestion), starts the read workers and hammers
+``GET /cr/units/positions`` from several client processes. Run it with
+different ``--workers`` values to see how reads scale with cores.
+
+It also checks the seqlock: during the run, reader processes take
+snapshots directly from the table while the writer moves every unit to
+the same new position on each publish. A snapshot whose units are not
+all at one position is a torn read and fails the run.
+
+Usage:
+    python benchmarks/read_scaling.py --workers 1 2 4 --units 2000 --duration 10
+
+Exits with status 1 if a torn read was seen.
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from control_room.model.unit import Unit
+from control_room.read_workers import start_read_workers
+from control_room.repository.fleet_table import SharedFleetTable
+from control_room.repository.position_index import UnitPositionIndex
+
+
+def _client(url: str, stop_at: float, results):
+    requests = errors = 0
+    while time.time() < stop_at:
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                response.read()
+            requests += 1
+        except Exception:
+            errors += 1
+    results.put((requests, errors))
+
+
+def _checker(table_name: str, stop_at: float, results):
+    table = SharedFleetTable.attach(table_name)
+    reads = torn = 0
+    while time.time() < stop_at:
+        records = table.read().records
+        reads += 1
+        if len(records) and not ((records["x"] == records["x"][0]).all() and (records["y"] == records["x"]).all()):
+            torn += 1
+    table.close()
+    results.put((reads, torn))
+
+
+def _writer(table: SharedFleetTable, index: UnitPositionIndex, units: list, stop: threading.Event, rate: float):
+    step = 0
+    while not stop.wait(1.0 / rate):
+        step += 1
+        for unit in units:
+            unit.x = unit.y = float(step)
+            index.upsert(unit)
+        table.publish(index)
+
+
+def run_stage(workers: int, args) -> dict:
+    index = UnitPositionIndex()
+    units = [Unit(f"ERT-{i:05d}", 0.0, 0.0) for i in range(args.units)]
+    for unit in units:
+        index.upsert(unit)
+    table = SharedFleetTable.create(capacity=max(args.units, 1024))
+    table.publish(index)
+
+    stop = threading.Event()
+    writer = threading.Thread(target=_writer, args=(table, index, units, stop, args.publish_rate), daemon=True)
+    writer.start()
+    processes = start_read_workers(table, workers, port=args.port)
+    time.sleep(args.warmup)
+
+    context = multiprocessing.get_context("spawn")
+    results, checks = context.Queue(), context.Queue()
+    stop_at = time.time() + args.duration
+    url = f"http://127.0.0.1:{args.port}/cr/units/positions"
+    clients = [context.Process(target=_client, args=(url, stop_at, results)) for _ in range(args.clients)]
+    checkers = [context.Process(target=_checker, args=(table.name, stop_at, checks)) for _ in range(args.checkers)]
+    for process in clients + checkers:
+        process.start()
+    totals = [results.get() for _ in clients]
+    consistency = [checks.get() for _ in checkers]
+    for process in clients + checkers:
+        process.join()
+
+    stop.set()
+    writer.join()
+    for process in processes:
+        process.terminate()
+        process.join()
+    table.close()
+
+    return {
+        "workers": workers,
+        "requests_per_second": round(sum(r for r, _ in totals) / args.duration, 1),
+        "errors": sum(e for _, e in totals),
+        "snapshot_reads": sum(r for r, _ in consistency),
+        "torn_reads": sum(t for _, t in consistency),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure fleet read throughput against the number of read workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--units", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=8, help="Client processes issuing requests")
+    parser.add_argument("--checkers", type=int, default=1, help="Processes checking snapshots for torn reads")
+    parser.add_argument("--publish-rate", type=float, default=20.0, help="Table publishes per second")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds for the workers to start")
+    parser.add_argument("--port", type=int, default=5013)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    stages = []
+    for workers in args.workers:
+        stage = run_stage(workers, args)
+        print(json.dumps(stage))
+        stages.append(stage)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(stages, f, indent=2)
+    sys.exit(1 if any(stage["torn_reads"] for stage in stages) else 0)
@@ -0,0 +1,197 @@
+"""Replay recorded hub traffic against a local hub
+
+Reads traffic logs written by the hub with ``HUB_RECORD=<path>`` (one
+file per shard when sharded; pass them all) and re-injects the frames
+into a hub:
+
+- every recorded connection gets its own WebSocket connection, opened
+  when its first frame is due, and sends its frames in the recorded
+  order, so per-client ordering (register, subscribe, publish, ack) is
+  kept,
+- ``--speed 1`` keeps the recorded timing, ``--speed 10`` compresses it
+  tenfold, ``--speed max`` sends as fast as the hub accepts,
+- frames the hub sends back are read and counted, so replayed
+  subscribers do not stall it.
+
+Connections stay open until every frame was sent, plus ``--linger``
+seconds. Frames keep their original message IDs, so recorded acks still
+match the QoS 1 messages they acknowledged.
+
+Reported: frames sent, send rate against the recorded rate, and how late
+frames went out compared with their schedule (the hub falling behind
+shows up here first).
+
+``--summary`` prints what the log contains instead (per topic and per
+client counts, peak frames per second) for post-incident analysis.
+
+Usage:
+    HUB_RECORD=traffic.log python control_room/cr_main.py      # record
+    python benchmarks/replay_traffic.py traffic.log --summary
+    python benchmarks/replay_traffic.py traffic.log --speed 10
+    python benchmarks/replay_traffic.py traffic.log.0 traffic.log.1 --speed max --skip-client control_room
+
+Replaying into a running Control Room, skip its own connection
+(``--skip-client control_room``); otherwise the replayed one takes over
+its registration.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import websockets
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from control_room.hub.recorder import TrafficLog
+
+
+class RecordedConnection:
+    """Frames one client sent over one connection"""
+
+    def __init__(self):
+        self.client_id: Optional[str] = None
+        self.frames: List[Tuple[float, bytes]] = []  # (timestamp, frame)
+
+
+def load(paths: List[str]) -> List[RecordedConnection]:
+    connections: Dict[Tuple[int, int], RecordedConnection] = {}
+    for file_number, path in enumerate(paths):
+        with TrafficLog(path) as log:
+            for record in log:
+                connection = connections.get((file_number, record.connection))
+                if connection is None:
+                    connection = connections[(file_number, record.connection)] = RecordedConnection()
+                if record.client_id and connection.client_id is None:
+                    connection.client_id = record.client_id
+                connection.frames.append((record.timestamp, record.frame))
+    return list(connections.values())
+
+
+def summarize(paths: List[str]) -> dict:
+    frames = 0
+    size = 0
+    by_topic = Counter()
+    by_client = Counter()
+    per_second = Counter()
+    first = last = None
+    for path in paths:
+        with TrafficLog(path) as log:
+            for record in log:
+                frames += 1
+                size += len(record.frame)
+                by_topic[record.topic or "-"] += 1
+                by_client[record.client_id or "(unregistered)"] += 1
+                per_second[int(record.timestamp)] += 1
+                first = record.timestamp if first is None else min(first, record.timestamp)
+                last = record.timestamp if last is None else max(last, record.timestamp)
+    duration = (last - first) if frames else 0.0
+    return {
+        "frames": frames,
+        "bytes": size,
+        "start": first,
+        "duration_seconds": round(duration, 3),
+        "average_frames_per_second": round(frames / duration, 1) if duration else None,
+        "peak_frames_per_second": max(per_second.values()) if per_second else 0,
+        "clients": len(by_client),
+        "by_topic": dict(by_topic.most_common()),
+        "top_clients": dict(by_client.most_common(10)),
+    }
+
+
+async def replay(connections: List[RecordedConnection], hub_url: str, speed: Optional[float],
+                 linger: float) -> dict:
+    loop = asyncio.get_running_loop()
+    first_ts = min(c.frames[0][0] for c in connections)
+    last_ts = max(c.frames[-1][0] for c in connections)
+    started = loop.time()
+    lateness: List[float] = []
+    received = Counter()
+    done = asyncio.Event()
+    remaining = [len(connections)]
+
+    def due(timestamp: float) -> float:
+        return started if speed is None else started + (timestamp - first_ts) / speed
+
+    async def drain(websocket):
+        try:
+            async for _ in websocket:
+                received["frames"] += 1
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def run(connection: RecordedConnection):
+        websocket = None
+        try:
+            await asyncio.sleep(max(0.0, due(connection.frames[0][0]) - loop.time()))
+            websocket = await websockets.connect(hub_url, max_queue=None)
+            reader = asyncio.create_task(drain(websocket))
+            for timestamp, frame in connection.frames:
+                delay = due(timestamp) - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                elif speed is not None:
+                    lateness.append(-delay)
+                await websocket.send(frame, text=True)
+                received["sent"] += 1
+        except (OSError, websockets.exceptions.WebSocketException) as e:
+            received["errors"] += 1
+            print(f"Connection of {connection.client_id or 'unregistered client'} failed: {e}", file=sys.stderr)
+        finally:
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                done.set()
+        # Keep the connection (and its subscriptions) until everyone is done
+        await done.wait()
+        await asyncio.sleep(linger)
+        if websocket is not None:
+            await websocket.close()
+            await reader
+
+    await asyncio.gather(*(run(connection) for connection in connections))
+    elapsed = loop.time() - started - linger
+    lateness.sort()
+    recorded = last_ts - first_ts
+    return {
+        "connections": len(connections),
+        "frames_sent": received["sent"],
+        "frames_received": received["frames"],
+        "connection_errors": received["errors"],
+        "recorded_seconds": round(recorded, 3),
+        "replay_seconds": round(elapsed, 3),
+        "sent_per_second": round(received["sent"] / elapsed, 1) if elapsed > 0 else None,
+        "recorded_per_second": round(received["sent"] / recorded, 1) if recorded > 0 else None,
+        "late_p99_ms": round(lateness[int(len(lateness) * 0.99)] * 1000, 1) if lateness else 0.0,
+        "late_max_ms": round(lateness[-1] * 1000, 1) if lateness else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded hub traffic")
+    parser.add_argument("logs", nargs="+", help="Traffic log(s) written with HUB_RECORD")
+    parser.add_argument("--hub", default="ws://127.0.0.1:8765")
+    parser.add_argument("--speed", default="1", help="Time compression factor, or 'max'")
+    parser.add_argument("--skip-client", action="append", default=[], help="Client ID not to replay (repeatable)")
+    parser.add_argument("--linger", type=float, default=1.0, help="Seconds to keep connections open at the end")
+    parser.add_argument("--summary", action="store_true", help="Describe the logs instead of replaying them")
+    parser.add_argument("--json", help="Write the result to this file")
+    args = parser.parse_args()
+
+    if args.summary:
+        result = summarize(args.logs)
+    else:
+        speed = None if args.speed == "max" else float(args.speed)
+        recorded = [c for c in load(args.logs) if c.frames and c.client_id not in args.skip_client]
+        if not recorded:
+            sys.exit("Nothing to replay")
+        result = asyncio.run(replay(recorded, args.hub, speed, args.linger))
+        result["speed"] = args.speed
+
+    print(json.dumps(result, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
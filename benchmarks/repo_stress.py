@@ -0,0 +1,241 @@
+"""Concurrency stress test for the in-memory repositories
+
+Hammers the repositories from every place the Control Room touches
+them, all at the same time:
+
+- several "Flask" threads create, move, delete and list incidents and
+  list units, as the REST API does,
+- a "hub" thread with its own event loop runs
+  ``WebSocketHandlers.handle_disconnection`` (unit deletes),
+- the main event loop runs ``handle_location``,
+  ``handle_acknowledgment`` and ``handle_resolution`` (unit creates and
+  updates, incident status changes).
+
+Checked throughout and at the end:
+
+- no repository call raises anything but the documented ValueError,
+- ``get_all()`` never returns the same entity twice,
+- the unit repository's position index holds exactly the stored units,
+  at their stored positions.
+
+``--switch-interval`` lowers the interpreter's thread switch interval so
+threads interleave at a much finer grain and rare races show up in
+seconds. The throughput it reports is then dominated by lock convoys
+(a thread preempted inside a critical section makes the others wait for
+its next turn on the GIL) and is not representative; compare throughput
+at the default interval.
+
+Usage:
+    python benchmarks/repo_stress.py --duration 10
+    python benchmarks/repo_stress.py --duration 30 --switch-interval 1e-5
+    python benchmarks/repo_stress.py --flask-threads 16 --units 2000 --json stress.json
+
+Exits with status 1 if any check failed.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from communication.handlers import WebSocketHandlers
+from control_room.model.incident import IncidentStatus
+from control_room.repository.in_memory_incident_repository import InMemoryIncidentRepository
+from control_room.repository.in_memory_unit_repository import InMemoryUnitRepository
+from control_room.repository.position_index import FREE
+from control_room.service.incident_service import IncidentService
+from control_room.service.unit_service import UnitService
+
+
+class Stress:
+    """Shared state of one stress run"""
+
+    def __init__(self, units: int, seed: int):
+        self.incident_repository = InMemoryIncidentRepository()
+        self.unit_repository = InMemoryUnitRepository()
+        self.incident_service = IncidentService(self.incident_repository, communication_channel=None)
+        self.unit_service = UnitService(self.unit_repository, communication_channel=None)
+        self.handlers = WebSocketHandlers(self.incident_service, self.incident_repository, self.unit_service)
+        self.unit_ids = [f"ERT-{i:05d}" for i in range(units)]
+        self.seed = seed
+        self.ops = Counter()
+        self.failures = []
+        self._lock = threading.Lock()
+        self.deadline = 0.0
+
+    def record(self, path: str, count: int = 1):
+        with self._lock:
+            self.ops[path] += count
+
+    def fail(self, where: str, error: BaseException):
+        with self._lock:
+            if len(self.failures) < 20:
+                self.failures.append(f"{where}: {type(error).__name__}: {error}")
+            self.ops["failures"] += 1
+
+    def check_unique(self, where: str, entities: list):
+        ids = [entity.id for entity in entities]
+        if len(ids) != len(set(ids)):
+            self.fail(where, AssertionError("get_all() returned duplicates"))
+
+    # ---------------- Flask request threads ----------------
+
+    def flask_worker(self, index: int):
+        rng = random.Random(self.seed * 1000 + index)
+        service = self.incident_service
+        ops = 0
+        while time.monotonic() < self.deadline:
+            roll = rng.random()
+            try:
+                if roll < 0.2:
+                    service.create_incident(rng.uniform(0, 1000), rng.uniform(0, 1000))
+                elif roll < 0.4:
+                    incidents = service.get_all_incidents()
+                    if incidents:
+                        service.update_incident(rng.choice(incidents).id, rng.uniform(0, 1000), rng.uniform(0, 1000))
+                elif roll < 0.6:
+                    incidents = service.get_all_incidents()
+                    if len(incidents) > 200:
+                        service.delete_incident(rng.choice(incidents).id)
+                elif roll < 0.8:
+                    self.check_unique("get_all_incidents", service.get_all_incidents())
+                    service.get_open_incidents()
+                else:
+                    self.check_unique("get_all_units", self.unit_service.get_all_units())
+            except ValueError:
+                pass  # deleted by another thread in between: the documented outcome
+            except Exception as e:
+                self.fail("flask", e)
+            ops += 1
+        self.record("flask", ops)
+
+    # ---------------- Hub thread ----------------
+
+    def hub_worker(self):
+        asyncio.run(self._disconnect_units())
+
+    async def _disconnect_units(self):
+        rng = random.Random(self.seed + 1)
+        ops = 0
+        while time.monotonic() < self.deadline:
+            try:
+                await self.handlers.handle_disconnection(rng.choice(self.unit_ids))
+            except Exception as e:
+                self.fail("hub", e)
+            ops += 1
+        self.record("hub", ops)
+
+    # ---------------- Main loop ----------------
+
+    async def handler_loop(self):
+        rng = random.Random(self.seed + 2)
+        handlers = self.handlers
+        ops = 0
+        while time.monotonic() < self.deadline:
+            ert_id = rng.choice(self.unit_ids)
+            roll = rng.random()
+            try:
+                if roll < 0.85:
+                    await handlers.handle_location({
+                        "ert_id": ert_id, "x": rng.uniform(0, 1000), "y": rng.uniform(0, 1000),
+                        "vx": rng.uniform(-10, 10), "vy": rng.uniform(-10, 10)
+                    })
+                elif roll < 0.95:
+                    incidents = self.incident_service.get_all_incidents()
+                    if incidents:
+                        await handlers.handle_acknowledgment({
+                            "ert_id": ert_id, "incident_id": rng.choice(incidents).id,
+                            "x": rng.uniform(0, 1000), "y": rng.uniform(0, 1000)
+                        })
+                else:
+                    await handlers.handle_resolution({"ert_id": ert_id})
+            except Exception as e:
+                self.fail("handlers", e)
+            ops += 1
+            if ops % 64 == 0:
+                await asyncio.sleep(0)
+        self.record("handlers", ops)
+
+    # ---------------- Final checks ----------------
+
+    def check_index(self):
+        """The position index must mirror the unit storage exactly"""
+        repository = self.unit_repository
+        index = repository.positions
+        stored = {unit.id: unit for unit in repository.get_all()}
+        indexed = {
+            index.ids[slot]: slot for slot in range(index.size)
+            if index.status[slot] != FREE
+        }
+        missing = stored.keys() - indexed.keys()
+        stale = indexed.keys() - stored.keys()
+        if missing:
+            self.fail("index", AssertionError(f"{len(missing)} stored units missing from the index"))
+        if stale:
+            self.fail("index", AssertionError(f"{len(stale)} deleted units still in the index"))
+        moved = [
+            unit_id for unit_id, slot in indexed.items()
+            if unit_id in stored and (index.x[slot], index.y[slot]) != (stored[unit_id].x, stored[unit_id].y)
+        ]
+        if moved:
+            self.fail("index", AssertionError(f"{len(moved)} units at a different position in the index"))
+
+
+def run(args) -> dict:
+    stress = Stress(args.units, args.seed)
+    stress.deadline = time.monotonic() + args.duration
+
+    threads = [threading.Thread(target=stress.flask_worker, args=(i,), daemon=True) for i in range(args.flask_threads)]
+    threads.append(threading.Thread(target=stress.hub_worker, daemon=True))
+    for thread in threads:
+        thread.start()
+    asyncio.run(stress.handler_loop())
+    for thread in threads:
+        thread.join()
+
+    stress.check_index()
+    incidents = stress.incident_service.get_all_incidents()
+    return {
+        "duration": args.duration,
+        "flask_threads": args.flask_threads,
+        "ops_per_second": {
+            path: round(stress.ops[path] / args.duration) for path in ("flask", "hub", "handlers")
+        },
+        "units": len(stress.unit_service.get_all_units()),
+        "incidents": len(incidents),
+        "resolved": sum(1 for incident in incidents if incident.status == IncidentStatus.RESOLVED),
+        "failures": stress.ops["failures"],
+        "failure_samples": stress.failures,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stress the Control Room repositories from all threads at once")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--flask-threads", type=int, default=8)
+    parser.add_argument("--units", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--switch-interval", type=float,
+                        help="sys.setswitchinterval() value; small values provoke races")
+    parser.add_argument("--json", help="Write the result to this file")
+    args = parser.parse_args()
+
+    # Handlers log every deleted-in-between ValueError; only the checks matter here
+    logging.disable(logging.CRITICAL)
+    if args.switch_interval is not None:
+        sys.setswitchinterval(args.switch_interval)
+
+    result = run(args)
+    print(json.dumps(result, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    sys.exit(1 if result["failures"] else 0)
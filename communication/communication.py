@@ -1,7 +1,7 @@
 """Abstract communication channel for Control Room and ERT communication"""
 
 from abc import ABC, abstractmethod
-from typing import Callable, Any
+from typing import Callable, Any, Iterable, List, Optional, Tuple
 
 # Abstract base class
 class Communication(ABC):
@@ -19,6 +19,36 @@ class Communication(ABC):
     async def publish(self, topic: str, message: Any) -> bool:
         """Publish a message to a topic/channel"""
         pass
+
+    async def publish_many(self, messages: Iterable[Tuple[str, Any]]) -> bool:
+        """
+        Publish several (topic, message) pairs, in order
+
+        Implementations may send them in one frame; this default publishes
+        them one by one. Returns True only if every publish succeeded.
+        """
+        results = [await self.publish(topic, message) for topic, message in messages]
+        return all(results)
+
+    async def clear_retained(self, topic: str, key: Optional[str] = None) -> bool:
+        """
+        Forget the last-value message kept for (topic, key)
+
+        Channels without retained messages have nothing to forget; this
+        default returns False.
+        """
+        return False
+    
+    @abstractmethod
+    async def request(self, topic_or_client: str, payload: Any, timeout: float = 5.0, **kwargs) -> List[dict]:
+        """
+        Send a request and collect the responses (request/response over pub/sub)
+
+        Returns a list of responses, each with the responder ID, its payload
+        and the round-trip time in seconds. Returns whatever arrived by the
+        deadline; an empty list means nobody answered in time.
+        """
+        pass
     
     @abstractmethod
     async def disconnect(self) -> bool:
@@ -0,0 +1,229 @@
+"""Bounded, ordered execution of subscription callbacks
+
+Incoming messages are not run as free-floating tasks. Each topic gets a
+fixed number of lanes, and every lane is a bounded queue drained by one
+worker, so:
+
+- a topic never runs more than ``concurrency`` callbacks at once,
+- messages with the same key (e.g. the same ``ert_id``) always land in the
+  same lane and are handled in arrival order,
+- a full lane makes ``submit()`` wait, which stops the socket reader and
+  pushes back on the sender instead of growing memory; topics whose
+  messages supersede each other (locations) can instead drop the oldest
+  waiting message, so they never hold up the more important topics
+  read from the same socket,
+- sync callbacks run in a thread pool so they never block the event loop.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+from communication.metrics import REGISTRY
+
+DEFAULT_CONCURRENCY = 1
+DEFAULT_MAX_QUEUE = 1000
+
+# Either the name of a payload field or a function returning the ordering key
+KeySpec = Union[str, Callable[[Any], Any], None]
+
+# Receives the first non-None value returned by a message's callbacks
+ResultHandler = Callable[[Any], Awaitable[None]]
+
+logger = logging.getLogger(__name__)
+
+CALLBACK_SECONDS = REGISTRY.histogram(
+    "ws_callback_duration_seconds", "Time spent running a message's callbacks", ("topic",)
+)
+DROPPED = REGISTRY.counter(
+    "ws_callback_dropped_total", "Messages dropped from a full lane (drop_oldest topics)", ("topic",)
+)
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "ws_callback_queue_wait_seconds", "Time a message waited for a free lane", ("topic",)
+)
+
+
+class TopicPolicy:
+    """How callbacks for one topic are scheduled"""
+
+    def __init__(
+        self,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        key: KeySpec = None,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        drop_oldest: bool = False
+    ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.concurrency = concurrency
+        self.key = key
+        self.max_queue = max_queue
+        self.drop_oldest = drop_oldest
+
+    def key_of(self, payload: Any) -> Any:
+        if self.key is None:
+            return None
+        if callable(self.key):
+            return self.key(payload)
+        if isinstance(payload, dict):
+            return payload.get(self.key)
+        return None
+
+
+class _TopicStats:
+    __slots__ = ("processed", "errors", "dropped", "handler_time", "handler_max", "wait_time", "wait_max")
+
+    def __init__(self):
+        self.processed = 0
+        self.errors = 0
+        self.dropped = 0
+        self.handler_time = 0.0
+        self.handler_max = 0.0
+        self.wait_time = 0.0
+        self.wait_max = 0.0
+
+
+class _TopicLanes:
+    def __init__(self, policy: TopicPolicy):
+        self.policy = policy
+        lane_size = max(1, policy.max_queue // policy.concurrency)
+        self.queues: List[asyncio.Queue] = [asyncio.Queue(maxsize=lane_size) for _ in range(policy.concurrency)]
+        self.workers: List[asyncio.Task] = []
+        self.round_robin = itertools.cycle(range(policy.concurrency))
+        self.stats = _TopicStats()
+
+    def lane_for(self, payload: Any) -> asyncio.Queue:
+        key = self.policy.key_of(payload)
+        if key is None:
+            return self.queues[next(self.round_robin)]
+        return self.queues[hash(key) % len(self.queues)]
+
+
+class CallbackExecutor:
+    """Runs subscription callbacks with per-topic limits and per-key ordering"""
+
+    def __init__(self, sync_workers: int = 4):
+        self._policies: Dict[str, TopicPolicy] = {}
+        self._topics: Dict[str, _TopicLanes] = {}
+        self._thread_pool = ThreadPoolExecutor(max_workers=sync_workers, thread_name_prefix="callback")
+
+    def configure(self, topic: str, concurrency: int = DEFAULT_CONCURRENCY, key: KeySpec = None,
+                  max_queue: int = DEFAULT_MAX_QUEUE, drop_oldest: bool = False):
+        """
+        Set the scheduling policy for a topic
+
+        Must be called before the first message on that topic arrives.
+
+        Args:
+            topic: Topic name
+            concurrency: Maximum callbacks running at once for this topic
+            key: Payload field (or function) whose value must be handled in order
+            max_queue: Maximum messages waiting across all lanes of the topic
+            drop_oldest: Make room in a full lane by dropping its oldest message instead of waiting
+        """
+        if topic in self._topics:
+            raise RuntimeError(f"Topic '{topic}' is already running; configure it before subscribing")
+        self._policies[topic] = TopicPolicy(concurrency, key, max_queue, drop_oldest)
+
+    async def submit(self, topic: str, callbacks: List[Callable], payload: Any,
+                     on_result: Optional[ResultHandler] = None):
+        """
+        Queue a message for its topic's callbacks
+
+        Waits while the target lane is full, which is what applies
+        backpressure to the socket reader (unless the topic drops its
+        oldest messages instead).
+
+        Args:
+            topic: Topic the message arrived on
+            callbacks: Callbacks subscribed to the topic
+            payload: Message payload passed to each callback
+            on_result: Awaited with the first non-None callback return value (RPC replies)
+        """
+        lanes = self._topics.get(topic)
+        if lanes is None:
+            lanes = self._start_topic(topic)
+        queue = lanes.lane_for(payload)
+        item = (callbacks, payload, on_result, time.perf_counter())
+        if lanes.policy.drop_oldest and queue.full():
+            queue.get_nowait()
+            queue.task_done()
+            lanes.stats.dropped += 1
+            DROPPED.inc((topic,))
+            queue.put_nowait(item)
+            return
+        await queue.put(item)
+
+    def _start_topic(self, topic: str) -> _TopicLanes:
+        lanes = _TopicLanes(self._policies.get(topic) or TopicPolicy())
+        for queue in lanes.queues:
+            lanes.workers.append(asyncio.create_task(self._work(topic, queue, lanes.stats)))
+        self._topics[topic] = lanes
+        return lanes
+
+    async def _work(self, topic: str, queue: asyncio.Queue, stats: _TopicStats):
+        loop = asyncio.get_running_loop()
+        while True:
+            callbacks, payload, on_result, enqueued_at = await queue.get()
+            started = time.perf_counter()
+            waited = started - enqueued_at
+            stats.wait_time += waited
+            stats.wait_max = max(stats.wait_max, waited)
+            QUEUE_WAIT_SECONDS.observe((topic,), waited)
+            result = None
+            for cb in callbacks:
+                try:
+                    if asyncio.iscoroutinefunction(cb):
+                        value = await cb(payload)
+                    else:
+                        value = await loop.run_in_executor(self._thread_pool, cb, payload)
+                    if result is None:
+                        result = value
+                except Exception as e:
+                    stats.errors += 1
+                    logger.exception(f"Callback error on '{topic}': {e}", extra={"topic": topic})
+            if on_result is not None and result is not None:
+                try:
+                    await on_result(result)
+                except Exception as e:
+                    logger.error(f"Result handler error on '{topic}': {e}", extra={"topic": topic})
+            elapsed = time.perf_counter() - started
+            stats.processed += 1
+            stats.handler_time += elapsed
+            stats.handler_max = max(stats.handler_max, elapsed)
+            CALLBACK_SECONDS.observe((topic,), elapsed)
+            queue.task_done()
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        Get queue depth and handler latency per topic
+
+        Returns:
+            Dict of topic -> counters; times are in seconds
+        """
+        result = {}
+        for topic, lanes in self._topics.items():
+            s = lanes.stats
+            result[topic] = {
+                "queue_depth": sum(q.qsize() for q in lanes.queues),
+                "queue_capacity": sum(q.maxsize for q in lanes.queues),
+                "concurrency": lanes.policy.concurrency,
+                "processed": s.processed,
+                "errors": s.errors,
+                "dropped": s.dropped,
+                "handler_avg": s.handler_time / s.processed if s.processed else 0.0,
+                "handler_max": s.handler_max,
+                "queue_wait_avg": s.wait_time / s.processed if s.processed else 0.0,
+                "queue_wait_max": s.wait_max,
+            }
+        return result
+
+    async def shutdown(self):
+        """Stop all workers and the thread pool; queued messages are dropped"""
+        for lanes in self._topics.values():
+            for worker in lanes.workers:
+                worker.cancel()
+        self._topics.clear()
+        self._thread_pool.shutdown(wait=False)
@@ -2,54 +2,109 @@
 
 Handlers moved out of the service layer to a dedicated module so
 the communication layer can subscribe to them directly.
+
+Payloads are checked against the topic schemas at the hub
+(``control_room/hub/schemas.py``) before they are routed, so required
+fields are present and typed by the time a handler runs.
 """
+import datetime
+import logging
+import time
 from control_room.model.incident import IncidentStatus
 from typing import Any
 from control_room.model.unit import UnitStatus
+from communication.metrics import REGISTRY, timed
+
+logger = logging.getLogger(__name__)
+
+HANDLER_SECONDS = REGISTRY.histogram(
+    "cr_handler_duration_seconds", "Time spent in each Control Room message handler", ("handler",)
+)
+LOCATION_LATENCY_SECONDS = REGISTRY.histogram(
+    "cr_location_latency_seconds", "Time from an ERT sending a location (sent_at) to the repository update"
+)
 
 class WebSocketHandlers:
-    def __init__(self, incident_service, incident_repository, unit_service=None):
+    def __init__(self, incident_service, incident_repository, unit_service=None, geofence_engine=None):
         self.incident_service = incident_service
         self.incident_repository = incident_repository
         self.unit_service = unit_service
+        self.geofence_engine = geofence_engine
 
+    @timed(HANDLER_SECONDS, "location")
     async def handle_location(self, data: dict):
-        print(f"[Control Room] \U0001f4cd Vehicle Location: {data}")
-        ert_id = data.get("ert_id")
-        x = data.get("x")
-        y = data.get("y")
+        ert_id = data["ert_id"]
+        x = data["x"]
+        y = data["y"]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"\U0001f4cd Vehicle Location: ({x}, {y})",
+                         extra={"event": "location.received", "ert_id": ert_id})
+        unit = None
         if self.unit_service:
             try:
                 unit = self.unit_service.get_unit_by_id(ert_id)
                 if unit:
-                    self.unit_service.update_unit(ert_id, x, y)
+                    self.unit_service.update_unit(ert_id, x, y, data.get("vx"), data.get("vy"))
+                else:
+                    # First report from this unit: track it so it can be ranked for dispatch
+                    unit = self.unit_service.create_unit(ert_id, x, y, data.get("vx"), data.get("vy"))
             except Exception as e:
-                print(f"[Control Room] \u274c Failed to update location for {ert_id}: {e}")
+                logger.error(f"\u274c Failed to update location: {e}", extra={"ert_id": ert_id})
+        if self.geofence_engine is not None:
+            for event in self.geofence_engine.update(ert_id, x, y):
+                await self._publish_geofence_event(event, unit)
+        sent_at = data.get("sent_at")
+        if sent_at is not None:
+            LOCATION_LATENCY_SECONDS.observe((), time.time() - sent_at)
+
+    async def _publish_geofence_event(self, event: dict, unit):
+        incident_id = event["incident_id"]
+        event["assigned"] = unit is not None and unit.assigned_incident == incident_id
+        logger.info(f"\U0001f4cc Unit {event['type']} at incident",
+                    extra={"ert_id": event["ert_id"], "incident_id": incident_id})
+        if event["type"] == "arrival" and event["assigned"]:
+            # First assigned unit on scene: the incident is being worked on
+            incident = self.incident_service.get_incident_by_id(incident_id)
+            if incident and incident.status in (IncidentStatus.DISPATCHED, IncidentStatus.ACKNOWLEDGED):
+                incident.status = IncidentStatus.IN_PROGRESS
+                self.incident_repository.update(incident)
+        await self.incident_service.communication_channel.publish("geofence", event)
 
+    @timed(HANDLER_SECONDS, "acknowledgment")
     async def handle_acknowledgment(self, data: dict):
-        print(f"[Control Room] \u2705 Acknowledgment: {data}")
-        ert_id = data.get("ert_id")
-        incident_id = data.get("incident_id")
+        ert_id = data["ert_id"]
+        incident_id = data["incident_id"]
+        logger.info("\u2705 Acknowledgment", extra={"ert_id": ert_id, "incident_id": incident_id})
         if self.unit_service:
             try:
                 unit = self.unit_service.get_unit_by_id(ert_id)
                 if not unit:
                     self.unit_service.create_unit(ert_id, data.get("x"), data.get("y"))
+                elif (unit.assigned_incident not in (None, incident_id)
+                      and unit.status != UnitStatus.RESOLVED):
+                    # A unit works one incident at a time; keep the one it has
+                    logger.warning("Acknowledgment from a unit busy with another incident",
+                                   extra={"ert_id": ert_id, "incident_id": incident_id})
+                    return
             except Exception as e:
-                print(f"[Control Room] \u274c Failed to create ERT Unit: {ert_id} ({e})")
+                logger.error(f"\u274c Failed to create ERT Unit: {e}", extra={"ert_id": ert_id})
         if self.unit_service:
             try:
                 self.unit_service.assign_incident_to_unit(ert_id, incident_id)
             except Exception as e:
-                print(f"[Control Room] \u274c Failed to assign incident to unit {ert_id}: {e}")
+                logger.error(f"\u274c Failed to assign incident to unit: {e}",
+                             extra={"ert_id": ert_id, "incident_id": incident_id})
         incident = self.incident_service.get_incident_by_id(incident_id)
         if incident and incident.status == IncidentStatus.DISPATCHED:
             incident.status = IncidentStatus.ACKNOWLEDGED
             self.incident_repository.update(incident)
 
+    @timed(HANDLER_SECONDS, "resolution")
     async def handle_resolution(self, data: dict):
-        print(f"[Control Room] \U0001f389 Resolution: {data}")
-        ert_id = data.get("ert_id")
+        ert_id = data["ert_id"]
+        logger.info("\U0001f389 Resolution", extra={"ert_id": ert_id})
+        # The unit is done with its dispatch; a restart must not bring it back
+        await self.incident_service.communication_channel.clear_retained("incident", ert_id)
         if self.unit_service:
             try:
                 unit = self.unit_service.get_unit_by_id(ert_id)
@@ -70,19 +125,27 @@ class WebSocketHandlers:
                             )
                             if all_resolved:
                                 incident.status = IncidentStatus.RESOLVED
+                                incident.resolved_at = datetime.datetime.utcnow()
                                 self.incident_repository.update(incident)
-                                print(f"[Control Room] \U0001f389 Incident {incident.id} resolved (all units resolved)")
+                                if self.geofence_engine is not None:
+                                    self.geofence_engine.remove_fence(incident.id)
+                                logger.info("\U0001f389 Incident resolved (all units resolved)",
+                                            extra={"incident_id": incident.id})
                             else:
-                                print(f"[Control Room] \U0001f6a7 Incident {incident.id} still in progress (some units not resolved)")
+                                logger.info("\U0001f6a7 Incident still in progress (some units not resolved)",
+                                            extra={"incident_id": incident.id})
             except Exception as e:
-                print(f"[Control Room] \u274c Failed to update")
+                logger.exception("\u274c Failed to process resolution", extra={"ert_id": ert_id})
 
+    @timed(HANDLER_SECONDS, "disconnection")
     async def handle_disconnection(self, ert_id: str):
         try:
+            if self.geofence_engine is not None:
+                self.geofence_engine.forget_unit(ert_id)
             if self.unit_service:
                 self.unit_service.delete_unit(ert_id)
-                print(f"[Control Room] \U0001f6aa ERT Unit {ert_id} disconnected and removed from the system")
+                logger.info("\U0001f6aa ERT Unit disconnected and removed from the system", extra={"ert_id": ert_id})
             else:
-                print(f"[Control Room] \U0001f6aa ERT Unit {ert_id} disconnected (no unit service available)")
+                logger.info("\U0001f6aa ERT Unit disconnected (no unit service available)", extra={"ert_id": ert_id})
         except Exception as e:
-            print(f"[Control Room] \u274c Error handling disconnection for {ert_id}: {e}")
+            logger.error(f"\u274c Error handling disconnection: {e}", extra={"ert_id": ert_id})
@@ -0,0 +1,139 @@
+"""Shared logging setup for the Control Room, hub and ERT processes
+
+Log calls only put the record on an in-memory queue; a background
+listener thread formats it and does the blocking write to stdout, so
+logging never stalls the event loop.
+
+Records are emitted as one JSON object per line. Context passed through
+``extra=`` (``incident_id``, ``ert_id``, ``topic``, ...) becomes top-level
+fields. High-volume events are rate limited per ``event`` name: beyond the
+allowed rate, records are counted and dropped, and the next one that gets
+through reports how many were suppressed.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+# Events per second allowed for the chattiest message types
+DEFAULT_RATE_LIMITS: Dict[str, float] = {
+    "hub.broadcast": 5.0,
+    "hub.subscribe": 20.0,
+    "hub.rejected": 5.0,
+    "hub.record_failed": 1.0,
+    "location.received": 2.0,
+    "location.sent": 1.0,
+    "gps.updated": 1.0,
+}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects"""
+
+    def __init__(self, component: str):
+        super().__init__()
+        self.component = component
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "component": self.component,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per ``event`` name; records without an event always pass"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = dict(rates)
+        self._buckets: Dict[str, list] = {}  # event -> [tokens, last refill, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        rate = self.rates.get(event) if event else None
+        if rate is None:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(event)
+            if bucket is None:
+                bucket = self._buckets[event] = [rate, now, 0]
+            bucket[0] = min(rate, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if bucket[0] < 1.0:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1.0
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+def setup_logging(component: str, level: Optional[str] = None, json_output: Optional[bool] = None,
+                  rate_limits: Optional[Dict[str, float]] = None):
+    """
+    Configure the root logger for a process (idempotent)
+
+    Args:
+        component: Name stamped on every record (e.g. "control-room", "ert")
+        level: Log level; defaults to the LOG_LEVEL environment variable, then INFO
+        json_output: JSON lines (default) or plain text; defaults to LOG_FORMAT != "text"
+        rate_limits: Events per second per event name; defaults to DEFAULT_RATE_LIMITS
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    level = level or os.environ.get("LOG_LEVEL", "INFO")
+    if json_output is None:
+        json_output = os.environ.get("LOG_FORMAT", "json") != "text"
+
+    output = logging.StreamHandler(sys.stdout)
+    if json_output:
+        output.setFormatter(JsonFormatter(component))
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # Filter before enqueueing so suppressed records cost next to nothing
+    queue_handler.addFilter(RateLimitFilter(DEFAULT_RATE_LIMITS if rate_limits is None else rate_limits))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    # Werkzeug and websockets log every request/connection at INFO; keep them to warnings
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    logging.getLogger("websockets").setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,295 @@
+"""Process-wide metrics with Prometheus text exposition
+
+Counters and histograms are sharded per thread: every thread writes to its
+own dict, so recording a value takes no lock and never contends with
+other threads. Shards are only combined when ``/metrics`` is scraped.
+Shards of threads that have exited (e.g. Flask request threads) are folded
+into a retired total at scrape time so they do not pile up.
+
+Gauges are computed on demand by callbacks, so things like queue depths
+cost nothing until someone asks for them.
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+Labels = Tuple[str, ...]
+
+# Seconds; tuned for message handling (sub-millisecond) up to slow HTTP calls
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+class _ThreadSharded:
+    """Base for metrics that keep one value dict per writing thread"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str]):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, dict]] = []
+        self._retired: dict = {}
+        self._lock = threading.Lock()  # only taken for a new thread or a scrape
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def _collect(self) -> List[dict]:
+        """Return stable copies of all shards, retiring those of dead threads"""
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    self._merge(self._retired, shard)
+            self._shards = live
+            return [dict(self._retired)] + [dict(shard) for _, shard in live]
+
+    def _merge(self, into: dict, shard: dict):
+        raise NotImplementedError
+
+
+class Counter(_ThreadSharded):
+    """Monotonic counter"""
+
+    type_name = "counter"
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def _merge(self, into: dict, shard: dict):
+        for labels, value in dict(shard).items():
+            into[labels] = into.get(labels, 0) + value
+
+    def samples(self) -> Dict[Labels, float]:
+        totals: Dict[Labels, float] = {}
+        for shard in self._collect():
+            self._merge(totals, shard)
+        return totals
+
+    def render(self) -> Iterable[str]:
+        for labels, value in sorted(self.samples().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram(_ThreadSharded):
+    """Distribution of observed values over fixed buckets"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, labels: Labels, value: float):
+        shard = self._shard()
+        entry = shard.get(labels)
+        if entry is None:
+            # One slot per bucket, one for +Inf, then the running sum
+            entry = shard[labels] = [0] * (len(self.buckets) + 2)
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def time(self, labels: Labels = ()):
+        """Context manager that observes the elapsed time of its block"""
+        return _Timer(self, labels)
+
+    def _merge(self, into: dict, shard: dict):
+        for labels, entry in dict(shard).items():
+            total = into.get(labels)
+            if total is None:
+                into[labels] = list(entry)
+            else:
+                for i, value in enumerate(entry):
+                    total[i] += value
+
+    def samples(self) -> Dict[Labels, List[float]]:
+        totals: Dict[Labels, List[float]] = {}
+        for shard in self._collect():
+            self._merge(totals, shard)
+        return totals
+
+    def render(self) -> Iterable[str]:
+        for labels, entry in sorted(self.samples().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), entry):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(self.labelnames + ("le",), labels + (le,))
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(entry[-1])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class GaugeCallback:
+    """Gauge whose values are computed by a callback at scrape time"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], callback: Callable[[], Dict[Labels, float]]):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def render(self) -> Iterable[str]:
+        try:
+            values = self.callback()
+        except Exception:
+            # A gauge must never break the scrape (e.g. a dict changed size mid-read)
+            return
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: Labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(self.labels, time.perf_counter() - self.started)
+        return False
+
+
+class MetricsRegistry:
+    """Collection of named metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Modules may be imported twice (script vs package); share one instance
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def gauge_callback(self, name: str, help: str, labelnames: Sequence[str],
+                       callback: Callable[[], Dict[Labels, float]]) -> GaugeCallback:
+        return self._register(GaugeCallback(name, help, labelnames, callback))
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def timed(histogram: Histogram, *labels: str):
+    """Decorator observing the duration of a (sync or async) function"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.observe(labels, time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(labels, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+# ---------------- Flask integration ----------------
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Flask request latency by route",
+    ("route", "method", "status")
+)
+
+
+def instrument_blueprint(blueprint, registry_histogram: Optional[Histogram] = None):
+    """Record the latency of every request served by a Flask blueprint"""
+    from flask import g, request
+
+    if getattr(blueprint, "_metrics_instrumented", False):
+        return blueprint
+    histogram = registry_histogram or HTTP_REQUEST_SECONDS
+
+    @blueprint.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+
+    @blueprint.after_request
+    def _observe(response):
+        started = g.pop("_metrics_started", None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            histogram.observe((route, request.method, str(response.status_code)), time.perf_counter() - started)
+        return response
+
+    blueprint._metrics_instrumented = True
+    return blueprint
+
+
+def metrics_response(registry: MetricsRegistry = REGISTRY):
+    """Flask response with the registry in Prometheus text format"""
+    from flask import Response
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
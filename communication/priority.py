@@ -0,0 +1,181 @@
+"""Priority lanes for outbound frames
+
+Location updates arrive by the thousand; a dispatch (``incident``), its
+acknowledgment or a resolution must not queue behind them. Every
+connection, on the hub and in ``WebSocketCommunication``, therefore sends
+through a ``PriorityOutbox``: one FIFO lane per priority class, drained by
+a single writer task that always takes the most important waiting frame.
+
+- Frames of one topic always share a lane, so per-topic order is kept.
+- Scheduling is strict priority with a starvation guard: a lane passed
+  over ``STARVATION_LIMIT`` times in a row gets one frame through, so
+  bulk traffic slows down under critical load but never stops.
+- The bulk lane is bounded (``BULK_LANE_LIMIT``); when a consumer falls
+  that far behind, the oldest bulk frames are dropped. They are location
+  updates that newer ones supersede. The other lanes are never dropped.
+
+The writer hands one frame at a time to the connection, which waits
+whenever its buffers are full. ``limit_send_buffer`` keeps those small:
+the websockets write buffer and, with ``TCP_NOTSENT_LOWAT`` (Linux,
+macOS), the kernel's unsent data. Otherwise the kernel takes megabytes of
+location frames and a critical frame queues behind them there, out of the
+outbox's reach.
+
+The same holds on the way in: a read loop that handles every frame it has
+buffered before yielding lets one flooding connection (a single read can
+bring in thousands of location frames) hold up every other connection and
+the outbox writers. Read loops therefore yield to the event loop every
+``READ_BATCH`` frames.
+"""
+
+import asyncio
+import logging
+import socket
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+import websockets
+
+from communication.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_CRITICAL = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+PRIORITY_NAMES = ("critical", "normal", "bulk")
+
+# Topics not listed here are PRIORITY_NORMAL; frames without a topic
+# (delivery reports, RPC routing and responses, errors) are critical
+TOPIC_PRIORITIES = {
+    "incident": PRIORITY_CRITICAL,
+    "acknowledgment": PRIORITY_CRITICAL,
+    "resolution": PRIORITY_CRITICAL,
+    "location": PRIORITY_BULK,
+}
+
+STARVATION_LIMIT = 32
+BULK_LANE_LIMIT = 1000
+SEND_BUFFER_LIMIT = 16 * 1024  # bytes buffered below the outbox, per connection
+READ_BATCH = 16  # frames a read loop handles before letting other tasks run
+
+OUTBOX_WAIT_SECONDS = REGISTRY.histogram(
+    "outbox_wait_seconds", "Time a frame waited in a connection's outbox", ("owner", "priority")
+)
+OUTBOX_DROPPED = REGISTRY.counter(
+    "outbox_dropped_total", "Bulk frames dropped because a consumer fell behind", ("owner",)
+)
+
+
+def priority_of(topic: Optional[str]) -> int:
+    """Priority class of a topic's frames"""
+    if topic is None:
+        return PRIORITY_CRITICAL
+    return TOPIC_PRIORITIES.get(topic, PRIORITY_NORMAL)
+
+
+def limit_send_buffer(connection, limit: int = SEND_BUFFER_LIMIT):
+    """
+    Keep a connection's send buffers small so backlog stays in its outbox
+
+    Args:
+        connection: websockets connection
+        limit: Bytes the connection and the kernel may hold unsent
+    """
+    transport = getattr(connection, "transport", None)
+    if transport is None:
+        return
+    transport.set_write_buffer_limits(high=limit)
+    sock = transport.get_extra_info("socket")
+    if sock is not None and sock.family != socket.AF_UNIX and hasattr(socket, "TCP_NOTSENT_LOWAT"):
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NOTSENT_LOWAT, limit)
+        except OSError as e:
+            logger.debug(f"Could not limit unsent socket data: {e}")
+
+
+class PriorityOutbox:
+    """Per-connection send queues, one per priority class"""
+
+    def __init__(self, send: Callable[[str], Awaitable[None]], owner: str = "hub"):
+        """
+        Args:
+            send: Coroutine function writing one frame to the connection
+            owner: Metrics label for whoever owns the connection
+        """
+        self._send = send
+        self.owner = owner
+        self._lanes = tuple(deque() for _ in PRIORITY_NAMES)  # (frame, enqueued_at)
+        self._skipped = [0] * len(PRIORITY_NAMES)
+        self._ready = asyncio.Event()
+        self.closed = False
+        self._writer = asyncio.get_running_loop().create_task(self._run())
+
+    def __len__(self) -> int:
+        return sum(len(lane) for lane in self._lanes)
+
+    def put(self, frame, priority: int = PRIORITY_NORMAL) -> bool:
+        """
+        Queue a frame; never waits
+
+        Args:
+            frame: Encoded frame
+            priority: PRIORITY_CRITICAL, PRIORITY_NORMAL or PRIORITY_BULK
+
+        Returns:
+            False if the connection is closed
+        """
+        if self.closed:
+            return False
+        lane = self._lanes[priority]
+        if priority == PRIORITY_BULK and len(lane) >= BULK_LANE_LIMIT:
+            lane.popleft()
+            OUTBOX_DROPPED.inc((self.owner,))
+        lane.append((frame, time.perf_counter()))
+        self._ready.set()
+        return True
+
+    def close(self):
+        """Stop the writer; frames still queued are dropped"""
+        self._discard()
+        self._writer.cancel()
+
+    def _discard(self):
+        self.closed = True
+        for lane in self._lanes:
+            lane.clear()
+
+    def _next_lane(self) -> Optional[int]:
+        """Lane to send from next, or None if all are empty"""
+        waiting = [priority for priority, lane in enumerate(self._lanes) if lane]
+        if not waiting:
+            return None
+        first = waiting[0]
+        skipped = self._skipped
+        for priority in waiting[1:]:
+            if skipped[priority] >= STARVATION_LIMIT:
+                skipped[priority] = 0
+                return priority
+        for priority in waiting[1:]:
+            skipped[priority] += 1
+        skipped[first] = 0
+        return first
+
+    async def _run(self):
+        lanes = self._lanes
+        labels = [(self.owner, name) for name in PRIORITY_NAMES]
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while (priority := self._next_lane()) is not None:
+                frame, enqueued_at = lanes[priority].popleft()
+                OUTBOX_WAIT_SECONDS.observe(labels[priority], time.perf_counter() - enqueued_at)
+                try:
+                    await self._send(frame)
+                except websockets.exceptions.ConnectionClosed:
+                    # The connection's reader notices too and cleans up
+                    self._discard()
+                    return
+                except Exception as e:
+                    logger.error(f"Outbox send failed: {e}", extra={"owner": self.owner})
@@ -0,0 +1,53 @@
+"""Delivery guarantees for the communication layer
+
+Topics are fire-and-forget (QoS 0) unless the client opts in to
+at-least-once delivery (QoS 1) for them. QoS 1 messages carry a message ID;
+every recipient acks it, the hub retries recipients that did not, and the
+publisher gets a delivery report. Because retries can deliver a message
+twice, receivers drop repeats with a ``DedupWindow``.
+"""
+
+import time
+from collections import OrderedDict
+
+QOS_AT_MOST_ONCE = 0
+QOS_AT_LEAST_ONCE = 1
+
+# Topics whose loss would leave a unit or the Control Room out of sync
+CRITICAL_TOPICS = ("incident", "resolution")
+
+# Topics the hub keeps the last message of for new subscribers (topic ->
+# payload field it is kept per): a fresh subscriber sees every unit's position at once
+RETAINED_TOPICS = {"location": "ert_id"}
+
+
+class DedupWindow:
+    """Remembers recently seen message IDs, bounded in size and age"""
+
+    def __init__(self, max_size: int = 4096, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+
+    def __contains__(self, msg_id: str) -> bool:
+        """True if the message ID is in the window (a duplicate)"""
+        self._evict(time.monotonic())
+        return msg_id in self._seen
+
+    def add(self, msg_id: str):
+        """
+        Record the ID of a message that is being handled
+
+        Args:
+            msg_id: ID of the incoming message
+        """
+        now = time.monotonic()
+        self._evict(now)
+        self._seen[msg_id] = now
+
+    def _evict(self, now: float):
+        while self._seen:
+            oldest_id, seen_at = next(iter(self._seen.items()))
+            if len(self._seen) < self.max_size and now - seen_at < self.ttl:
+                break
+            del self._seen[oldest_id]
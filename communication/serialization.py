@@ -0,0 +1,143 @@
+"""JSON encoding for WebSocket frames and API responses
+
+One place decides how JSON is produced, so the hub, the communication
+channels and both Flask apps share the same (fast) path:
+
+- orjson is used when installed (``uv pip install orjson``), otherwise
+  the standard library with compact separators,
+- objects with a ``to_json()`` method (the versioned models) are embedded
+  from their cached encoding instead of being encoded again,
+- ``RawJSON`` wraps text that is already encoded, e.g. a cached payload
+  placed inside a new envelope.
+
+Output is always compact; nobody reads frames or API responses by eye
+often enough to pay for indentation on every request.
+"""
+
+import datetime
+import enum
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # optional: the standard library is used instead
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+class RawJSON:
+    """Already encoded JSON, embedded verbatim by dumps()"""
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _ContainsRaw(Exception):
+    """Raised by the stdlib default hook; the slower splicing encoder takes over"""
+
+
+def _convert(obj: Any) -> Any:
+    """Types the encoders do not know natively; None if unknown"""
+    to_json = getattr(obj, "to_json", None)
+    if to_json is not None:
+        return RawJSON(to_json())
+    to_dict = getattr(obj, "to_dict", None)
+    if to_dict is not None:
+        return to_dict()
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    return None
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, RawJSON):
+        raise _ContainsRaw
+    converted = _convert(obj)
+    if converted is None:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    if isinstance(converted, RawJSON):
+        raise _ContainsRaw
+    return converted
+
+
+_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=_default)
+
+
+def _splice(obj: Any) -> str:
+    """Encode a structure containing RawJSON values"""
+    if isinstance(obj, RawJSON):
+        return obj.text
+    if isinstance(obj, dict):
+        return "{" + ",".join(_encoder.encode(str(key)) + ":" + _splice(value) for key, value in obj.items()) + "}"
+    if isinstance(obj, (list, tuple)):
+        return "[" + ",".join(_splice(value) for value in obj) + "]"
+    to_json = getattr(obj, "to_json", None)
+    if to_json is not None:
+        return to_json()
+    try:
+        return _encoder.encode(obj)
+    except _ContainsRaw:
+        converted = _convert(obj)
+        return _splice(converted)
+
+
+def _orjson_default(obj: Any) -> Any:
+    if isinstance(obj, RawJSON):
+        return orjson.Fragment(obj.text)
+    converted = _convert(obj)
+    if converted is None:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    if isinstance(converted, RawJSON):
+        return orjson.Fragment(converted.text)
+    return converted
+
+
+def dumps(obj: Any) -> str:
+    """Encode to compact JSON text (WebSocket text frames)"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_orjson_default).decode()
+    try:
+        return _encoder.encode(obj)
+    except _ContainsRaw:
+        return _splice(obj)
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """Encode to compact UTF-8 JSON (HTTP bodies)"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_orjson_default)
+    return dumps(obj).encode()
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def install_json_provider(app):
+    """
+    Make a Flask app's jsonify() and request.get_json() use this module
+
+    Args:
+        app: Flask application
+    """
+    from flask.json.provider import JSONProvider
+
+    class CompactJSONProvider(JSONProvider):
+        def dumps(self, obj: Any, **kwargs: Any) -> str:
+            return dumps(obj)
+
+        def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+            return loads(s)
+
+        def response(self, *args: Any, **kwargs: Any):
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(dumps_bytes(obj), mimetype="application/json")
+
+    app.json = CompactJSONProvider(app)
@@ -1,81 +1,617 @@
-import json
+import time
+import logging
+import uuid
+import random
 import asyncio
+import weakref
 import websockets
-from typing import Callable, Any, Dict, List
+from typing import Callable, Any, Dict, Iterable, List, Optional, Tuple
 from communication.communication import Communication
+from communication.qos import DedupWindow, QOS_AT_LEAST_ONCE
+from communication.executor import CallbackExecutor, KeySpec, DEFAULT_CONCURRENCY, DEFAULT_MAX_QUEUE
+from communication.metrics import REGISTRY
+from communication.priority import (
+    PRIORITY_CRITICAL, READ_BATCH, PriorityOutbox, limit_send_buffer, priority_of
+)
+from communication import serialization
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_MESSAGES = 256  # messages per publish_batch frame (the hub accepts up to 1000)
+
+# Live channels, so queue-depth gauges can be computed at scrape time
+_channels = weakref.WeakSet()
+
+RECONNECTS = REGISTRY.counter("ws_reconnects_total", "Successful reconnects to the hub", ("client",))
+MESSAGES_IN = REGISTRY.counter("ws_messages_in_total", "Frames received from the hub", ("client",))
+MESSAGES_OUT = REGISTRY.counter("ws_messages_out_total", "Messages published to the hub", ("client", "topic"))
+
+
+def _channel_gauge(read):
+    def collect():
+        values = {}
+        for channel in list(_channels):
+            values.update(read(channel))
+        return values
+    return collect
+
+
+REGISTRY.gauge_callback(
+    "ws_callback_queue_depth", "Messages waiting for their topic's callbacks", ("client", "topic"),
+    _channel_gauge(lambda ch: {
+        (ch.metrics_name, topic): stats["queue_depth"] for topic, stats in ch.stats().items()
+    })
+)
+REGISTRY.gauge_callback(
+    "ws_pending_requests", "RPC requests waiting for responses", ("client",),
+    _channel_gauge(lambda ch: {(ch.metrics_name,): len(ch._pending_requests)})
+)
+REGISTRY.gauge_callback(
+    "ws_unconfirmed_publishes", "QoS 1 publishes waiting for a delivery report", ("client",),
+    _channel_gauge(lambda ch: {(ch.metrics_name,): len(ch._unconfirmed)})
+)
+
+class _PendingRequest:
+    """An outstanding RPC request waiting for its responses"""
+    __slots__ = ("future", "responses", "expected", "started", "timer")
+
+    def __init__(self, future: asyncio.Future, expected: Optional[int]):
+        self.future = future
+        self.responses: List[dict] = []
+        self.expected = expected
+        self.started = time.perf_counter()
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def complete(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        if not self.future.done():
+            self.future.set_result(self.responses)
+
+    def check_complete(self):
+        if self.expected is not None and len(self.responses) >= self.expected:
+            self.complete()
+
 
 class WebSocketCommunication(Communication):
-    def __init__(self):
+    def __init__(
+        self,
+        reconnect: bool = True,
+        reconnect_base_delay: float = 0.5,
+        reconnect_max_delay: float = 30.0,
+        qos_topics: Optional[Iterable[str]] = None,
+        delivery_timeout: float = 15.0,
+        sync_callback_workers: int = 4,
+        batch_window: float = 0.0,
+        retain_topics: Optional[Dict[str, Optional[str]]] = None
+    ):
         self.connection = None
+        self._outbox: Optional[PriorityOutbox] = None  # sends to the hub by topic priority
         self.subscriptions: Dict[str, List[Callable]] = {}
         self.is_connected = False
 
+        # Runs subscription callbacks: bounded per topic, ordered per key
+        self.executor = CallbackExecutor(sync_workers=sync_callback_workers)
+
+        # Reconnect settings (exponential backoff with full jitter)
+        self.reconnect = reconnect
+        self.reconnect_base_delay = reconnect_base_delay
+        self.reconnect_max_delay = reconnect_max_delay
+
+        # Last sequence number processed per topic, used to resume after a drop
+        self.last_seq: Dict[str, int] = {}
+
+        # At-least-once delivery for opted-in topics
+        self.qos_topics = set(qos_topics or ())
+        self.delivery_timeout = delivery_timeout
+        self._unconfirmed: Dict[str, tuple] = {}  # msg_id -> (frame, future) awaiting a delivery report
+        self._dedup = DedupWindow()
+
+        # Outstanding RPC requests by correlation ID
+        self._pending_requests: Dict[str, _PendingRequest] = {}
+
+        # Auto-batching: non-critical, non-QoS publishes wait up to batch_window
+        # seconds and go out together as one publish_batch frame per lane
+        self.batch_window = batch_window
+        self._batches: Dict[int, List[Tuple[str, Any]]] = {}  # priority -> (topic, payload)
+        self._batch_timer: Optional[asyncio.TimerHandle] = None
+
+        # Retained topics: the hub keeps the last message (per value of the
+        # given payload field, or per topic if None) for new subscribers
+        self.retain_topics: Dict[str, Optional[str]] = dict(retain_topics or {})
+
+        self._url = None
+        self._client_type = None
+        self._client_id = None
+        self._connect_kwargs = {}
+        self._closing = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        _channels.add(self)
+
+    @property
+    def metrics_name(self) -> str:
+        """Label identifying this channel in metrics"""
+        return self._client_id or "anonymous"
+
     async def connect(self, url: str, client_type: str = None, client_id: str = None, **kwargs) -> bool:
+        self._url = url
+        self._client_type = client_type
+        self._client_id = client_id
+        self._connect_kwargs = kwargs
+        self._closing = False
+        self._loop = asyncio.get_running_loop()
         try:
-            self.connection = await websockets.connect(url, **kwargs)
-            self.is_connected = True
-            
-            # If client_type and client_id provided, register immediately
-            if client_type and client_id:
-                msg = {
-                    "type": "register",
-                    "client_type": client_type,
-                    "client_id": client_id
-                }
-                await self.connection.send(json.dumps(msg))
-            
+            await self._open()
             # Start listening in the background
             asyncio.create_task(self._listen())
             return True
         except Exception as e:
-            print(f"Connection failed: {e}")
+            logger.warning(f"Connection failed: {e}", extra={"client_id": self._client_id})
+            if self.reconnect:
+                # Keep trying in the background; subscriptions are replayed once connected
+                asyncio.create_task(self._reconnect_and_listen())
             return False
 
+    async def _open(self):
+        """Open the socket, register and (re)subscribe to every known topic"""
+        connection = await websockets.connect(self._url, **self._connect_kwargs)
+        try:
+            # If client_type and client_id provided, register immediately
+            if self._client_type and self._client_id:
+                msg = {
+                    "type": "register",
+                    "client_type": self._client_type,
+                    "client_id": self._client_id
+                }
+                await connection.send(serialization.dumps(msg))
+
+            for topic in self.subscriptions:
+                await self._send_subscribe(connection, topic)
+
+            # Anything still waiting for a delivery report is sent again;
+            # the hub and the receivers drop it if they already have it
+            for frame, _ in list(self._unconfirmed.values()):
+                await connection.send(frame)
+        except Exception:
+            await connection.close()
+            raise
+
+        if self._outbox is not None:
+            self._outbox.close()
+        limit_send_buffer(connection)
+        self._outbox = PriorityOutbox(connection.send, owner=self.metrics_name)
+        self.connection = connection
+        self.is_connected = True
+
     async def disconnect(self) -> bool:
+        self._closing = True
+        self._flush_batches()
+        await self.executor.shutdown()
+        if self._outbox is not None:
+            self._outbox.close()
         if self.connection:
             await self.connection.close()
             self.is_connected = False
             return True
         return False
 
+    def configure_topic(self, topic: str, concurrency: int = DEFAULT_CONCURRENCY, key: KeySpec = None,
+                        max_queue: int = DEFAULT_MAX_QUEUE, drop_oldest: bool = False):
+        """
+        Limit and order callback execution for a topic (call before subscribing)
+
+        Args:
+            topic: Topic name
+            concurrency: Maximum callbacks running at once for this topic
+            key: Payload field (or function) whose messages must be handled in order, e.g. "ert_id"
+            max_queue: Messages that may wait before the socket reader is paused
+            drop_oldest: Drop the oldest waiting message instead of pausing the reader
+                (for topics whose messages supersede each other)
+        """
+        self.executor.configure(topic, concurrency=concurrency, key=key, max_queue=max_queue,
+                                drop_oldest=drop_oldest)
+
+    def stats(self) -> Dict[str, dict]:
+        """Queue depth and callback latency per subscribed topic"""
+        return self.executor.stats()
+
     async def subscribe(self, topic: str, callback: Callable) -> bool:
         # 1. Register callback locally
-        if topic not in self.subscriptions:
+        is_new_topic = topic not in self.subscriptions
+        if is_new_topic:
             self.subscriptions[topic] = []
         self.subscriptions[topic].append(callback)
-        
-        # 2. Tell the Hub we want this topic
-        msg = {"type": "subscribe", "topic": topic}
-        await self.connection.send(json.dumps(msg))
+
+        # 2. Tell the Hub we want this topic (done on reconnect if we are offline)
+        if is_new_topic and self.is_connected:
+            await self._send_subscribe(self.connection, topic)
         return True
 
+    async def _send_subscribe(self, connection, topic: str):
+        msg = {"type": "subscribe", "topic": topic}
+        if topic in self.last_seq:
+            # Ask the hub to replay whatever we missed while disconnected
+            msg["last_seq"] = self.last_seq[topic]
+        await connection.send(serialization.dumps(msg))
+
     async def publish(self, topic: str, message: Any) -> bool:
+        """
+        Publish a message to a topic
+
+        On QoS 1 topics this waits for the hub's delivery report and only
+        returns True if at least one subscriber acknowledged the message.
+        Subscribers that are reconnecting are waited for (up to the hub's
+        retry window), so False means nobody subscribed got it.
+        """
+        if self._loop is not None and asyncio.get_running_loop() is not self._loop:
+            # Called from another thread's loop (e.g. a Flask request); the
+            # socket belongs to the loop we connected on, so hand it over
+            future = asyncio.run_coroutine_threadsafe(self.publish(topic, message), self._loop)
+            return await asyncio.wrap_future(future)
+
+        if topic in self.qos_topics:
+            return await self._publish_at_least_once(topic, message)
+
         if not self.is_connected: return False
-        
+
+        priority = priority_of(topic)
+        if self.batch_window > 0 and priority != PRIORITY_CRITICAL:
+            self._add_to_batch(priority, topic, message)
+            return True
+
         # Wrap in the format the Hub expects
-        msg = {
+        msg = self._mark_retained({
             "type": "publish",
             "topic": topic,
             "payload": message
-        }
-        await self.connection.send(json.dumps(msg))
+        })
+        # Queued by topic priority: a location flood does not hold up a resolution
+        if not self._outbox.put(serialization.dumps(msg), priority):
+            return False
+        MESSAGES_OUT.inc((self.metrics_name, topic))
         return True
 
-    async def _listen(self):
+    async def publish_many(self, messages: Iterable[Tuple[str, Any]]) -> bool:
+        """
+        Publish several messages at once, in order
+
+        Messages go to the hub as publish_batch frames (one per priority
+        lane), which the hub splits and forwards to each subscriber as one
+        frame. Messages on QoS 1 topics are published one by one, waiting
+        for their delivery reports.
+
+        Args:
+            messages: (topic, message) pairs
+
+        Returns:
+            True if every message was sent (and every QoS 1 message was
+            acknowledged by at least one subscriber)
+        """
+        if self._loop is not None and asyncio.get_running_loop() is not self._loop:
+            future = asyncio.run_coroutine_threadsafe(self.publish_many(list(messages)), self._loop)
+            return await asyncio.wrap_future(future)
+
+        # Whatever auto-batching holds was published earlier; it goes first
+        self._flush_batches()
+        by_priority: Dict[int, List[Tuple[str, Any]]] = {}
+        at_least_once = []
+        for topic, message in messages:
+            if topic in self.qos_topics:
+                at_least_once.append(self._publish_at_least_once(topic, message))
+            else:
+                by_priority.setdefault(priority_of(topic), []).append((topic, message))
+
+        sent = self.is_connected or not by_priority
+        if self.is_connected:
+            for priority, batch in by_priority.items():
+                sent = self._send_batch(priority, batch) and sent
+        if at_least_once:
+            sent = all(await asyncio.gather(*at_least_once)) and sent
+        return sent
+
+    def _add_to_batch(self, priority: int, topic: str, message: Any):
+        batch = self._batches.setdefault(priority, [])
+        batch.append((topic, message))
+        if len(batch) >= MAX_BATCH_MESSAGES:
+            self._send_batch(priority, self._batches.pop(priority))
+        elif self._batch_timer is None:
+            self._batch_timer = asyncio.get_running_loop().call_later(self.batch_window, self._flush_batches)
+
+    def _flush_batches(self):
+        """Send whatever auto-batching is holding"""
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        batches, self._batches = self._batches, {}
+        if self.is_connected:
+            for priority, batch in batches.items():
+                self._send_batch(priority, batch)
+
+    def _send_batch(self, priority: int, batch: List[Tuple[str, Any]]) -> bool:
+        """Queue (topic, payload) pairs of one priority as publish_batch frames"""
+        for start in range(0, len(batch), MAX_BATCH_MESSAGES):
+            chunk = batch[start:start + MAX_BATCH_MESSAGES]
+            if len(chunk) == 1:
+                frame = self._mark_retained({"type": "publish", "topic": chunk[0][0], "payload": chunk[0][1]})
+            else:
+                frame = {"type": "publish_batch", "messages": [
+                    self._mark_retained({"topic": topic, "payload": payload}) for topic, payload in chunk
+                ]}
+            if not self._outbox.put(serialization.dumps(frame), priority):
+                return False
+            for topic, _ in chunk:
+                MESSAGES_OUT.inc((self.metrics_name, topic))
+        return True
+
+    async def _publish_at_least_once(self, topic: str, message: Any) -> bool:
+        msg_id = uuid.uuid4().hex
+        frame = serialization.dumps(self._mark_retained({
+            "type": "publish",
+            "topic": topic,
+            "payload": message,
+            "msg_id": msg_id,
+            "qos": QOS_AT_LEAST_ONCE
+        }))
+        report = asyncio.get_running_loop().create_future()
+        self._unconfirmed[msg_id] = (frame, report)
         try:
-            async for raw_msg in self.connection:
-                data = json.loads(raw_msg)
-                topic = data.get("topic")
-                payload = data.get("payload")
-                
-                # Trigger callbacks
-                if topic in self.subscriptions:
-                    for cb in self.subscriptions[topic]:
-                        if asyncio.iscoroutinefunction(cb):
-                            # Schedule coroutine callback as a task to avoid 'never awaited' warning
-                            asyncio.create_task(cb(payload))
-                        else:
-                            cb(payload)
-        except Exception as e:
-            print(f"Listen loop error: {e}")
-            self.is_connected = False
\ No newline at end of file
+            # If the connection is down, _open() resends it once we are reconnected
+            if self.is_connected and self._outbox.put(frame, priority_of(topic)):
+                MESSAGES_OUT.inc((self.metrics_name, topic))
+            delivery = await asyncio.wait_for(report, timeout=self.delivery_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"No delivery report for '{topic}' message within {self.delivery_timeout}s",
+                extra={"topic": topic, "msg_id": msg_id}
+            )
+            return False
+        finally:
+            self._unconfirmed.pop(msg_id, None)
+
+        if delivery.get("failed"):
+            logger.warning(
+                f"'{topic}' message not acknowledged by: {delivery['failed']}",
+                extra={"topic": topic, "msg_id": msg_id}
+            )
+        return len(delivery.get("delivered", [])) > 0
+
+    def _mark_retained(self, frame: dict) -> dict:
+        """Ask the hub to retain a publish on a retained topic"""
+        field = self.retain_topics.get(frame["topic"], False)
+        if field is False:
+            return frame
+        frame["retain"] = True
+        if field is not None:
+            payload = frame.get("payload")
+            key = payload.get(field) if isinstance(payload, dict) else getattr(payload, field, None)
+            if key is not None:
+                frame["retain_key"] = str(key)
+        return frame
+
+    async def clear_retained(self, topic: str, key: Optional[str] = None) -> bool:
+        """
+        Make the hub forget a retained message
+
+        Args:
+            topic: Topic of the message
+            key: Key it was retained under (None: the topic's single value)
+
+        Returns:
+            False if not connected
+        """
+        if self._loop is not None and asyncio.get_running_loop() is not self._loop:
+            future = asyncio.run_coroutine_threadsafe(self.clear_retained(topic, key), self._loop)
+            return await asyncio.wrap_future(future)
+        if not self.is_connected:
+            return False
+        frame = {"type": "clear_retained", "topic": topic}
+        if key is not None:
+            frame["retain_key"] = key
+        # Same lane as the topic, so it cannot overtake the message it clears
+        return self._outbox.put(serialization.dumps(frame), priority_of(topic))
+
+    async def request(self, topic_or_client: str, payload: Any, timeout: float = 5.0,
+                      topic: Optional[str] = None, expected: Optional[int] = None,
+                      retain: bool = False) -> List[dict]:
+        """
+        Send a request and wait for the responses
+
+        Subscribers answer a request by returning a value from their callback
+        for the topic. With only ``topic_or_client`` given the request goes to
+        every subscriber of that topic; when ``topic`` is also given,
+        ``topic_or_client`` is a client ID and only that client's callbacks
+        for ``topic`` see it. The hub sequences and buffers a direct request
+        like a publish, so a target that is reconnecting gets it when it
+        resumes; on a QoS topic it is retried as well.
+
+        Args:
+            topic_or_client: Topic to fan out on, or the target client ID
+            payload: Request payload
+            timeout: Seconds to wait for responses
+            topic: Topic whose callbacks handle a direct (client) request
+            expected: Stop waiting after this many responses (default: one per recipient)
+            retain: Have the hub retain the request as a plain message; a direct
+                request is kept for its target under the target's ID, so the
+                target gets it again if it reconnects afresh (clear_retained
+                forgets it)
+
+        Returns:
+            Responses received before the deadline, each as
+            {"responder": client_id, "payload": ..., "rtt": seconds}
+        """
+        if self._loop is not None and asyncio.get_running_loop() is not self._loop:
+            future = asyncio.run_coroutine_threadsafe(
+                self.request(topic_or_client, payload, timeout, topic, expected, retain), self._loop
+            )
+            return await asyncio.wrap_future(future)
+
+        if not self.is_connected:
+            return []
+
+        correlation_id = uuid.uuid4().hex
+        msg = {"type": "request", "correlation_id": correlation_id, "payload": payload}
+        if topic is None:
+            msg["topic"] = topic_or_client
+        else:
+            msg["topic"] = topic
+            msg["target"] = topic_or_client
+        if msg["topic"] in self.qos_topics:
+            # Let the hub retry recipients that miss it; dedup stops double replies
+            msg["msg_id"] = correlation_id
+            msg["qos"] = QOS_AT_LEAST_ONCE
+        if retain:
+            msg["retain"] = True
+
+        loop = asyncio.get_running_loop()
+        pending = _PendingRequest(loop.create_future(), expected)
+        pending.timer = loop.call_later(timeout, pending.complete)
+        self._pending_requests[correlation_id] = pending
+        try:
+            if not self._outbox.put(serialization.dumps(msg), priority_of(msg["topic"])):
+                pending.complete()
+                return pending.responses
+            MESSAGES_OUT.inc((self.metrics_name, msg["topic"]))
+            return await pending.future
+        finally:
+            del self._pending_requests[correlation_id]
+
+    async def _send_response(self, correlation_id: str, reply_to: str, payload: Any):
+        # If the connection is gone the requester times out
+        self._outbox.put(serialization.dumps({
+            "type": "response",
+            "correlation_id": correlation_id,
+            "reply_to": reply_to,
+            "payload": payload
+        }), PRIORITY_CRITICAL)
+
+    async def _listen(self):
+        received = 0
+        while True:
+            try:
+                async for raw_msg in self.connection:
+                    MESSAGES_IN.inc((self.metrics_name,))
+                    received += 1
+                    if received % READ_BATCH == 0:
+                        await asyncio.sleep(0)  # let the callbacks and the outbox run
+                    # Waits when the topic's queue is full: backpressure on the socket
+                    await self._dispatch(serialization.loads(raw_msg))
+            except Exception as e:
+                logger.warning(f"Listen loop error: {e}", extra={"client_id": self._client_id})
+            self.is_connected = False
+
+            if self._closing or not self.reconnect:
+                return
+            if not await self._reconnect():
+                return
+
+    async def _reconnect_and_listen(self):
+        if await self._reconnect():
+            await self._listen()
+
+    async def _reconnect(self) -> bool:
+        """Retry the connection with jittered exponential backoff until it succeeds"""
+        attempt = 0
+        while not self._closing:
+            ceiling = min(self.reconnect_max_delay, self.reconnect_base_delay * 2 ** min(attempt, 16))
+            await asyncio.sleep(random.uniform(0, ceiling))
+            try:
+                await self._open()
+                RECONNECTS.inc((self.metrics_name,))
+                logger.info(f"Reconnected to hub after {attempt + 1} attempt(s)", extra={"client_id": self._client_id})
+                return True
+            except Exception as e:
+                attempt += 1
+                logger.info(f"Reconnect attempt {attempt} failed: {e}", extra={"client_id": self._client_id})
+        return False
+
+    async def _dispatch(self, data: dict):
+        topic = data.get("topic")
+        msg_type = data.get("type")
+
+        if msg_type == "batch":
+            # Several frames the hub sent together; handled as if they came one by one
+            for frame in data.get("frames", ()):
+                await self._dispatch(frame)
+            return
+
+        if msg_type == "delivery":
+            entry = self._unconfirmed.get(data.get("msg_id"))
+            if entry is not None and not entry[1].done():
+                entry[1].set_result(data)
+            return
+
+        if msg_type == "error":
+            # The hub rejected one of our frames; fail whatever waits on it now
+            logger.warning(f"Hub rejected a '{data.get('frame_type')}' frame: {data.get('error')}",
+                           extra={"client_id": self._client_id, "topic": topic})
+            entry = self._unconfirmed.get(data.get("msg_id"))
+            if entry is not None and not entry[1].done():
+                entry[1].set_result({"delivered": [], "failed": [], "rejected": data.get("error")})
+            pending = self._pending_requests.get(data.get("correlation_id"))
+            if pending is not None:
+                pending.complete()
+            return
+
+        if msg_type == "routed" or msg_type == "response":
+            pending = self._pending_requests.get(data.get("correlation_id"))
+            if pending is None:
+                return  # late answer to a request that already timed out
+            if msg_type == "routed":
+                if pending.expected is None:
+                    pending.expected = data.get("recipients", 0)
+            else:
+                pending.responses.append({
+                    "responder": data.get("responder"),
+                    "payload": data.get("payload"),
+                    "rtt": time.perf_counter() - pending.started
+                })
+            pending.check_complete()
+            return
+
+        if msg_type == "subscribed":
+            seq = data.get("seq", 0)
+            known = self.last_seq.get(topic)
+            if known is None:
+                # Fresh subscription: only messages after this point are ours
+                self.last_seq[topic] = seq
+            elif seq < known:
+                # The hub restarted and its counters went back to zero
+                self.last_seq[topic] = 0
+            return
+
+        msg_id = data.get("msg_id")
+        if msg_id is not None and msg_id in self._dedup:
+            # Handled before: ack again, the previous ack may have been lost
+            await self._send_ack(msg_id)
+            return
+
+        seq = data.get("seq")
+        if seq is not None:
+            if seq <= self.last_seq.get(topic, 0):
+                # Overlap between replay and live traffic. Not acked: this
+                # copy was never handled, so the hub must not count it delivered
+                return
+            self.last_seq[topic] = seq
+        if msg_id is not None:
+            self._dedup.add(msg_id)
+
+        # Requests are answered with the callbacks' return value
+        on_result = None
+        correlation_id = data.get("correlation_id")
+        if correlation_id is not None:
+            reply_to = data.get("reply_to")
+
+            async def reply(result):
+                await self._send_response(correlation_id, reply_to, result)
+            on_result = reply
+
+        # Trigger callbacks
+        if topic in self.subscriptions:
+            await self.executor.submit(topic, self.subscriptions[topic], data.get("payload"), on_result)
+        if msg_id is not None:
+            # Acked once it is queued for its callback (or there is none to run)
+            await self._send_ack(msg_id)
+
+    async def _send_ack(self, msg_id: str):
+        # If the connection is gone the hub retries, and we ack the retry
+        self._outbox.put(serialization.dumps({"type": "ack", "msg_id": msg_id}), PRIORITY_CRITICAL)
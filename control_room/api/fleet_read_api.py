@@ -0,0 +1,81 @@
+"""Read-only fleet endpoints served by API worker processes
+
+Answers from the shared-memory fleet table instead of the repositories,
+so any number of worker processes can serve them while the Control Room
+process keeps ingesting locations.
+"""
+import logging
+import time
+
+import numpy as np
+from flask import Blueprint, jsonify, request
+
+from control_room.repository.fleet_table import SharedFleetTable
+from control_room.repository.position_index import STATUS_BY_CODE, dead_reckon
+from control_room.service.unit_service import DEAD_RECKONING_HORIZON
+
+logger = logging.getLogger(__name__)
+
+fleet_read_bp = Blueprint('fleet_read', __name__)
+
+
+def init_fleet_read_api(table: SharedFleetTable):
+    """Initialize the read API with the attached fleet table"""
+    fleet_read_bp.table = table
+    return fleet_read_bp
+
+
+@fleet_read_bp.route('/units/positions', methods=['GET'])
+def get_unit_positions():
+    """Dead-reckoned positions of all units (same response as the Control Room's endpoint)"""
+    try:
+        at = request.args.get('at', type=float)
+        now = time.time() if at is None else at
+        records = fleet_read_bp.table.read().records
+        records = records[~np.isnan(records["x"])]
+        xs, ys, ages = dead_reckon(records["x"], records["y"], records["vx"], records["vy"],
+                                   records["reported_at"], now, DEAD_RECKONING_HORIZON)
+        return jsonify({
+            'units': [
+                {
+                    'id': unit_id.decode(),
+                    'x': round(float(x), 2),
+                    'y': round(float(y), 2),
+                    'age': None if age != age else round(float(age), 1)  # NaN: no report yet
+                }
+                for unit_id, x, y, age in zip(records["id"], xs, ys, ages)
+            ]
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error reading unit positions: {str(e)}")
+        return jsonify({
+            'error': 'Internal server error'
+        }), 500
+
+
+@fleet_read_bp.route('/units', methods=['GET'])
+def list_units():
+    """Last reported position, status and assignment of every unit"""
+    try:
+        snapshot = fleet_read_bp.table.read()
+        return jsonify({
+            'published_at': snapshot.published_at,
+            'units': [
+                {
+                    'id': record["id"].decode(),
+                    'x': None if record["x"] != record["x"] else float(record["x"]),
+                    'y': None if record["y"] != record["y"] else float(record["y"]),
+                    'status': STATUS_BY_CODE[int(record["status"])].value,
+                    'assigned_incident': record["assigned"].decode() or None,
+                    'busy': bool(record["busy"])
+                }
+                for record in snapshot.records
+            ]
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error listing units: {str(e)}")
+        return jsonify({
+            'error': 'Internal server error'
+        }), 500
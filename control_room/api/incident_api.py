@@ -2,17 +2,24 @@
 from flask import Blueprint, request, jsonify
 import logging
 import asyncio
-from control_room.service.incident_service import IncidentService
+import datetime
+from control_room.repository.in_memory_incident_repository import IncidentArchivedError
+from control_room.service.incident_service import (
+    IncidentService, IncidentNotWaitingError, NoUnitAvailableError
+)
 from control_room.service.unit_service import UnitService
+from control_room.service.candidate_service import CandidateService
 
 logger = logging.getLogger(__name__)
 
 control_room_bp = Blueprint('control_room', __name__)
 
-def init_control_room_api(incident_service: IncidentService, unit_service: UnitService):
+def init_control_room_api(incident_service: IncidentService, unit_service: UnitService,
+                          candidate_service: CandidateService = None):
     """Initialize the Control Room API with service dependencies"""
     control_room_bp.incident_service = incident_service
     control_room_bp.unit_service = unit_service
+    control_room_bp.candidate_service = candidate_service
     return control_room_bp
 
 @control_room_bp.route('/incidents/<incident_id>', methods=['GET'])
@@ -26,7 +33,7 @@ def get_incident_by_id(incident_id: str):
                 'incident_id': incident_id
             }), 404
         
-        return jsonify(incident.to_dict()), 200
+        return jsonify(incident), 200
         
     except Exception as e:
         logger.error(f"Error retrieving incident {incident_id}: {str(e)}")
@@ -34,13 +41,76 @@ def get_incident_by_id(incident_id: str):
             'error': 'Internal server error'
         }), 500
 
+TIME_RANGE_PARAMS = ('created_after', 'created_before', 'resolved_after', 'resolved_before')
+
+def parse_time_param(name: str):
+    """
+    Time query parameter as a naive UTC datetime
+
+    Accepts ISO 8601 (naive means UTC), epoch seconds, or negative
+    seconds relative to now (``resolved_after=-3600``: the last hour).
+
+    Raises:
+        ValueError: If the value is none of these
+    """
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            moment = datetime.datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"{name} must be ISO 8601, epoch seconds or negative seconds before now")
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return moment
+    if seconds < 0:
+        return datetime.datetime.utcnow() + datetime.timedelta(seconds=seconds)
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).replace(tzinfo=None)
+
 @control_room_bp.route('/incidents', methods=['GET'])
 def list_incidents():
+    """
+    List incidents
+
+    Without query parameters: every incident still in memory. With
+    ?created_after=&created_before=&resolved_after=&resolved_before=:
+    the incidents in those time ranges, archived ones included. With
+    ?stats=true: counts and time-to-resolve aggregates of them instead,
+    per window of ?bucket=<seconds> if given.
+    """
     try:
-        incidents = control_room_bp.incident_service.get_all_incidents()
-        incidents_data = [incident.to_dict() for incident in incidents]
-        
-        return jsonify(incidents_data), 200
+        try:
+            bounds = {name: parse_time_param(name) for name in TIME_RANGE_PARAMS}
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        stats = request.args.get('stats', 'false').lower() in ('1', 'true', 'yes')
+        bucket = request.args.get('bucket', type=float)
+        if bucket is not None and bucket <= 0:
+            return jsonify({'error': 'bucket must be a positive number of seconds'}), 400
+
+        if not stats and all(bound is None for bound in bounds.values()):
+            incidents = control_room_bp.incident_service.get_all_incidents()
+            # Models are encoded from their cached JSON by the app's JSON provider
+            return jsonify(incidents), 200
+
+        incidents = control_room_bp.incident_service.find_incidents(**bounds)
+        if not stats:
+            return jsonify(incidents), 200
+
+        by_resolution = bounds['resolved_after'] is not None or bounds['resolved_before'] is not None
+        try:
+            summary = control_room_bp.incident_service.incident_stats(
+                incidents, by='resolved' if by_resolution else 'created', bucket_seconds=bucket
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        summary.update({
+            name: bound.isoformat() for name, bound in bounds.items() if bound is not None
+        })
+        return jsonify(summary), 200
         
     except Exception as e:
         logger.error(f"Error listing incidents: {str(e)}")
@@ -55,16 +125,6 @@ def create_incident():
                 'error': 'Invalid JSON payload'
             }), 400
         
-        print(f"📥 RECEIVED DATA: {data}")  # DEBUG
-        
-        # Give error if the user try to create a new incident while there is still a one that is not resolved
-        open_incidents = control_room_bp.incident_service.get_open_incidents()
-        if len(open_incidents) > 0:
-            return jsonify({
-                'error': 'There is already an open incident. Please resolve it before creating a new one.',
-                'open_incidents': [incident.to_dict() for incident in open_incidents]
-            }), 400
-        
         if 'x' not in data:
             return jsonify({
                 'error': 'Missing x coordinate'
@@ -85,19 +145,19 @@ def create_incident():
                 'error': 'Invalid y coordinate'
             }), 400
         
-        print(f"📤 Creating incident at ({data['x']}, {data['y']})")  # DEBUG
-        
-        incident = control_room_bp.incident_service.create_incident(data['x'], data['y'])
-        print(f"✅ Incident created: {incident.id}")  # DEBUG
+        required_units = data.get('required_units', 1)
+        if not isinstance(required_units, int) or isinstance(required_units, bool) or required_units < 1:
+            return jsonify({
+                'error': 'required_units must be a positive integer'
+            }), 400
+
+        incident = control_room_bp.incident_service.create_incident(data['x'], data['y'], required_units)
+        logger.info(f"✅ Incident created at ({data['x']}, {data['y']})", extra={"incident_id": incident.id})
         
-        return jsonify(incident.to_dict()), 201
+        return jsonify(incident), 201
 
     except Exception as e:
-        print(f"❌ ERROR: {str(e)}")  # DEBUG
-        print(f"❌ ERROR TYPE: {type(e).__name__}")  # DEBUG
-        import traceback
-        print(f"❌ TRACEBACK: {traceback.format_exc()}")  # DEBUG
-        logger.error(f"Error creating incident: {str(e)}")
+        logger.exception(f"Error creating incident: {str(e)}")
         return jsonify({
             'error': 'Internal server error'
         }), 500
@@ -113,9 +173,13 @@ def delete_incident(incident_id):
     Returns:
         200: Incident deleted successfully with success message
         404: Incident not found with error message
+        409: Incident is archived (archived incidents are read-only)
     """
-    deleted = control_room_bp.incident_service.delete_incident(incident_id)
-    
+    try:
+        deleted = control_room_bp.incident_service.delete_incident(incident_id)
+    except IncidentArchivedError:
+        return jsonify({'error': 'Incident archived', 'incident_id': incident_id}), 409
+
     if not deleted:
         return jsonify({"error": "Incident not found"}), 404
     
@@ -129,6 +193,8 @@ def update_incident(incident_id):
         incident_id: The unique identifier of the incident to update
     Returns:
         200: Incident updated successfully with updated incident data
+        404: Incident not found
+        409: Incident is archived (archived incidents are read-only)
     """
 
     data = request.get_json()
@@ -159,8 +225,12 @@ def update_incident(incident_id):
     
     try:
         incident = control_room_bp.incident_service.update_incident(incident_id, data['x'], data['y'])
-        return jsonify(incident.to_dict()), 200
+        return jsonify(incident), 200
 
+    except IncidentArchivedError:
+        return jsonify({'error': 'Incident archived', 'incident_id': incident_id}), 409
+    except ValueError:
+        return jsonify({'error': 'Incident not found', 'incident_id': incident_id}), 404
     except Exception as e:
         logger.error(f"Error updating incident {incident_id}: {str(e)}")
         return jsonify({
@@ -170,26 +240,35 @@ def update_incident(incident_id):
 @control_room_bp.route('/incidents/dispatch', methods=['POST'])
 def dispatch_incident():
     """
-    Dispatch the currently running incident to the Emergency Response Team (ERT).
+    Dispatch an incident to the Emergency Response Team (ERT).
 
     Behavior:
-    - If there is no running (open) incident, return 400.
-    - Otherwise dispatch the single running incident and return 200.
+    - Dispatch the incident given as {"incident_id": ...} in the body, or
+      else the oldest incident not dispatched yet.
+    - If there is no such incident, return 400 (404 for an unknown ID).
+      The incident is claimed atomically, so of concurrent dispatches of
+      the same incident only one goes ahead; the others get 400.
+    - If no idle unit can take it, return 503; it is never broadcast.
     """
     try:
-        open_incidents = control_room_bp.incident_service.get_open_incidents()
-
-        if not open_incidents:
-            return jsonify({'error': 'No running incident to dispatch'}), 400
-
-        incident = open_incidents[0]
-        incident_id = incident.id
+        data = request.get_json(silent=True) or {}
+        incident_id = data.get('incident_id')
+        if incident_id is not None:
+            incident = control_room_bp.incident_service.get_incident_by_id(incident_id)
+            if incident is None:
+                return jsonify({'error': 'Incident not found', 'incident_id': incident_id}), 404
+        else:
+            waiting = control_room_bp.incident_service.get_waiting_incidents()
+            if not waiting:
+                return jsonify({'error': 'No incident waiting to be dispatched'}), 400
+            incident = waiting[0]
+            incident_id = incident.id
 
         # Run the async dispatch method
         try:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
-            success = loop.run_until_complete(
+            acknowledgments = loop.run_until_complete(
                 control_room_bp.incident_service.dispatch_incident(incident_id)
             )
             loop.close()
@@ -201,38 +280,116 @@ def dispatch_incident():
                 with concurrent.futures.ThreadPoolExecutor() as pool:
                     future = pool.submit(asyncio.run,
                         control_room_bp.incident_service.dispatch_incident(incident_id))
-                    success = future.result()
+                    acknowledgments = future.result()
             else:
-                success = loop.run_until_complete(
+                acknowledgments = loop.run_until_complete(
                     control_room_bp.incident_service.dispatch_incident(incident_id)
                 )
 
-        if success:
+        if acknowledgments:
             return jsonify({
                 'message': 'Incident dispatched successfully',
-                'incident': incident.to_dict()
+                'incident': incident,
+                'acknowledged_by': [
+                    {
+                        'ert_id': ack['ert_id'],
+                        'rtt_ms': ack['rtt_ms'],
+                        'eta_seconds': (ack['acknowledgment'] or {}).get('eta_seconds')
+                    }
+                    for ack in acknowledgments
+                ]
             }), 200
         else:
             return jsonify({
-                'error': 'Failed to dispatch incident'
-            }), 500
+                'error': 'No ERT unit acknowledged the incident before the deadline',
+                'incident': incident
+            }), 504
 
+    except IncidentNotWaitingError:
+        return jsonify({'error': 'Incident was already dispatched', 'incident': incident}), 400
+    except NoUnitAvailableError:
+        return jsonify({'error': 'No unit available', 'incident_id': incident_id}), 503
     except Exception as e:
         logger.error(f"Error dispatching incident: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
-# Add endpoint that return running incident (it is always one or zero)
+@control_room_bp.route('/incidents/assignments', methods=['GET'])
+def get_assignments():
+    """Preview the joint unit assignment for all incidents not yet dispatched"""
+    try:
+        plan = control_room_bp.incident_service.plan_assignments()
+        return jsonify({
+            'assignments': [
+                {'incident_id': incident_id, 'units': units}
+                for incident_id, units in plan.items()
+            ]
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error planning assignments: {str(e)}")
+        return jsonify({
+            'error': 'Internal server error'
+        }), 500
+
+@control_room_bp.route('/incidents/<incident_id>/candidates', methods=['GET'])
+def get_incident_candidates(incident_id: str):
+    """Units ranked by ETA to the incident (?limit=10&include_busy=false)"""
+    try:
+        if control_room_bp.candidate_service is None:
+            return jsonify({'error': 'Candidate ranking is not available'}), 503
+
+        incident = control_room_bp.incident_service.get_incident_by_id(incident_id)
+        if incident is None:
+            return jsonify({
+                'error': 'Incident not found',
+                'incident_id': incident_id
+            }), 404
+
+        limit = request.args.get('limit', default=10, type=int)
+        if limit is None or limit < 1:
+            return jsonify({'error': 'limit must be a positive integer'}), 400
+        include_busy = request.args.get('include_busy', 'false').lower() in ('1', 'true', 'yes')
+
+        candidates = control_room_bp.candidate_service.rank(
+            incident.x, incident.y, limit=limit, include_busy=include_busy
+        )
+        return jsonify({
+            'incident_id': incident.id,
+            'candidates': candidates
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error ranking candidates for incident {incident_id}: {str(e)}")
+        return jsonify({
+            'error': 'Internal server error'
+        }), 500
+
+@control_room_bp.route('/units/positions', methods=['GET'])
+def get_unit_positions():
+    """Current (dead-reckoned) positions of all units, for the live map (?at=<epoch seconds>)"""
+    try:
+        at = request.args.get('at', type=float)
+        return jsonify({
+            'units': control_room_bp.unit_service.get_estimated_positions(at)
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error estimating unit positions: {str(e)}")
+        return jsonify({
+            'error': 'Internal server error'
+        }), 500
+
+# Add endpoint that return the oldest running incident (GET /incidents lists all of them)
 # This endpoint will be used by control room frontend to show current location of the incident and assigned units
 @control_room_bp.route('/incidents/open', methods=['GET'])
 def get_open_incidents():
     try:
         open_incidents = control_room_bp.incident_service.get_open_incidents()
-        open_incidents_data = [incident.to_dict() for incident in open_incidents]
         
-        if not open_incidents_data:
+        if not open_incidents:
             return jsonify({}), 200  # Return empty JSON if no open incidents
         
-        return jsonify(open_incidents_data[0]), 200
+        return jsonify(open_incidents[0]), 200
         
     except Exception as e:
         logger.error(f"Error retrieving open incidents: {str(e)}")
@@ -240,7 +397,7 @@ def get_open_incidents():
             'error': 'Internal server error'
         }), 500
 
-# Add endpoint to get assigned units info for the running incident (it is always one or zero)
+# Add endpoint to get assigned units info for the oldest running incident
 @control_room_bp.route('/units/open_incident', methods=['GET'])
 def get_units_for_open_incident():
     try:
@@ -252,7 +409,7 @@ def get_units_for_open_incident():
         incident = open_incidents[0]
         all_units = control_room_bp.unit_service.get_all_units()
         assigned_units_info = [
-            unit.to_dict() for unit in all_units
+            unit for unit in all_units
             if unit.assigned_incident == incident.id
         ]
         
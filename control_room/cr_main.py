@@ -3,6 +3,7 @@ Control Room Application Entry Point
 Integrated Flask API + WebSocket Communication
 """
 import asyncio
+import os
 import sys
 import logging
 import threading
@@ -15,18 +16,25 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from control_room.repository.in_memory_incident_repository import InMemoryIncidentRepository
 from control_room.repository.in_memory_unit_repository import InMemoryUnitRepository
+from control_room.repository.cold_incident_store import (
+    DEFAULT_ARCHIVE_AFTER, ColdIncidentStore, IncidentArchiver
+)
 from control_room.service.incident_service import IncidentService
 from control_room.service.unit_service import UnitService
+from control_room.service.candidate_service import CandidateService
+from control_room.service.assignment_service import AssignmentService
+from control_room.service.geofence_service import GeofenceEngine
 from control_room.api.incident_api import control_room_bp, init_control_room_api
 from communication.websocket_communication import WebSocketCommunication
+from communication.qos import CRITICAL_TOPICS
+from communication.metrics import instrument_blueprint, metrics_response
+from communication.logging_setup import setup_logging
+from communication.serialization import install_json_provider
 from communication.handlers import WebSocketHandlers
-from control_room.hub_server import main as hub_main
+from control_room.hub_server import main as hub_main, start_shards as start_hub_shards
+from control_room.repository.fleet_table import SharedFleetTable, FleetTablePublisher
+from control_room.read_workers import DEFAULT_READ_PORT, start_read_workers
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
@@ -34,18 +42,29 @@ class ControlRoomApplication:
     """Control Room application with Flask API and WebSocket communication"""
     
     def __init__(self):
-        # Initialize repositories
-        self.incident_repository = InMemoryIncidentRepository()
+        # Initialize repositories; with CR_ARCHIVE_DIR, resolved incidents older
+        # than CR_ARCHIVE_AFTER seconds move to compressed segments on disk
+        archive_dir = os.environ.get("CR_ARCHIVE_DIR")
+        self.archive_after = float(os.environ.get("CR_ARCHIVE_AFTER", DEFAULT_ARCHIVE_AFTER))
+        self.incident_repository = InMemoryIncidentRepository(
+            cold_store=ColdIncidentStore(archive_dir) if archive_dir else None
+        )
         # Unit repository + service (used by websocket handlers)
         self.unit_repository = InMemoryUnitRepository()
         
-        # Initialize communication channel
-        self.communication_channel = WebSocketCommunication()
+        # Initialize communication channel (at-least-once delivery for dispatches)
+        self.communication_channel = WebSocketCommunication(qos_topics=CRITICAL_TOPICS)
         
-        # Initialize service with callbacks from Service Layer
+        # Arrival/departure detection around open incidents
+        self.geofence_engine = GeofenceEngine()
+
+        # Initialize service with callbacks from Service Layer; dispatches go to
+        # the units picked by the joint (min total ETA) assignment
         self.incident_service = IncidentService(
             incident_repository=self.incident_repository,
-            communication_channel=self.communication_channel
+            communication_channel=self.communication_channel,
+            assignment_service=AssignmentService(self.unit_repository.positions),
+            geofence_engine=self.geofence_engine
         )
 
         # Unit service used by handlers (optional for IncidentService)
@@ -54,24 +73,44 @@ class ControlRoomApplication:
             communication_channel=self.communication_channel
         )
 
+        # Ranks units by ETA using the repository's position index
+        self.candidate_service = CandidateService(self.unit_repository.positions)
+
         # Handlers for websocket topics
         self.websocket_handlers = WebSocketHandlers(
             incident_service=self.incident_service,
             incident_repository=self.incident_repository,
-            unit_service=self.unit_service
+            unit_service=self.unit_service,
+            geofence_engine=self.geofence_engine
         )
         
         # Create Flask app
         self.app = self._create_flask_app()
+
+        # Optional read workers: CR_READ_WORKERS processes serving fleet reads
+        # from a shared-memory copy of the position index
+        self.read_workers = int(os.environ.get("CR_READ_WORKERS", "0"))
+        self.read_port = int(os.environ.get("CR_READ_PORT", DEFAULT_READ_PORT))
+        self.fleet_table = None
+
+        # Optional hub shards: HUB_SHARDS processes sharing port 8765
+        self.hub_shards = int(os.environ.get("HUB_SHARDS", "1"))
+        # Optional traffic log of every frame the hub receives
+        self.hub_record = os.environ.get("HUB_RECORD")
+        # Optional file keeping retained messages across restarts
+        self.hub_retain = os.environ.get("HUB_RETAIN_FILE")
     
     def _create_flask_app(self):
         """Create and configure the Flask application"""
         app = Flask(__name__)
-        app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
+        install_json_provider(app)  # compact output; models come from their JSON cache
         CORS(app)
         
         logger.info("📋 Registering Control Room blueprints...")
-        control_room_bp_instance = init_control_room_api(self.incident_service, self.unit_service)
+        control_room_bp_instance = init_control_room_api(
+            self.incident_service, self.unit_service, self.candidate_service
+        )
+        instrument_blueprint(control_room_bp_instance)
         app.register_blueprint(control_room_bp_instance, url_prefix='/cr')
         
         # Health check endpoint
@@ -83,6 +122,11 @@ class ControlRoomApplication:
                 'service': 'emergency-response-system',
                 'component': 'control-room'
             }, 200
+
+        # Prometheus scrape endpoint (hub, communication layer and API)
+        @app.route('/metrics', methods=['GET'])
+        def metrics():
+            return metrics_response()
         
         logger.info("✓ Flask application configured successfully")
         return app
@@ -102,6 +146,11 @@ class ControlRoomApplication:
             logger.info("📝 Control Room registered with hub")
             
             logger.info("📡 Setting up WebSocket subscriptions...")
+            # Location bursts: a few updates in parallel, but each unit's in order.
+            # A backlog drops stale positions rather than stalling acks and resolutions
+            self.communication_channel.configure_topic(
+                "location", concurrency=4, key="ert_id", max_queue=5000, drop_oldest=True
+            )
             # Subscribe to ERT messages using callbacks from websocket handlers
             await self.communication_channel.subscribe(
                 "location",
@@ -144,6 +193,7 @@ class ControlRoomApplication:
         logger.info("🚀 Starting Flask API server...")
         logger.info("   Control Room API: http://127.0.0.1:5001/cr/incidents")
         logger.info("   Health check: http://127.0.0.1:5001/health")
+        logger.info("   Metrics: http://127.0.0.1:5001/metrics")
         
         self.app.run(
             host='127.0.0.1',
@@ -152,14 +202,35 @@ class ControlRoomApplication:
             use_reloader=False  # Disable reloader in threaded mode
         )
     
+    def start_read_workers(self):
+        """Share the fleet through shared memory and start the read worker processes"""
+        self.fleet_table = SharedFleetTable.create()
+        self.fleet_table.publish(self.unit_repository.positions)
+        FleetTablePublisher(self.fleet_table, self.unit_repository.positions).start()
+        start_read_workers(self.fleet_table, self.read_workers, port=self.read_port)
+        logger.info(f"📖 {self.read_workers} read worker(s): http://127.0.0.1:{self.read_port}/cr/units/positions")
+
     def start(self):
         """Start Hub Server, Flask API, and WebSocket in separate threads"""
-        # Start Hub Server in a separate thread
+        if self.read_workers > 0:
+            self.start_read_workers()
+        if self.incident_repository.cold_store is not None:
+            IncidentArchiver(self.incident_repository, archive_after=self.archive_after).start()
+
+        # Start Hub Server in a separate thread (shard 0 when sharded: it
+        # handles unit disconnects for every shard)
+        ipc_dir = (
+            start_hub_shards(self.hub_shards, self.hub_record, self.hub_retain) if self.hub_shards > 1 else None
+        )
+
         def run_hub():
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             try:
-                loop.run_until_complete(hub_main(self.websocket_handlers))
+                loop.run_until_complete(hub_main(
+                    self.websocket_handlers, shards=self.hub_shards, ipc_dir=ipc_dir,
+                    record_path=self.hub_record, retain_path=self.hub_retain
+                ))
             finally:
                 loop.close()
         
@@ -182,6 +253,8 @@ class ControlRoomApplication:
 
 def main():
     """Entry point"""
+    # Non-blocking JSON logging for the API, hub and WebSocket loop
+    setup_logging("control-room")
     logger.info("=" * 60)
     logger.info("🎛️  Control Room Application Starting")
     logger.info("=" * 60)
@@ -0,0 +1 @@
+"""Building blocks used by the WebSocket hub server"""
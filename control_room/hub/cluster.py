@@ -0,0 +1,387 @@
+"""Links between hub shards
+
+With ``HUB_SHARDS=N`` the hub runs as N processes that all accept
+WebSocket connections on port 8765 (``SO_REUSEPORT``), so parsing and
+fan-out use N cores. A client can be connected to any shard, so the
+shards share what a single hub process knows by itself:
+
+- every topic has an owner shard (a hash of the topic over the live
+  shards). Publishes arriving at other shards are forwarded to the owner.
+  The owner stamps the sequence number, tracks QoS 1 acks and sends the
+  stamped frame to every other shard. Each shard then fans it out to its
+  own subscribers and keeps it in its replay buffer, so per-topic order
+  and resume work wherever a client connects,
+- presence: which client key is connected to which shard, so direct
+  requests, RPC responses, retries and delivery reports reach clients on
+  other shards,
+- subscriptions: which keys on other shards subscribe to a topic, so the
+  owner knows every QoS 1 recipient and RPC requesters learn the real
+  number of responders,
+- retained messages (``control_room/hub/retained.py``), so a new
+  subscriber gets them whichever shard it lands on.
+
+The shards form a full mesh of Unix domain sockets in a private
+directory. Each link carries length-prefixed messages in send order, and
+writes are coalesced per event loop iteration. Frames are passed on as
+bytes and never parsed again. A shard whose link drops is treated as
+gone: its clients are removed and the topics it owned move to the
+remaining shards.
+"""
+
+import asyncio
+import logging
+import os
+import struct
+import zlib
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from communication import serialization
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 30.0  # seconds to wait for every peer at startup
+
+# Message kinds
+FRAME = 1     # stamped frame from a topic's owner: topic, seq, target, frame
+PUBLISH = 2   # publish forwarded to the topic's owner: header, payload JSON
+SEND = 3      # frame for one client connected to the receiving shard
+CONTROL = 4   # presence, subscriptions and acks: JSON list
+
+_HEADER = struct.Struct(">IB")  # body length, kind
+_LENGTH = struct.Struct(">I")
+_FRAME = struct.Struct(">IQI")  # topic length, seq, target length (0: every subscriber)
+
+
+def socket_path(ipc_dir: str, shard: int) -> str:
+    """Path of the Unix socket a shard listens on"""
+    return os.path.join(ipc_dir, f"hub-{shard}.sock")
+
+
+def _message(kind: int, body: bytes) -> bytes:
+    return _HEADER.pack(len(body), kind) + body
+
+
+class _PeerLink(asyncio.Protocol):
+    """Sending side of the link to one peer"""
+
+    def __init__(self):
+        self.transport = None
+        self._buffer: List[bytes] = []
+        self._scheduled = False
+        self._loop = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self._loop = asyncio.get_running_loop()
+
+    def connection_lost(self, exc):
+        self.transport = None
+
+    def send(self, message: bytes):
+        if self.transport is None:
+            return  # peer is gone
+        self._buffer.append(message)
+        if not self._scheduled:
+            # One write for everything sent during this loop iteration
+            self._scheduled = True
+            self._loop.call_soon(self._flush)
+
+    def _flush(self):
+        self._scheduled = False
+        buffer, self._buffer = self._buffer, []
+        if self.transport is not None and buffer:
+            self.transport.write(b"".join(buffer))
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+
+class _InboundLink(asyncio.Protocol):
+    """Receiving side of the link from one peer; handles its messages in order"""
+
+    def __init__(self, cluster: "HubCluster"):
+        self.cluster = cluster
+        self.peer: Optional[int] = None
+        self._data = bytearray()
+        self._queue: deque = deque()
+        self._ready = asyncio.Event()
+
+    def connection_made(self, transport):
+        asyncio.get_running_loop().create_task(self._consume())
+
+    def data_received(self, data: bytes):
+        buffer = self._data
+        buffer += data
+        offset = 0
+        while len(buffer) - offset >= _HEADER.size:
+            length, kind = _HEADER.unpack_from(buffer, offset)
+            start = offset + _HEADER.size
+            if start + length > len(buffer):
+                break
+            self._queue.append((kind, bytes(buffer[start:start + length])))
+            offset = start + length
+        if offset:
+            del buffer[:offset]
+        if self._queue:
+            self._ready.set()
+
+    def connection_lost(self, exc):
+        self._queue.append((None, None))
+        self._ready.set()
+
+    async def _consume(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._queue:
+                kind, body = self._queue.popleft()
+                if kind is None:
+                    if self.peer is not None:
+                        await self.cluster._peer_lost(self.peer)
+                    return
+                if self.peer is None:
+                    # The first message names the peer
+                    self.peer = serialization.loads(body)[1]
+                    continue
+                try:
+                    await self.cluster._dispatch(self.peer, kind, body)
+                except Exception as e:
+                    logger.error(f"Error handling message from hub shard {self.peer}: {e}")
+
+
+class HubCluster:
+    """This shard's view of the other shards"""
+
+    def __init__(
+        self,
+        shard: int,
+        shards: int,
+        ipc_dir: str,
+        on_frame: Callable[[str, int, str, Optional[str]], Awaitable[Any]],
+        on_publish: Callable[[str, str, Any, Optional[str], Optional[dict]], Awaitable[Any]],
+        on_send: Callable[[str, str], Awaitable[Any]],
+        on_ack: Callable[[str, str], Awaitable[Any]],
+        on_join: Callable[[str], Any],
+        on_leave: Callable[[str, Optional[str], List[str]], Any],
+        on_retain: Callable[[str, str, Optional[str], Optional[str], Optional[str]], Any]
+    ):
+        """
+        Args:
+            shard: This shard's number (0 runs in the Control Room process)
+            shards: Number of shards
+            ipc_dir: Directory holding the shards' Unix sockets
+            on_frame: Buffer and fan out a frame stamped by another shard (topic,
+                seq, frame, target client or None)
+            on_publish: Publish forwarded by another shard (publisher, topic, payload, msg_id, extra)
+            on_send: Send a frame to a local client (key, frame)
+            on_ack: QoS 1 ack from a client on another shard (msg_id, key)
+            on_join: A client key connected to another shard
+            on_leave: A client key left another shard (key, client type,
+                topics it was subscribed to)
+            on_retain: Retained message set on another shard (topic, key,
+                frame or None when cleared, publisher, target)
+        """
+        self.shard = shard
+        self.shards = shards
+        self.ipc_dir = ipc_dir
+        self.live: List[int] = list(range(shards))
+        self._on_frame = on_frame
+        self._on_publish = on_publish
+        self._on_send = on_send
+        self._on_ack = on_ack
+        self._on_join = on_join
+        self._on_leave = on_leave
+        self._on_retain = on_retain
+        self._links: Dict[int, _PeerLink] = {}
+        self._owners: Dict[str, int] = {}
+        # Clients on other shards: key -> (shard, client type)
+        self.directory: Dict[str, Tuple[int, Optional[str]]] = {}
+        # Subscribers on other shards: topic -> key -> shard
+        self._subscribers: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._server = None
+
+    async def start(self):
+        """Listen for peers, then connect to every one of them"""
+        loop = asyncio.get_running_loop()
+        path = socket_path(self.ipc_dir, self.shard)
+        if os.path.exists(path):
+            os.unlink(path)
+        self._server = await loop.create_unix_server(lambda: _InboundLink(self), path)
+
+        deadline = loop.time() + CONNECT_TIMEOUT
+        hello = self._control("hello", self.shard)
+        for peer in range(self.shards):
+            if peer == self.shard:
+                continue
+            while True:
+                try:
+                    _, link = await loop.create_unix_connection(_PeerLink, socket_path(self.ipc_dir, peer))
+                    break
+                except (FileNotFoundError, ConnectionRefusedError):
+                    if loop.time() > deadline:
+                        raise RuntimeError(f"Hub shard {peer} did not start within {CONNECT_TIMEOUT}s")
+                    await asyncio.sleep(0.05)
+            link.send(hello)
+            self._links[peer] = link
+        logger.info(f"Hub shard {self.shard} linked to {len(self._links)} peer(s)")
+
+    # ---------------- Topic ownership ----------------
+
+    def owner(self, topic: str) -> int:
+        """Shard that stamps and tracks messages on a topic"""
+        owner = self._owners.get(topic)
+        if owner is None:
+            # crc32, not hash(): it must be the same in every process
+            owner = self.live[zlib.crc32(str(topic).encode()) % len(self.live)]
+            self._owners[topic] = owner
+        return owner
+
+    def owns(self, topic: str) -> bool:
+        return self.owner(topic) == self.shard
+
+    # ---------------- Outgoing ----------------
+
+    def replicate(self, topic: str, seq: int, frame: str, target: Optional[str] = None):
+        """Send a frame stamped by this shard to every other shard (to buffer; fanned out unless targeted)"""
+        encoded_topic = str(topic).encode()
+        encoded_target = target.encode() if target is not None else b""
+        message = _message(
+            FRAME,
+            _FRAME.pack(len(encoded_topic), seq, len(encoded_target)) + encoded_topic + encoded_target + frame.encode()
+        )
+        for link in self._links.values():
+            link.send(message)
+
+    def forward_publish(self, topic: str, publisher: str, payload: Any,
+                        msg_id: Optional[str] = None, extra: Optional[dict] = None):
+        """Hand a publish to the topic's owner"""
+        header = serialization.dumps_bytes([topic, publisher, msg_id, extra])
+        body = _LENGTH.pack(len(header)) + header + serialization.dumps_bytes(payload)
+        self._send(self.owner(topic), _message(PUBLISH, body))
+
+    def send_to_client(self, key: str, frame: str) -> bool:
+        """Send a frame to a client on another shard; False if no shard has it"""
+        entry = self.directory.get(key)
+        if entry is None:
+            return False
+        encoded_key = key.encode()
+        self._send(entry[0], _message(SEND, _LENGTH.pack(len(encoded_key)) + encoded_key + frame.encode()))
+        return True
+
+    def announce_join(self, key: str, client_type: Optional[str]):
+        """A client key connected (or registered) on this shard"""
+        self.directory.pop(key, None)  # it is here now, whatever the others said
+        self._broadcast(self._control("join", key, client_type))
+
+    def announce_leave(self, key: str):
+        """A client key is no longer connected to this shard"""
+        self._broadcast(self._control("leave", key))
+
+    def announce_subscribe(self, topic: str, key: str):
+        self._broadcast(self._control("sub", topic, key))
+
+    def announce_unsubscribe(self, topic: str, key: str):
+        self._broadcast(self._control("unsub", topic, key))
+
+    def forward_ack(self, msg_id: str, key: str):
+        """Pass an ack for a message tracked elsewhere to every shard (only its owner tracks it)"""
+        self._broadcast(self._control("ack", msg_id, key))
+
+    def announce_retain(self, topic: str, key: str, frame: Optional[str], publisher: Optional[str],
+                        target: Optional[str] = None):
+        """A retained message was set (or cleared, with frame None) on this shard"""
+        self._broadcast(self._control("retain", topic, key, frame, publisher, target))
+
+    def subscriber_keys(self, topic: str) -> List[str]:
+        """Keys subscribed to a topic on other shards"""
+        return list(self._subscribers.get(topic, ()))
+
+    def _control(self, *fields) -> bytes:
+        return _message(CONTROL, serialization.dumps_bytes(fields))
+
+    def _send(self, peer: int, message: bytes):
+        link = self._links.get(peer)
+        if link is not None:
+            link.send(message)
+
+    def _broadcast(self, message: bytes):
+        for link in self._links.values():
+            link.send(message)
+
+    # ---------------- Incoming ----------------
+
+    async def _dispatch(self, peer: int, kind: int, body: bytes):
+        if kind == FRAME:
+            length, seq, target_length = _FRAME.unpack_from(body)
+            start = _FRAME.size
+            topic = body[start:start + length].decode()
+            start += length
+            target = body[start:start + target_length].decode() if target_length else None
+            await self._on_frame(topic, seq, body[start + target_length:].decode(), target)
+
+        elif kind == PUBLISH:
+            (length,) = _LENGTH.unpack_from(body)
+            start = _LENGTH.size
+            topic, publisher, msg_id, extra = serialization.loads(body[start:start + length])
+            payload = serialization.RawJSON(body[start + length:].decode())
+            await self._on_publish(publisher, topic, payload, msg_id, extra)
+
+        elif kind == SEND:
+            (length,) = _LENGTH.unpack_from(body)
+            start = _LENGTH.size
+            key = body[start:start + length].decode()
+            await self._on_send(key, body[start + length:].decode())
+
+        elif kind == CONTROL:
+            await self._control_received(peer, *serialization.loads(body))
+
+    async def _control_received(self, peer: int, action: str, *fields):
+        if action == "join":
+            key, client_type = fields
+            self.directory[key] = (peer, client_type)
+            self._on_join(key)
+        elif action == "leave":
+            (key,) = fields
+            topics = []
+            for topic, subscribers in self._subscribers.items():
+                if subscribers.get(key) == peer:
+                    del subscribers[key]
+                    topics.append(topic)
+            entry = self.directory.get(key)
+            # Ignore a stale leave once the client is connected elsewhere
+            if entry is not None and entry[0] == peer:
+                del self.directory[key]
+                self._on_leave(key, entry[1], topics)
+        elif action == "sub":
+            topic, key = fields
+            self._subscribers[topic][key] = peer
+        elif action == "unsub":
+            topic, key = fields
+            if self._subscribers.get(topic, {}).get(key) == peer:
+                del self._subscribers[topic][key]
+        elif action == "ack":
+            msg_id, key = fields
+            await self._on_ack(msg_id, key)
+        elif action == "retain":
+            self._on_retain(*fields)
+
+    async def _peer_lost(self, peer: int):
+        if peer not in self.live:
+            return
+        self.live.remove(peer)
+        self._owners.clear()  # its topics move to the remaining shards
+        link = self._links.pop(peer, None)
+        if link is not None:
+            link.close()
+        logger.error(f"Lost hub shard {peer}; dropping its clients")
+
+        topics = defaultdict(list)  # key -> topics it was subscribed to
+        for topic, subscribers in self._subscribers.items():
+            for key in [key for key, shard in subscribers.items() if shard == peer]:
+                del subscribers[key]
+                topics[key].append(topic)
+        for key in [key for key, (shard, _) in self.directory.items() if shard == peer]:
+            _, client_type = self.directory.pop(key)
+            self._on_leave(key, client_type, topics.get(key, []))
@@ -0,0 +1,194 @@
+"""Per-recipient ack tracking for at-least-once (QoS 1) messages
+
+The hub records which recipients a QoS 1 message was fanned out to and
+waits for each of them to ack it. Recipients that stay silent are resent
+the same frame until they ack or run out of attempts. Once every recipient
+is settled, the publisher receives a single delivery report.
+
+All retries share one scheduler task driven by a heap of deadlines, so the
+cost stays proportional to the number of retries actually due rather than
+to the number of messages in flight.
+
+Subscribers that disconnected within the retry window still count as
+recipients (``DepartedSubscribers``): a client that is reconnecting gets
+the message from a retry or from its resume replay, so its publisher
+should wait for its ack rather than be told at once that nobody got it.
+"""
+
+import asyncio
+import heapq
+import time
+from collections import OrderedDict, defaultdict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from communication import serialization
+
+DEFAULT_RETRY_INTERVAL = 2.0
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Send a frame to a client key; returns False if the client is not connected
+SendFn = Callable[[str, str], Awaitable[bool]]
+
+
+class _PendingDelivery:
+    __slots__ = ("frame", "publisher", "waiting", "attempts", "delivered", "failed")
+
+    def __init__(self, frame: str, publisher: str, recipients: Iterable[str]):
+        self.frame = frame
+        self.publisher = publisher
+        self.waiting: Set[str] = set(recipients)
+        self.attempts: Dict[str, int] = {key: 1 for key in self.waiting}
+        self.delivered: List[str] = []
+        self.failed: List[str] = []
+
+
+class DepartedSubscribers:
+    """Subscribers that disconnected recently, per topic"""
+
+    def __init__(self, window: float = DEFAULT_RETRY_INTERVAL * DEFAULT_MAX_ATTEMPTS):
+        """
+        Args:
+            window: Seconds a departed subscriber is still waited for
+        """
+        self.window = window
+        self._departed: Dict[str, Dict[str, float]] = defaultdict(dict)  # topic -> key -> left at
+
+    def add(self, key: str, topics: Iterable[str]):
+        """Record that a client subscribed to these topics disconnected"""
+        left_at = time.monotonic()
+        for topic in topics:
+            self._departed[topic][key] = left_at
+
+    def discard(self, key: str, topic: str):
+        """Forget a client once it subscribed to the topic again"""
+        departed = self._departed.get(topic)
+        if departed:
+            departed.pop(key, None)
+
+    def keys(self, topic: str) -> List[str]:
+        """Clients subscribed to a topic that left less than ``window`` seconds ago"""
+        departed = self._departed.get(topic)
+        if not departed:
+            return []
+        cutoff = time.monotonic() - self.window
+        for key in [key for key, left_at in departed.items() if left_at < cutoff]:
+            del departed[key]
+        return list(departed)
+
+
+class DeliveryTracker:
+    """Tracks in-flight QoS 1 messages and retries unacked recipients"""
+
+    def __init__(
+        self,
+        send: SendFn,
+        retry_interval: float = DEFAULT_RETRY_INTERVAL,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        report_history: int = 1024
+    ):
+        self._send = send
+        self.retry_interval = retry_interval
+        self.max_attempts = max_attempts
+        self._pending: Dict[str, _PendingDelivery] = {}
+        self._deadlines: List[Tuple[float, str, str]] = []  # (when, msg_id, recipient)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._scheduler: Optional[asyncio.Task] = None
+        # Recently sent reports, so a publisher that retransmits gets the answer again
+        self._reports: "OrderedDict[str, str]" = OrderedDict()
+        self._report_history = report_history
+
+    @property
+    def in_flight(self) -> int:
+        """Number of messages still waiting for at least one ack"""
+        return len(self._pending)
+
+    def is_tracked(self, msg_id: str) -> bool:
+        return msg_id in self._pending
+
+    def completed_report(self, msg_id: str) -> Optional[str]:
+        """Return the delivery report already sent for a message, if any"""
+        return self._reports.get(msg_id)
+
+    async def track(self, msg_id: str, frame: str, publisher: str, recipients: Iterable[str]):
+        """
+        Start tracking a message that has just been fanned out
+
+        Args:
+            msg_id: Message ID chosen by the publisher
+            frame: Serialized frame that was sent (and will be resent)
+            publisher: Client key of the publisher, for the delivery report
+            recipients: Client keys the frame was sent to
+        """
+        pending = _PendingDelivery(frame, publisher, recipients)
+        if not pending.waiting:
+            await self._finish(msg_id, pending)
+            return
+
+        self._pending[msg_id] = pending
+        deadline = asyncio.get_running_loop().time() + self.retry_interval
+        for recipient in pending.waiting:
+            heapq.heappush(self._deadlines, (deadline, msg_id, recipient))
+        self._ensure_scheduler()
+
+    async def ack(self, msg_id: str, recipient: str):
+        """Record an ack from a recipient; sends the report when the last one arrives"""
+        pending = self._pending.get(msg_id)
+        if pending is None or recipient not in pending.waiting:
+            return
+        pending.waiting.discard(recipient)
+        pending.delivered.append(recipient)
+        if not pending.waiting:
+            del self._pending[msg_id]
+            await self._finish(msg_id, pending)
+
+    async def _finish(self, msg_id: str, pending: _PendingDelivery):
+        report = serialization.dumps({
+            "type": "delivery",
+            "msg_id": msg_id,
+            "delivered": pending.delivered,
+            "failed": pending.failed
+        })
+        self._reports[msg_id] = report
+        while len(self._reports) > self._report_history:
+            self._reports.popitem(last=False)
+        await self._send(pending.publisher, report)
+
+    def _ensure_scheduler(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._scheduler is None or self._scheduler.done():
+            self._scheduler = asyncio.get_running_loop().create_task(self._run())
+        else:
+            self._wakeup.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self._deadlines:
+            when, msg_id, recipient = self._deadlines[0]
+            delay = when - loop.time()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._deadlines)
+            pending = self._pending.get(msg_id)
+            if pending is None or recipient not in pending.waiting:
+                # Acked (or finished) since this deadline was scheduled
+                continue
+
+            if pending.attempts[recipient] >= self.max_attempts:
+                pending.waiting.discard(recipient)
+                pending.failed.append(recipient)
+                if not pending.waiting:
+                    del self._pending[msg_id]
+                    await self._finish(msg_id, pending)
+                continue
+
+            pending.attempts[recipient] += 1
+            # An offline recipient still uses up the attempt; it may be back next time
+            await self._send(recipient, pending.frame)
+            heapq.heappush(self._deadlines, (loop.time() + self.retry_interval, msg_id, recipient))
@@ -0,0 +1,158 @@
+"""Recording of the hub's inbound traffic
+
+With ``HUB_RECORD=<path>`` the hub appends every frame it receives to a
+binary log, so a load spike can be replayed later against a local hub
+(``benchmarks/replay_traffic.py``) or analysed after an incident.
+
+The log is a header (``MAGIC``) followed by records, each of them::
+
+    timestamp  f64   wall clock when the hub received the frame
+    connection u32   connection number, unique per hub process
+    client_len u32   length of the client ID (empty before registration)
+    topic_len  u32   length of the topic (empty if the frame has none)
+    frame_len  u32   length of the frame
+    client ID, topic and frame bytes (UTF-8)
+
+Logs of the first version (``STJREC01``, u16 client and topic lengths)
+can still be read. An existing log of that version is moved aside to
+``<path>.v1`` instead of being appended to.
+
+Records are only appended, through a large buffer that the hub flushes
+every ``FLUSH_INTERVAL`` seconds, so recording adds one buffered write per
+frame to the event loop. A killed hub loses at most the last interval. A
+record cut short by a crash ends the log; readers stop before it. A frame
+that cannot be recorded is logged and skipped: recording never fails the
+connection the frame came in on.
+Readers map the file into memory and decode records in place instead of
+reading it through Python file objects.
+"""
+
+import logging
+import mmap
+import os
+import struct
+from typing import Iterator, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"STJREC02"
+FLUSH_INTERVAL = 1.0  # seconds
+BUFFER_SIZE = 1 << 20
+
+_RECORD = struct.Struct("<dIIII")
+# Record layout per log version, by header
+_RECORDS = {MAGIC: _RECORD, b"STJREC01": struct.Struct("<dIHHI")}
+
+
+class RecordedFrame(NamedTuple):
+    timestamp: float
+    connection: int
+    client_id: str
+    topic: str
+    frame: bytes
+
+
+class TrafficRecorder:
+    """Appends inbound frames to a traffic log"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Log file; created if missing, appended to otherwise
+        """
+        self.path = path
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                header = f.read(len(MAGIC))
+            if header and header != MAGIC:
+                os.replace(path, f"{path}.v1")
+                logger.warning(f"Moved traffic log of another format to {path}.v1")
+        self._file = open(path, "ab", buffering=BUFFER_SIZE)
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self.records = 0
+        self.failures = 0
+        logger.info(f"Recording hub traffic to {path}")
+
+    def record(self, timestamp: float, connection: int, client_id: Optional[str],
+               topic: Optional[str], frame):
+        """
+        Append one frame
+
+        Args:
+            timestamp: time.time() when the frame arrived
+            connection: Connection number the frame arrived on
+            client_id: Registered client ID, if any
+            topic: Topic named in the frame, if any
+            frame: Frame as received (text or bytes)
+        """
+        try:
+            client = client_id.encode() if client_id else b""
+            topic_bytes = topic.encode() if isinstance(topic, str) else b""
+            data = frame.encode() if isinstance(frame, str) else frame
+            record = (
+                _RECORD.pack(timestamp, connection, len(client), len(topic_bytes), len(data))
+                + client + topic_bytes + data
+            )
+            self._file.write(record)
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Frame not recorded: {e}", extra={"event": "hub.record_failed"})
+            return
+        self.records += 1
+
+    def flush(self):
+        if self._file.closed:
+            return
+        try:
+            self._file.flush()
+        except OSError as e:
+            logger.warning(f"Traffic log not flushed: {e}", extra={"event": "hub.record_failed"})
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class TrafficLog:
+    """Memory-mapped reader for a traffic log"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._record = _RECORDS.get(self._map[:len(MAGIC)])
+        if self._record is None:
+            self._map.close()
+            raise ValueError(f"{path} is not a hub traffic log")
+
+    def __iter__(self) -> Iterator[RecordedFrame]:
+        data = self._map
+        size = len(data)
+        record = self._record
+        offset = len(MAGIC)
+        while offset + record.size <= size:
+            timestamp, connection, client_len, topic_len, frame_len = record.unpack_from(data, offset)
+            start = offset + record.size
+            end = start + client_len + topic_len + frame_len
+            if end > size:
+                break  # cut short while being written
+            topic_start = start + client_len
+            frame_start = topic_start + topic_len
+            yield RecordedFrame(
+                timestamp,
+                connection,
+                data[start:topic_start].decode(),
+                data[topic_start:frame_start].decode(),
+                data[frame_start:end]
+            )
+            offset = end
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self) -> "TrafficLog":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
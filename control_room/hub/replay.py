@@ -0,0 +1,96 @@
+"""Per-topic sequence numbers and bounded replay rings for the hub
+
+Every message the hub fans out is stamped with a sequence number that is
+monotonic per topic. The last ``capacity`` frames of each topic are kept
+so a client that lost its connection can resume from the last sequence
+number it saw instead of silently missing what was published meanwhile.
+When the hub runs as several shards, each shard keeps a full copy; only
+the topic's owner hands out numbers (``control_room/hub/cluster.py``).
+
+A direct request (e.g. a dispatch to one ERT unit) is numbered and kept
+in its topic's ring like any other frame, tagged with its target, and is
+only replayed to that client.
+"""
+
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+DEFAULT_REPLAY_SIZE = 1024
+
+
+class ReplayBuffer:
+    """Sequence counters and replay rings, one of each per topic"""
+
+    def __init__(self, capacity: int = DEFAULT_REPLAY_SIZE):
+        self.capacity = capacity
+        self._sequences: Dict[str, int] = defaultdict(int)
+        self._rings: Dict[str, Deque[Tuple[int, str, Optional[str]]]] = {}  # (seq, frame, target)
+
+    def next_seq(self, topic: str) -> int:
+        """Reserve the next sequence number for a topic"""
+        self._sequences[topic] += 1
+        return self._sequences[topic]
+
+    def current_seq(self, topic: str) -> int:
+        """Return the last sequence number handed out for a topic (0 if none)"""
+        return self._sequences.get(topic, 0)
+
+    def append(self, topic: str, seq: int, frame: str, target: Optional[str] = None):
+        """
+        Remember an outgoing frame so it can be replayed later
+
+        Args:
+            topic: Topic the frame was published on
+            seq: Sequence number stamped on the frame
+            frame: Serialized frame exactly as sent to subscribers
+            target: Client key the frame is for, or None for every subscriber
+        """
+        if self.capacity <= 0:
+            return
+        ring = self._rings.get(topic)
+        if ring is None:
+            ring = self._rings[topic] = deque(maxlen=self.capacity)
+        ring.append((seq, frame, target))
+
+    def observe(self, topic: str, seq: int, frame: str, target: Optional[str] = None):
+        """
+        Remember a frame stamped by another hub shard (the topic's owner)
+
+        Keeps ``current_seq`` in step, so this shard can take over the
+        topic's numbering if the owner goes away.
+        """
+        if seq > self._sequences[topic]:
+            self._sequences[topic] = seq
+        self.append(topic, seq, frame, target)
+
+    def since(self, topic: str, last_seq: int, client: Optional[str] = None) -> List[Tuple[int, str]]:
+        """
+        Get the buffered frames published after ``last_seq``
+
+        If ``last_seq`` is ahead of the hub's counter the hub has restarted
+        since the client last saw the topic, so everything buffered is new
+        to that client.
+
+        Args:
+            topic: Topic to replay
+            last_seq: Last sequence number the client processed
+            client: Key of the resuming client; frames targeted at other
+                clients are left out
+
+        Returns:
+            List of (seq, frame) tuples in publish order
+        """
+        ring = self._rings.get(topic)
+        if not ring:
+            return []
+        if last_seq > self.current_seq(topic):
+            last_seq = 0
+
+        missed = []
+        for seq, frame, target in reversed(ring):
+            if seq <= last_seq:
+                break
+            if target is None or target == client:
+                missed.append((seq, frame))
+        missed.reverse()
+        return missed
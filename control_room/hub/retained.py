@@ -0,0 +1,159 @@
+"""Retained last-value messages for the hub
+
+A publish (or a direct request) marked ``retain`` is kept by the hub as
+the last value of its topic, or of one key within the topic (e.g. one per
+``ert_id``). A client that subscribes to the topic afresh gets the
+retained messages first, so it starts from the current state instead of
+waiting for the next update: a restarted Control Room or a new dashboard
+sees every unit's position at once, and a restarted ERT unit gets the
+dispatch it was working on.
+
+- A retained request is only handed to its target (the client it was
+  sent to); other retained messages go to every new subscriber.
+- Retained copies carry ``"retained": true`` and only the topic and
+  payload: no sequence number, QoS or RPC fields. They are state, not
+  new traffic, so receivers neither ack nor answer them.
+- An entry lives until it is replaced, cleared (``clear_retained``), or
+  its publisher leaves for good, so units that went away do not linger.
+  Entries loaded from disk whose publisher does not come back within
+  ``grace`` seconds are dropped the same way.
+
+When the hub runs as several shards, each shard keeps a full copy: the
+shard that receives a retained message or a clear passes it on to the
+others (``control_room/hub/cluster.py``). With a
+file configured, shard 0 saves the store regularly and every shard loads
+it at startup, so retained messages survive a restart of the Control
+Room and its in-process hub.
+"""
+
+import logging
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from communication import serialization
+
+logger = logging.getLogger(__name__)
+
+SAVE_INTERVAL = 1.0  # seconds between saves while something changed
+DEFAULT_GRACE = 30.0  # seconds a loaded entry's publisher has to reconnect
+
+
+class RetainedMessage(NamedTuple):
+    frame: str  # encoded, as sent to subscribers
+    publisher: str  # client key
+    target: Optional[str]  # only this client gets it (retained requests)
+
+
+class RetainedStore:
+    """Last retained message per (topic, key)"""
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, RetainedMessage]] = defaultdict(dict)
+        self._by_publisher: Dict[str, Set[Tuple[str, str]]] = defaultdict(set)
+        self.loaded_publishers: Set[str] = set()  # publishers of entries read from disk
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def set(self, topic: str, key: str, frame: str, publisher: str, target: Optional[str] = None):
+        """
+        Keep a message as the last value of (topic, key)
+
+        Args:
+            topic: Topic it was published on
+            key: Key within the topic ("" for one value per topic)
+            frame: Encoded retained frame
+            publisher: Client key of the publisher
+            target: Client the message is for, or None for every subscriber
+        """
+        previous = self._entries[topic].get(key)
+        if previous is not None and previous.publisher != publisher:
+            self._by_publisher[previous.publisher].discard((topic, key))
+        self._entries[topic][key] = RetainedMessage(frame, publisher, target)
+        self._by_publisher[publisher].add((topic, key))
+        self.dirty = True
+
+    def clear(self, topic: str, key: str = "") -> bool:
+        """Drop the retained message of (topic, key); False if there was none"""
+        entry = self._entries.get(topic, {}).pop(key, None)
+        if entry is None:
+            return False
+        self._by_publisher[entry.publisher].discard((topic, key))
+        self.dirty = True
+        return True
+
+    def drop_publisher(self, publisher: str) -> int:
+        """
+        Drop every message retained by a client
+
+        Returns:
+            Number of messages dropped
+        """
+        self.loaded_publishers.discard(publisher)
+        owned = self._by_publisher.pop(publisher, set())
+        for topic, key in owned:
+            self._entries[topic].pop(key, None)
+        if owned:
+            self.dirty = True
+        return len(owned)
+
+    def frames_for(self, topic: str, client: str) -> List[str]:
+        """Retained frames a new subscriber to a topic gets"""
+        return [
+            entry.frame for entry in self._entries.get(topic, {}).values()
+            if entry.target is None or entry.target == client
+        ]
+
+    def topic_counts(self) -> Dict[str, int]:
+        return {topic: len(entries) for topic, entries in self._entries.items() if entries}
+
+    # ---------------- Persistence ----------------
+
+    def save(self, path: str):
+        """Write every entry to a file, replacing it atomically"""
+        entries = [
+            [topic, key, entry.publisher, entry.target, serialization.RawJSON(entry.frame)]
+            for topic, keyed in self._entries.items() for key, entry in keyed.items()
+        ]
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as f:
+            f.write(serialization.dumps({"version": 1, "entries": entries}))
+        os.replace(temporary, path)
+        self.dirty = False
+
+    def load(self, path: str) -> int:
+        """
+        Read entries saved by save(); a missing file is an empty store
+
+        Returns:
+            Number of entries loaded
+        """
+        try:
+            with open(path) as f:
+                data = serialization.loads(f.read())
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable retained messages in {path}: {e}")
+            return 0
+        for topic, key, publisher, target, frame in data.get("entries", ()):
+            self.set(topic, key, serialization.dumps(frame), publisher, target)
+            self.loaded_publishers.add(publisher)
+        self.dirty = False
+        return len(data.get("entries", ()))
+
+    def expire_loaded(self, connected: Iterable[str]) -> int:
+        """
+        Drop loaded entries whose publisher has not reconnected
+
+        Args:
+            connected: Keys of the clients connected now (on any shard)
+
+        Returns:
+            Number of messages dropped
+        """
+        gone = self.loaded_publishers - set(connected)
+        self.loaded_publishers = set()
+        return sum(self.drop_publisher(publisher) for publisher in gone)
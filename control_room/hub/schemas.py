@@ -0,0 +1,191 @@
+"""Message schemas checked by the hub before routing
+
+Every frame a client sends is parsed and validated here before the hub
+acts on it: first the envelope (``type`` and the fields that type needs),
+then, for ``publish`` and ``request`` frames on a known topic, the
+payload. A frame that fails is answered with an error frame and dropped;
+the connection stays open and nothing is fanned out.
+
+Schemas are written as ``{field: types}`` maps. A field name ending in
+``?`` is optional, ``None`` among the types allows null, and ``ANY``
+accepts every value. Fields a schema does not name are allowed, so
+clients can add fields before every consumer knows them. Each schema is
+compiled once, at import, into a validator that checks exact types with
+one set lookup per field (so ``True`` is not a number).
+
+Topics without a schema (benchmarks, ad-hoc tools) only get the
+envelope check.
+
+A ``publish_batch`` frame carries several publishes in ``messages``. Its
+envelope is checked as a whole (``MAX_BATCH_MESSAGES`` at most); each
+message is then checked on its own with ``check_batch_message``, so one
+bad message does not cost the others.
+"""
+
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from communication import serialization
+
+# A validator returns None for a valid value, otherwise what is wrong with it
+Validator = Callable[[Any], Optional[str]]
+
+ANY = object()
+NUMBER = (int, float)
+
+MAX_BATCH_MESSAGES = 1000
+
+_MISSING = object()
+_TYPE_NAMES = {int: "an integer", float: "a number", str: "a string", bool: "a boolean",
+               dict: "an object", list: "an array"}
+
+
+def _describe(types: frozenset) -> str:
+    if types == frozenset(NUMBER):
+        return "a number"
+    return " or ".join(sorted(_TYPE_NAMES.get(t, t.__name__) for t in types))
+
+
+def compile_schema(fields: Dict[str, Any]) -> Validator:
+    """
+    Build a validator for JSON objects
+
+    Args:
+        fields: Field name (``?`` suffix: optional) -> type, tuple of types
+            (``None`` allowing null) or ``ANY``
+
+    Returns:
+        Function taking a decoded value and returning None if it matches,
+        otherwise an error message
+    """
+    checks = []
+    for name, spec in fields.items():
+        required = not name.endswith("?")
+        name = name.rstrip("?")
+        if spec is ANY:
+            checks.append((name, required, None, True, None))
+            continue
+        spec = spec if isinstance(spec, tuple) else (spec,)
+        types = frozenset(
+            t for item in spec if item is not None for t in (item if isinstance(item, tuple) else (item,))
+        )
+        checks.append((name, required, types, None in spec, f"'{name}' must be {_describe(types)}"))
+    checks = tuple(checks)
+
+    def validate(value: Any) -> Optional[str]:
+        if type(value) is not dict:
+            return "expected a JSON object"
+        for name, required, types, nullable, message in checks:
+            item = value.get(name, _MISSING)
+            if item is _MISSING:
+                if required:
+                    return f"missing '{name}'"
+            elif types is None or type(item) in types:
+                continue
+            elif item is None:
+                if not nullable:
+                    return f"'{name}' must not be null"
+            else:
+                return message
+        return None
+
+    return validate
+
+
+# ---------------- Frames ----------------
+
+ENVELOPES: Dict[str, Validator] = {
+    frame_type: compile_schema(fields) for frame_type, fields in {
+        "register": {"client_type": str, "client_id": str},
+        "subscribe": {"topic": str, "last_seq?": int},
+        "publish": {"topic": str, "payload?": ANY, "msg_id?": str, "qos?": int,
+                    "retain?": bool, "retain_key?": str},
+        "ack": {"msg_id": str},
+        "request": {"topic": str, "correlation_id": str, "payload?": ANY, "target?": str,
+                    "msg_id?": str, "qos?": int, "retain?": bool, "retain_key?": str},
+        "response": {"reply_to": str, "correlation_id": str, "payload?": ANY},
+        "publish_batch": {"messages": list},
+        "clear_retained": {"topic": str, "retain_key?": str},
+    }.items()
+}
+
+# One message of a publish_batch frame (QoS 1 publishes are never batched)
+BATCH_MESSAGE = compile_schema({"topic": str, "payload?": ANY, "retain?": bool, "retain_key?": str})
+
+# ---------------- Payloads, per topic ----------------
+
+PAYLOADS: Dict[str, Validator] = {
+    topic: compile_schema(fields) for topic, fields in {
+        # ERT -> Control Room
+        "location": {"ert_id": str, "x": NUMBER, "y": NUMBER, "vx?": NUMBER, "vy?": NUMBER,
+                     "sent_at?": NUMBER, "eta_seconds?": (NUMBER, None)},
+        "acknowledgment": {"ert_id": str, "incident_id": str, "x?": (NUMBER, None), "y?": (NUMBER, None),
+                           "eta_seconds?": (NUMBER, None), "distance?": (NUMBER, None)},
+        "resolution": {"ert_id": str},
+        # Control Room -> ERT / dashboards
+        "incident": {"id": str, "x": NUMBER, "y": NUMBER, "status": str, "required_units?": int},
+        "geofence": {"type": str, "ert_id": str, "incident_id": str, "x": NUMBER, "y": NUMBER,
+                     "assigned?": bool},
+    }.items()
+}
+
+
+def parse_frame(message) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Decode and validate one inbound frame
+
+    Args:
+        message: Frame as received (text or bytes)
+
+    Returns:
+        (frame, None) if it is valid; (frame or None if it is not a JSON
+        object, error message) otherwise
+    """
+    try:
+        data = serialization.loads(message)
+    except ValueError:
+        return None, "invalid JSON"
+    if type(data) is not dict:
+        return None, "frame must be a JSON object"
+    frame_type = data.get("type")
+    validate = ENVELOPES.get(frame_type) if type(frame_type) is str else None
+    if validate is None:
+        return data, f"unknown frame type {frame_type!r}"
+    error = validate(data)
+    if error is None:
+        if frame_type in ("publish", "request"):
+            error = _check_payload(data)
+        elif frame_type == "publish_batch" and len(data["messages"]) > MAX_BATCH_MESSAGES:
+            error = f"more than {MAX_BATCH_MESSAGES} messages in one batch"
+    return data, error
+
+
+def check_batch_message(message) -> Optional[str]:
+    """
+    Validate one message of a publish_batch frame
+
+    Returns:
+        None if it is valid, otherwise an error message
+    """
+    error = BATCH_MESSAGE(message)
+    if error is None:
+        error = _check_payload(message)
+    return error
+
+
+def _check_payload(data: dict) -> Optional[str]:
+    validate = PAYLOADS.get(data["topic"])
+    if validate is None:
+        return None
+    error = validate(data.get("payload"))
+    return f"invalid '{data['topic']}' payload: {error}" if error is not None else None
+
+
+def error_frame(data: Optional[dict], error: str) -> str:
+    """Error frame answering a rejected frame; echoes its IDs so the sender can match it"""
+    frame = {"type": "error", "error": error}
+    if data is not None:
+        for field in ("type", "topic", "msg_id", "correlation_id"):
+            value = data.get(field)
+            if type(value) is str:
+                frame["frame_type" if field == "type" else field] = value
+    return serialization.dumps(frame)
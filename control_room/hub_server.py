@@ -1,67 +1,638 @@
 import asyncio
-import json
+import atexit
+import itertools
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import logging
 import websockets
 from collections import defaultdict
+from pathlib import Path
+
+# Add parent directory to Python path so the hub can also run standalone
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from control_room.hub.replay import ReplayBuffer
+from control_room.hub.delivery import DeliveryTracker, DepartedSubscribers
+from control_room.hub.cluster import HubCluster
+from control_room.hub.recorder import FLUSH_INTERVAL, TrafficRecorder
+from control_room.hub.retained import DEFAULT_GRACE, SAVE_INTERVAL, RetainedStore
+from control_room.hub.schemas import ENVELOPES, PAYLOADS, check_batch_message, error_frame, parse_frame
+from communication.metrics import REGISTRY
+from communication.priority import (
+    PRIORITY_CRITICAL, READ_BATCH, PriorityOutbox, limit_send_buffer, priority_of
+)
+from communication import serialization
+from communication.logging_setup import setup_logging
+
+logger = logging.getLogger("control_room.hub_server")
 
 # Store subscriptions: topic -> set of connected sockets
 subscriptions = defaultdict(set)
 connected_clients = set()
 client_info = {}  # websocket -> {'type': 'cr'/'ert', 'id': str}
 websocket_handlers = None  # Will be set by cr_main.py
+replay_buffer = ReplayBuffer()  # topic -> sequence counter + last N frames
+retained = RetainedStore()  # (topic, key) -> last retained message, for new subscribers
+clients_by_key = {}  # client key -> websocket (client_id once registered)
+outboxes = {}  # websocket -> PriorityOutbox; every frame to a client goes through it
+HUB_PORT = 8765
+cluster = None  # HubCluster when the hub runs as several shard processes
+recorder = None  # TrafficRecorder when inbound traffic is recorded
+stopping = False  # set when the hub shuts down; its clients did not leave
+connection_numbers = itertools.count(1)
+
+
+def client_key(websocket):
+    """Stable key for a client: its registered ID, or its connection before that"""
+    info = client_info.get(websocket)
+    if info and info.get("id"):
+        return info["id"]
+    if cluster is not None:
+        return f"conn-{cluster.shard}-{id(websocket)}"
+    return f"conn-{id(websocket)}"
+
+
+def enqueue(websocket, frame, priority=PRIORITY_CRITICAL):
+    """Queue a frame on a connection's outbox; returns False if it is closed"""
+    outbox = outboxes.get(websocket)
+    return outbox is not None and outbox.put(frame, priority)
+
+
+async def send_to_client(key, frame, priority=PRIORITY_CRITICAL):
+    """Send a frame to a client by key; returns False if it is not connected"""
+    websocket = clients_by_key.get(key)
+    if websocket is None:
+        # Possibly connected to another shard
+        return cluster is not None and cluster.send_to_client(key, frame)
+    return enqueue(websocket, frame, priority)
+
+
+delivery_tracker = DeliveryTracker(send_to_client)  # QoS 1 acks and retries
+departed = DepartedSubscribers(delivery_tracker.retry_interval * delivery_tracker.max_attempts)
+
+# ---------------- Metrics ----------------
+# Topics and client types come from clients; only known ones get their own
+# label value, so a client cannot grow the metric series without bound
+CLIENT_TYPE_LABELS = frozenset(("cr", "ert", "unregistered"))
+OTHER_LABEL = "other"
+
+
+def topic_label(topic):
+    """Metric label for a topic: itself if it has a schema, else "other" ("None" without one)"""
+    if topic is None or topic in PAYLOADS:
+        return str(topic)
+    return OTHER_LABEL
+
+
+def client_type_label(client_type):
+    """Metric label for a client's type (None before registration)"""
+    if client_type is None:
+        return "unregistered"
+    return client_type if client_type in CLIENT_TYPE_LABELS else OTHER_LABEL
+
+
+def subscriber_label(websocket):
+    """Metric label for the type of the client on a connection"""
+    return client_type_label(client_info.get(websocket, {}).get("type"))
+
+
+MESSAGES_IN = REGISTRY.counter(
+    "hub_messages_in_total", "Frames received by the hub", ("type", "topic", "client_type")
+)
+MESSAGES_OUT = REGISTRY.counter(
+    "hub_messages_out_total", "Frames forwarded to subscribers", ("topic", "client_type")
+)
+MESSAGES_REJECTED = REGISTRY.counter(
+    "hub_messages_rejected_total", "Frames rejected by schema validation", ("type",)
+)
+FANOUT_SECONDS = REGISTRY.histogram(
+    "hub_fanout_seconds", "Time to forward one message to every subscriber", ("topic",)
+)
+
+
+def _connected_by_type():
+    counts = defaultdict(int)
+    for websocket in list(connected_clients):
+        counts[(subscriber_label(websocket),)] += 1
+    return counts
+
+
+def _by_topic(counts):
+    labelled = defaultdict(int)
+    for topic, count in counts:
+        labelled[(topic_label(topic),)] += count
+    return labelled
+
+
+REGISTRY.gauge_callback(
+    "hub_connected_clients", "Open client connections", ("client_type",), _connected_by_type
+)
+REGISTRY.gauge_callback(
+    "hub_subscribers", "Subscribers per topic", ("topic",),
+    lambda: _by_topic((topic, len(sockets)) for topic, sockets in list(subscriptions.items()))
+)
+REGISTRY.gauge_callback(
+    "hub_qos_in_flight", "QoS 1 messages waiting for acks", (),
+    lambda: {(): delivery_tracker.in_flight}
+)
+REGISTRY.gauge_callback(
+    "hub_retained_messages", "Retained messages per topic", ("topic",),
+    lambda: _by_topic(retained.topic_counts().items())
+)
+
+
+async def send_replay(websocket, topic, last_seq):
+    """
+    Send a resuming subscriber everything it missed, then add it to live fan-out
+
+    Frames published while the replay is being written are picked up by the
+    next pass, so there is no gap between replayed and live messages. Direct
+    requests are only replayed to their target.
+    """
+    priority = priority_of(topic)
+    key = client_key(websocket)
+    missed = replay_buffer.since(topic, last_seq, key)
+    while missed:
+        for seq, frame in missed:
+            enqueue(websocket, frame, priority)
+            last_seq = seq
+        missed = replay_buffer.since(topic, last_seq, key)
+    subscriptions[topic].add(websocket)
+
+
+def retain(publisher, topic, key, payload, target=None):
+    """
+    Keep a message as the last value of (topic, key) for new subscribers
+
+    Args:
+        publisher: Client key of the publisher
+        topic: Topic of the message
+        key: Key within the topic ("" for one value per topic)
+        payload: Message payload
+        target: Only this client gets it (retained direct requests)
+    """
+    frame = serialization.dumps({"topic": topic, "payload": payload, "retained": True})
+    retained.set(topic, key, frame, publisher, target)
+    if cluster is not None:
+        cluster.announce_retain(topic, key, frame, publisher, target)
+
+
+def clear_retained(topic, key):
+    """Drop the retained message of (topic, key), on every shard"""
+    retained.clear(topic, key)
+    if cluster is not None:
+        cluster.announce_retain(topic, key, None, None)
+
+
+async def is_retransmission(publisher, msg_id):
+    """
+    Check whether a QoS 1 message was already fanned out
+
+    A publisher that missed our delivery report gets it again.
+    """
+    if msg_id is None:
+        return False
+    report = delivery_tracker.completed_report(msg_id)
+    if report is not None:
+        await send_to_client(publisher, report)
+        return True
+    # Still tracked means it is already being retried
+    return delivery_tracker.is_tracked(msg_id)
+
+
+def recipient_keys(topic, msg_id=None):
+    """
+    Keys of the clients a message on a topic goes to, on every shard
+
+    A QoS 1 message also counts subscribers that left within the retry
+    window: a client that is reconnecting gets it from a retry or from its
+    resume, so the publisher waits for its ack instead of a false failure.
+    """
+    recipients = [client_key(subscriber) for subscriber in subscriptions.get(topic, ())]
+    if cluster is not None:
+        recipients += cluster.subscriber_keys(topic)
+    if msg_id is not None:
+        known = set(recipients)
+        recipients += [key for key in departed.keys(topic) if key not in known]
+    return recipients
+
+
+async def publish(publisher, topic, payload, msg_id=None, extra=None):
+    """
+    Publish on behalf of a client, on the shard that owns the topic
+
+    Args:
+        publisher: Client key of the publisher
+        topic: Topic to publish on
+        payload: Message payload
+        msg_id: Message ID for at-least-once delivery, if requested
+        extra: Additional envelope fields (e.g. RPC routing)
+
+    Returns:
+        Number of subscribers (on all shards), or None for a retransmission
+    """
+    if cluster is not None and not cluster.owns(topic):
+        cluster.forward_publish(topic, publisher, payload, msg_id, extra)
+        return len(recipient_keys(topic, msg_id))
+    if await is_retransmission(publisher, msg_id):
+        return None
+    return await broadcast(publisher, topic, payload, msg_id, extra)
+
+
+async def fan_out(topic, frame):
+    """Queue a stamped frame for this shard's subscribers of a topic"""
+    priority = priority_of(topic)
+    sent_by_type = defaultdict(int)
+    for subscriber in subscriptions.get(topic, ()):
+        if not enqueue(subscriber, frame, priority):
+            # Subscriber is going away; its own handler cleans it up
+            continue
+        sent_by_type[subscriber_label(subscriber)] += 1
+
+    for subscriber_type, count in sent_by_type.items():
+        MESSAGES_OUT.inc((topic_label(topic), subscriber_type), count)
+
+
+def stamp(topic, payload, msg_id=None, extra=None):
+    """
+    Build a message's frame, stamped with the topic sequence, and buffer it
+
+    Other shards get a copy to fan out to their own subscribers. A frame
+    with a ``target`` (direct request) is only buffered for that client.
+
+    Returns:
+        The encoded frame
+    """
+    seq = replay_buffer.next_seq(topic)
+    frame = {
+        "topic": topic,
+        "seq": seq,
+        "payload": payload
+    }
+    if msg_id is not None:
+        frame["msg_id"] = msg_id
+    if extra:
+        frame.update(extra)
+    response = serialization.dumps(frame)
+    target = frame.get("target")
+    # Buffer it even without subscribers so offline units can catch up
+    replay_buffer.append(topic, seq, response, target)
+    if cluster is not None:
+        cluster.replicate(topic, seq, response, target)
+    return response
+
+
+async def broadcast(publisher, topic, payload, msg_id=None, extra=None):
+    """
+    Stamp, buffer and forward a message to everyone subscribed to a topic
+
+    With a ``target`` in ``extra`` (direct request) only that client gets
+    it, whether or not it subscribed, and only it is tracked for QoS 1: if
+    it is offline, the retries or its resume deliver the message later.
+
+    Args:
+        publisher: Client key of the publisher
+        topic: Topic to publish on
+        payload: Message payload
+        msg_id: Message ID for at-least-once delivery, if requested
+        extra: Additional envelope fields (e.g. RPC routing)
+
+    Returns:
+        Number of subscribers the message was sent to
+    """
+    response = stamp(topic, payload, msg_id, extra)
+
+    started = time.perf_counter()
+    target = extra.get("target") if extra else None
+    recipients = [target] if target is not None else recipient_keys(topic, msg_id)
+    if msg_id is not None:
+        # Start tracking before sending so no early ack is missed
+        await delivery_tracker.track(msg_id, response, publisher, recipients)
+
+    if target is not None:
+        await send_to_client(target, response, priority_of(topic))
+    else:
+        await fan_out(topic, response)
+    FANOUT_SECONDS.observe((topic_label(topic),), time.perf_counter() - started)
+    return len(recipients)
+
+
+def batch_frame(frames):
+    """One frame carrying several encoded frames, unpacked in order by the receiver"""
+    # Same text as dumps() with RawJSON frames, without going through the encoder
+    return '{"type":"batch","frames":[' + ",".join(frames) + "]}"
+
+
+async def publish_batch(publisher, messages):
+    """
+    Publish the messages of a publish_batch frame
+
+    Every message is stamped and buffered on its own, so sequence numbers
+    and replay work as for single publishes. Each subscriber then gets
+    the frames meant for it as one batch frame per priority lane (a
+    single frame is sent as is), which keeps the per-topic order.
+
+    Args:
+        publisher: Client key of the publisher
+        messages: (topic, payload) pairs, in order
+    """
+    started = time.perf_counter()
+    stamped = []
+    for topic, payload in messages:
+        if cluster is not None and not cluster.owns(topic):
+            cluster.forward_publish(topic, publisher, payload, None, None)
+        else:
+            stamped.append((topic, stamp(topic, payload)))
+    if not stamped:
+        return
+
+    pending = defaultdict(list)  # (subscriber, priority) -> frames
+    sent = defaultdict(int)
+    for topic, frame in stamped:
+        priority = priority_of(topic)
+        for subscriber in subscriptions.get(topic, ()):
+            pending[(subscriber, priority)].append(frame)
+            sent[(topic_label(topic), subscriber_label(subscriber))] += 1
+    for (subscriber, priority), frames in pending.items():
+        enqueue(subscriber, frames[0] if len(frames) == 1 else batch_frame(frames), priority)
+
+    for labels, count in sent.items():
+        MESSAGES_OUT.inc(labels, count)
+    per_message = (time.perf_counter() - started) / len(stamped)
+    for topic, _ in stamped:
+        FANOUT_SECONDS.observe((topic_label(topic),), per_message)
+
+
+async def flush_recorder():
+    """Write the recorded traffic out regularly, so a killed hub loses little"""
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        recorder.flush()
+
+
+def save_retained(path):
+    if retained.dirty:
+        try:
+            retained.save(path)
+        except OSError as e:
+            logger.error(f"Failed to save retained messages: {e}")
+
+
+async def save_retained_regularly(path):
+    """Save the retained messages whenever they changed, so a restart keeps them"""
+    while True:
+        await asyncio.sleep(SAVE_INTERVAL)
+        save_retained(path)
+
+
+async def expire_loaded_retained(grace):
+    """Drop loaded retained messages whose publisher did not reconnect in time"""
+    await asyncio.sleep(grace)
+    connected = list(clients_by_key)
+    if cluster is not None:
+        connected += list(cluster.directory)
+    dropped = retained.expire_loaded(connected)
+    if dropped:
+        logger.info(f"Dropped {dropped} retained message(s) of clients that did not come back")
+
+
+# ---------------- Shard hooks (see control_room/hub/cluster.py) ----------------
+
+async def on_shard_frame(topic, seq, frame, target):
+    """A frame stamped by the topic's owner on another shard"""
+    replay_buffer.observe(topic, seq, frame, target)
+    if target is None:
+        # The owner sends a targeted frame to its client itself
+        await fan_out(topic, frame)
+
+
+async def on_shard_send(key, frame):
+    websocket = clients_by_key.get(key)
+    if websocket is not None:
+        enqueue(websocket, frame)
+
+
+def on_shard_join(key):
+    """A client connected to another shard; a socket here with its key is stale"""
+    clients_by_key.pop(key, None)
+
+
+def on_shard_retain(topic, key, frame, publisher, target):
+    """A retained message was set or cleared on another shard"""
+    if frame is None:
+        retained.clear(topic, key)
+    else:
+        retained.set(topic, key, frame, publisher, target)
+
+
+def on_shard_leave(key, client_type, topics):
+    """A client left another shard for good"""
+    departed.add(key, topics)
+    retained.drop_publisher(key)
+    if client_type == "ert" and websocket_handlers:
+        asyncio.create_task(websocket_handlers.handle_disconnection(key))
+
 
 async def handler(websocket):
-    print(f"Client connected: {websocket.remote_address}")
+    logger.info(f"Client connected: {websocket.remote_address}")
     connected_clients.add(websocket)
+    limit_send_buffer(websocket)
+    outboxes[websocket] = PriorityOutbox(websocket.send)
+    clients_by_key[client_key(websocket)] = websocket
+    if cluster is not None:
+        cluster.announce_join(client_key(websocket), None)
     client_id = None
     client_type = None
+    connection = next(connection_numbers)
+    received = 0
     
     try:
         async for message in websocket:
-            data = json.loads(message)
-            msg_type = data.get("type")
+            received += 1
+            if received % READ_BATCH == 0:
+                await asyncio.sleep(0)  # let other connections and the outboxes run
+            # Checked against the schemas before anything else; see hub/schemas.py
+            data, error = parse_frame(message)
+            if error is not None:
+                frame_type = data.get("type") if data is not None else None
+                MESSAGES_REJECTED.inc((frame_type if frame_type in ENVELOPES else "unknown",))
+                if recorder is not None:
+                    recorder.record(time.time(), connection, client_id, None, message)
+                logger.warning(f"Rejected frame: {error}",
+                               extra={"event": "hub.rejected", "client_id": client_id})
+                enqueue(websocket, error_frame(data, error))
+                continue
+
+            msg_type = data["type"]
             topic = data.get("topic")
+            MESSAGES_IN.inc((msg_type, topic_label(topic), client_type_label(client_type)))
+            if recorder is not None:
+                # A register frame is attributed to the client it registers
+                recorder.record(time.time(), connection,
+                                data["client_id"] if msg_type == "register" else client_id, topic, message)
             
             # 0. Handle Client Registration (identify CR or ERT)
             if msg_type == "register":
-                client_type = data.get("client_type")  # 'cr' or 'ert'
-                client_id = data.get("client_id")  # unit ID or 'control_room'
+                client_type = data["client_type"]  # 'cr' or 'ert'
+                client_id = data["client_id"]  # unit ID or 'control_room'
+                previous_key = client_key(websocket)
+                clients_by_key.pop(previous_key, None)
                 client_info[websocket] = {"type": client_type, "id": client_id}
-                print(f"[HUB SERVER] - Client registered: {client_type.upper()} - {client_id}")
+                # A reconnecting client takes over its key from the stale socket
+                clients_by_key[client_key(websocket)] = websocket
+                if cluster is not None:
+                    cluster.announce_leave(previous_key)
+                    cluster.announce_join(client_key(websocket), client_type)
+                    for subscribed_topic, sockets in subscriptions.items():
+                        if websocket in sockets:
+                            cluster.announce_subscribe(subscribed_topic, client_key(websocket))
+                logger.info(f"Client registered: {str(client_type).upper()} - {client_id}",
+                            extra={"client_id": client_id, "client_type": client_type})
                 continue
 
             # 1. Handle Subscription Requests
             if msg_type == "subscribe":
-                subscriptions[topic].add(websocket)
-                print(f"[HUB SERVER] - Client subscribed to '{topic}'")
+                last_seq = data.get("last_seq")
+                departed.discard(client_key(websocket), topic)
+                # Tell the client where the topic currently is so it can resume later
+                enqueue(websocket, serialization.dumps({
+                    "type": "subscribed",
+                    "topic": topic,
+                    "seq": replay_buffer.current_seq(topic)
+                }))
+                if last_seq is None:
+                    # A new subscriber starts from the retained state, then gets live traffic
+                    priority = priority_of(topic)
+                    for frame in retained.frames_for(topic, client_key(websocket)):
+                        enqueue(websocket, frame, priority)
+                    subscriptions[topic].add(websocket)
+                    logger.info(f"Client subscribed to '{topic}'",
+                                extra={"event": "hub.subscribe", "topic": topic, "client_id": client_id})
+                else:
+                    await send_replay(websocket, topic, last_seq)
+                    logger.info(f"Client resumed '{topic}' after seq {last_seq}",
+                                extra={"event": "hub.subscribe", "topic": topic, "client_id": client_id})
+                if cluster is not None:
+                    cluster.announce_subscribe(topic, client_key(websocket))
 
             # 2. Handle Publish Requests
             elif msg_type == "publish":
                 payload = data.get("payload")
-                print(f"[HUB SERVER] - Broadcasting message on '{topic}': {payload}")
-                
-                # Forward the message to everyone subscribed to this topic
-                # EXCLUDING the sender (optional, usually desired)
-                if topic in subscriptions:
-                    # Create the standard message format
-                    response = json.dumps({
-                        "topic": topic,
-                        "payload": payload
-                    })
-                    
-                    # Send to all subscribers
-                    subscribers = subscriptions[topic]
-                    for subscriber in subscribers:
-                        # Optional: Don't echo back to sender if you don't want to
-                        # if subscriber != websocket: 
-                        await subscriber.send(response)
+                msg_id = data.get("msg_id")  # only set for at-least-once (QoS 1) topics
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Broadcasting message on '{topic}'",
+                                 extra={"event": "hub.broadcast", "topic": topic, "client_id": client_id})
+                if data.get("retain"):
+                    retain(client_key(websocket), topic, data.get("retain_key", ""), payload)
+                await publish(client_key(websocket), topic, payload, msg_id)
+
+            # 2b. Several publishes in one frame; bad messages are dropped on their own
+            elif msg_type == "publish_batch":
+                messages = []
+                rejected = []
+                for index, message in enumerate(data["messages"]):
+                    error = check_batch_message(message)
+                    if error is None:
+                        messages.append((message["topic"], message.get("payload")))
+                        if message.get("retain"):
+                            retain(client_key(websocket), message["topic"], message.get("retain_key", ""),
+                                   message.get("payload"))
+                    else:
+                        rejected.append(f"message {index}: {error}")
+                if rejected:
+                    MESSAGES_REJECTED.inc(("publish_batch",), len(rejected))
+                    error = f"{len(rejected)} of {len(data['messages'])} messages rejected; {rejected[0]}"
+                    logger.warning(f"Rejected frame: {error}",
+                                   extra={"event": "hub.rejected", "client_id": client_id})
+                    enqueue(websocket, error_frame(data, error))
+                await publish_batch(client_key(websocket), messages)
+
+            # 3. Handle Acknowledgments of QoS 1 messages
+            elif msg_type == "ack":
+                msg_id = data["msg_id"]
+                if cluster is None or delivery_tracker.is_tracked(msg_id):
+                    await delivery_tracker.ack(msg_id, client_key(websocket))
+                else:
+                    # Tracked by the shard that owns the message's topic
+                    cluster.forward_ack(msg_id, client_key(websocket))
+
+            # 4. Handle RPC requests: to every subscriber of a topic, or to one client
+            elif msg_type == "request":
+                msg_id = data.get("msg_id")
+
+                correlation_id = data["correlation_id"]
+                routing = {"correlation_id": correlation_id, "reply_to": client_key(websocket)}
+                target = data.get("target")
+                if data.get("retain"):
+                    # Kept for the target (or every subscriber) as a plain message, without routing
+                    retain(client_key(websocket), topic, data.get("retain_key", target or ""),
+                           data.get("payload"), target)
+                if target is not None:
+                    # Direct request, handled by the target's callbacks for `topic`. Stamped and
+                    # buffered like a publish, so a target that is reconnecting still gets it
+                    routing["target"] = target
+                recipients = await publish(client_key(websocket), topic, data.get("payload"), msg_id, routing)
+                if recipients is None:
+                    continue  # retransmission
+                if target is not None:
+                    recipients = 1
+
+                # Let the requester know how many responses to wait for
+                enqueue(websocket, serialization.dumps({
+                    "type": "routed",
+                    "correlation_id": correlation_id,
+                    "recipients": recipients
+                }))
+
+            # 4b. Forget a retained message
+            elif msg_type == "clear_retained":
+                clear_retained(topic, data.get("retain_key", ""))
+
+            # 5. Route RPC responses back to whoever asked
+            elif msg_type == "response":
+                await send_to_client(data["reply_to"], serialization.dumps({
+                    "type": "response",
+                    "correlation_id": data["correlation_id"],
+                    "responder": client_key(websocket),
+                    "payload": data.get("payload")
+                }))
 
     except websockets.exceptions.ConnectionClosed:
-        print(f"[HUB SERVER] - Client disconnected: {websocket.remote_address}")
+        logger.info(f"Client disconnected: {websocket.remote_address}", extra={"client_id": client_id})
     finally:
         # Cleanup
         connected_clients.remove(websocket)
-        for topic in subscriptions:
-            subscriptions[topic].discard(websocket)
+        outboxes.pop(websocket).close()
+        left_topics = []
+        for topic, sockets in subscriptions.items():
+            if websocket in sockets:
+                sockets.discard(websocket)
+                left_topics.append(topic)
+
+        # Only drop the key if a reconnected socket has not already taken it over
+        key = client_key(websocket)
+        reconnected = clients_by_key.get(key) is not websocket
+        if not reconnected:
+            del clients_by_key[key]
+            departed.add(key, left_topics)
+            if not stopping:
+                retained.drop_publisher(key)  # other shards do the same on its leave
+
+        if cluster is not None:
+            if not reconnected:
+                cluster.announce_leave(key)
+            else:
+                # Keep the subscriptions the new socket (here or on another shard) made
+                current = clients_by_key.get(key)
+                for topic in left_topics:
+                    if current is None or current not in subscriptions.get(topic, ()):
+                        cluster.announce_unsubscribe(topic, key)
         
         # Handle disconnection for ERT units
         if websocket in client_info:
@@ -70,24 +641,117 @@ async def handler(websocket):
             client_id = info.get("id")
             
             # Call handler for ERT disconnection to remove from incident assignments
-            if client_type == "ert" and websocket_handlers:
+            if client_type == "ert" and websocket_handlers and not reconnected:
                 try:
                     # Schedule the handler as a task
                     task = asyncio.create_task(websocket_handlers.handle_disconnection(client_id))
                 except Exception as e:
-                    print(f"Error handling disconnection for {client_id}: {e}")
+                    logger.error(f"Error handling disconnection: {e}", extra={"client_id": client_id})
             
             del client_info[websocket]
 
-async def main(handlers=None):
+async def main(handlers=None, shard=0, shards=1, ipc_dir=None, record_path=None, retain_path=None):
+    """
+    Run the hub (or one shard of it) until cancelled
+
+    Args:
+        handlers: WebSocket handlers, for disconnect handling (shard 0 only)
+        shard: This shard's number
+        shards: Number of shard processes sharing the port
+        ipc_dir: Directory for the inter-shard sockets (see start_shards)
+        record_path: Traffic log to record inbound frames to; each shard
+            appends ``.<shard>`` to it
+        retain_path: File keeping the retained messages across restarts;
+            every shard loads it, shard 0 saves it
+    """
     # Set the handlers reference for disconnect handling
-    global websocket_handlers
+    global websocket_handlers, cluster, recorder, stopping
     websocket_handlers = handlers
+
+    if record_path:
+        recorder = TrafficRecorder(f"{record_path}.{shard}" if shards > 1 else record_path)
+        atexit.register(recorder.close)
+        asyncio.create_task(flush_recorder())
+
+    if retain_path:
+        loaded = retained.load(retain_path)
+        if loaded:
+            logger.info(f"Loaded {loaded} retained message(s) from {retain_path}")
+            asyncio.create_task(expire_loaded_retained(DEFAULT_GRACE))
+        if shard == 0:
+            atexit.register(save_retained, retain_path)
+            asyncio.create_task(save_retained_regularly(retain_path))
+
+    if shards > 1:
+        cluster = HubCluster(
+            shard, shards, ipc_dir,
+            on_frame=on_shard_frame, on_publish=publish, on_send=on_shard_send,
+            on_ack=delivery_tracker.ack, on_join=on_shard_join, on_leave=on_shard_leave,
+            on_retain=on_shard_retain
+        )
+        await cluster.start()
     
-    # Listen on all interfaces (0.0.0.0) on port 8765
-    async with websockets.serve(handler, "0.0.0.0", 8765):
-        print("Hub Server started on ws://0.0.0.0:8765")
-        await asyncio.Future()  # Run forever
+    # Listen on all interfaces (0.0.0.0) on port 8765; shards share it
+    async with websockets.serve(handler, "0.0.0.0", HUB_PORT, reuse_port=shards > 1):
+        logger.info(f"Hub Server started on ws://0.0.0.0:{HUB_PORT} (shard {shard + 1}/{shards})")
+        try:
+            await asyncio.Future()  # Run forever
+        finally:
+            # Closing the server drops every connection; keep what those clients retained
+            stopping = True
+
+
+def run_shard(shard, shards, ipc_dir, record_path=None, retain_path=None):
+    """Entry point of the shard processes started by start_shards()"""
+    setup_logging(f"hub-{shard}")
+    # Exit with the process that started us, even if it was killed without cleaning up
+    parent = multiprocessing.parent_process()
+    if parent is not None:
+        threading.Thread(target=lambda: (parent.join(), os._exit(0)), daemon=True).start()
+    asyncio.run(main(shard=shard, shards=shards, ipc_dir=ipc_dir, record_path=record_path,
+                     retain_path=retain_path))
+
+
+def start_shards(shards, record_path=None, retain_path=None):
+    """
+    Start shards 1..N-1 as processes; the caller runs shard 0 with main()
+
+    Args:
+        shards: Total number of hub shards
+        record_path: Traffic log path passed on to main()
+        retain_path: Retained message file passed on to main()
+
+    Returns:
+        Directory for the inter-shard sockets, to pass to main()
+
+    Raises:
+        OSError: If the hub port is already in use
+    """
+    # SO_REUSEPORT would let us silently share the port with another hub;
+    # a plain bind still fails if one is running
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # ignore TIME_WAIT leftovers
+        probe.bind(("0.0.0.0", HUB_PORT))
+
+    ipc_dir = tempfile.mkdtemp(prefix="stjabah-hub-")
+    atexit.register(shutil.rmtree, ipc_dir, True)
+    context = multiprocessing.get_context("spawn")  # the caller may already run threads
+    for shard in range(1, shards):
+        context.Process(
+            target=run_shard, args=(shard, shards, ipc_dir, record_path, retain_path), name=f"hub-{shard}",
+            daemon=True
+        ).start()
+    return ipc_dir
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    setup_logging("hub")
+    hub_shards = int(os.environ.get("HUB_SHARDS", "1"))
+    hub_record = os.environ.get("HUB_RECORD")
+    hub_retain = os.environ.get("HUB_RETAIN_FILE")
+    asyncio.run(main(
+        shards=hub_shards,
+        ipc_dir=start_shards(hub_shards, hub_record, hub_retain) if hub_shards > 1 else None,
+        record_path=hub_record,
+        retain_path=hub_retain
+    ))
\ No newline at end of file
@@ -4,16 +4,20 @@ from enum import Enum
 from datetime import datetime
 from typing import Optional
 
+from control_room.model.versioned import VersionedModel
+
 class IncidentStatus(Enum):
     """Incident status enumeration"""
     CREATED = "created"
+    DISPATCHING = "dispatching"
     DISPATCHED = "dispatched"
+    ACKNOWLEDGED = "acknowledged"
     IN_PROGRESS = "in_progress"
     RESOLVED = "resolved"
     PENDING = "pending"
 
 
-class Incident:
+class Incident(VersionedModel):
     """Incident model"""
 
     def __init__(
@@ -24,6 +28,7 @@ class Incident:
         created_at: Optional[datetime] = None,
         resolved_at: Optional[datetime] = None,
         id: Optional[str] = None,
+        required_units: int = 1,
     ):
         self.id = id
         self.x = x
@@ -31,9 +36,9 @@ class Incident:
         self.status = status
         self.created_at = created_at
         self.resolved_at = resolved_at
+        self.required_units = required_units
 
-    def to_dict(self) -> dict:
-        """Convert incident to dictionary for JSON serialization"""
+    def _build_dict(self) -> dict:
         return {
             'id': self.id,
             'x': self.x,
@@ -41,4 +46,18 @@ class Incident:
             'status': self.status.value,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None,
+            'required_units': self.required_units,
         }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Incident":
+        """Rebuild an incident from to_dict() output (e.g. the archive)"""
+        return cls(
+            x=data['x'],
+            y=data['y'],
+            status=IncidentStatus(data['status']),
+            created_at=datetime.fromisoformat(data['created_at']) if data.get('created_at') else None,
+            resolved_at=datetime.fromisoformat(data['resolved_at']) if data.get('resolved_at') else None,
+            id=data['id'],
+            required_units=data.get('required_units', 1),
+        )
@@ -4,6 +4,8 @@ from enum import Enum
 from datetime import datetime
 from typing import Optional
 
+from control_room.model.versioned import VersionedModel
+
 class UnitStatus(Enum):
     """Unit status enumeration"""
     ACTIVE = "active"
@@ -11,7 +13,7 @@ class UnitStatus(Enum):
     UNAVAILABLE = "unavailable"
 
 
-class Unit:
+class Unit(VersionedModel):
     """Unit model"""
 
     def __init__(
@@ -20,20 +22,30 @@ class Unit:
         x: float,
         y: float,
         status: 'UnitStatus' = None,
-        assigned_incident: Optional[str] = None
+        assigned_incident: Optional[str] = None,
+        vx: float = 0.0,
+        vy: float = 0.0,
+        reported_at: Optional[float] = None
     ):
         self.id = id
         self.x = x
         self.y = y
         self.status = status or UnitStatus.ACTIVE
         self.assigned_incident = assigned_incident
+        # Velocity (map units per second) and receive time (epoch seconds) of
+        # the last location report, for dead reckoning between reports
+        self.vx = vx
+        self.vy = vy
+        self.reported_at = reported_at
 
-    def to_dict(self) -> dict:
-        """Convert unit to dictionary for JSON serialization"""
+    def _build_dict(self) -> dict:
         return {
             'id': self.id,
             'x': self.x,
             'y': self.y,
             'status': self.status.value,
-            'assigned_incident': self.assigned_incident
+            'assigned_incident': self.assigned_incident,
+            'vx': self.vx,
+            'vy': self.vy,
+            'reported_at': self.reported_at
         }
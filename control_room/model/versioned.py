@@ -0,0 +1,54 @@
+"""Base class for models with a cached serialized form
+
+Every assignment to a public attribute bumps the model's ``version``.
+``to_dict()`` and ``to_json()`` are built once per version and then
+served from the cache, so reading an unchanged entity again (API
+responses, dispatch payloads, broadcasts) costs no formatting or
+encoding at all.
+"""
+
+from typing import Any, Optional
+
+from communication import serialization
+
+
+class VersionedModel:
+    """Model whose dict/JSON form is cached until one of its fields changes"""
+
+    _version = 0
+    _cache: Optional[list] = None  # [version, dict, json text or None]
+
+    def __setattr__(self, name: str, value: Any):
+        object.__setattr__(self, name, value)
+        if name[0] != "_":
+            object.__setattr__(self, "_version", self._version + 1)
+
+    @property
+    def version(self) -> int:
+        """Number of field assignments since creation"""
+        return self._version
+
+    def _build_dict(self) -> dict:
+        raise NotImplementedError
+
+    def _cached(self) -> list:
+        version = self._version
+        cache = self._cache
+        if cache is None or cache[0] != version:
+            # Tagged with the version read *before* building: a concurrent
+            # change makes the entry stale instead of silently wrong
+            cache = [version, self._build_dict(), None]
+            self._cache = cache
+        return cache
+
+    def to_dict(self) -> dict:
+        """Convert to a dictionary for JSON serialization (a copy; safe to modify)"""
+        return dict(self._cached()[1])
+
+    def to_json(self) -> str:
+        """Compact JSON encoding, cached per version"""
+        cache = self._cached()
+        text = cache[2]
+        if text is None:
+            text = cache[2] = serialization.dumps(cache[1])
+        return text
@@ -0,0 +1,111 @@
+"""Multi-process read API for the fleet
+
+Starts several worker processes that serve the read-only fleet endpoints
+(``control_room/api/fleet_read_api.py``) from the shared-memory fleet
+table. Every worker binds the same port with ``SO_REUSEPORT``, so the
+kernel spreads connections over them and read throughput grows with the
+number of cores. Each worker is a separate interpreter with its own GIL,
+and none of them holds a copy of the Control Room's state.
+
+Workers are started with the ``spawn`` method: the Control Room process
+already runs threads, which makes ``fork`` unsafe. Platforms without
+``SO_REUSEPORT`` (Windows) get a single worker.
+"""
+
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+from typing import List
+
+from flask import Flask
+from flask_cors import CORS
+from werkzeug.serving import make_server
+
+from communication.logging_setup import setup_logging
+from communication.serialization import install_json_provider
+from control_room.api.fleet_read_api import init_fleet_read_api
+from control_room.repository.fleet_table import SharedFleetTable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_READ_PORT = 5003
+
+
+def _listen(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(128)
+    return sock
+
+
+def create_read_app(table: SharedFleetTable) -> Flask:
+    """Flask app with the read-only fleet endpoints"""
+    app = Flask(__name__)
+    install_json_provider(app)
+    CORS(app)
+    app.register_blueprint(init_fleet_read_api(table), url_prefix='/cr')
+
+    @app.route('/health', methods=['GET'])
+    def health_check():
+        return {
+            'status': 'healthy',
+            'service': 'emergency-response-system',
+            'component': 'control-room-read-worker'
+        }, 200
+
+    return app
+
+
+def run_read_worker(table_name: str, host: str, port: int, worker_id: int):
+    """Worker process entry point: attach to the table and serve until killed"""
+    setup_logging(f"cr-read-{worker_id}")
+
+    # Exit with the Control Room, even if it was killed without cleaning up
+    parent = multiprocessing.parent_process()
+    if parent is not None:
+        threading.Thread(target=lambda: (parent.join(), os._exit(0)), daemon=True).start()
+
+    table = SharedFleetTable.attach(table_name)
+    sock = _listen(host, port)
+    server = make_server(host, port, create_read_app(table), threaded=True, fd=sock.fileno())
+    logger.info(f"📖 Read worker {worker_id} serving http://{host}:{port}/cr/units")
+    try:
+        server.serve_forever()
+    finally:
+        table.close()
+
+
+def start_read_workers(table: SharedFleetTable, workers: int, host: str = "127.0.0.1",
+                       port: int = DEFAULT_READ_PORT) -> List[multiprocessing.Process]:
+    """
+    Start the read worker processes
+
+    Args:
+        table: Fleet table created (and published) by this process
+        workers: Number of worker processes
+        host: Interface to bind
+        port: Port shared by all workers
+
+    Returns:
+        The started processes (daemonic: they exit with the Control Room)
+    """
+    if workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        logger.warning("SO_REUSEPORT is not available on this platform; starting a single read worker")
+        workers = 1
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for worker_id in range(workers):
+        process = context.Process(
+            target=run_read_worker,
+            args=(table.name, host, port, worker_id),
+            name=f"cr-read-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        processes.append(process)
+    return processes
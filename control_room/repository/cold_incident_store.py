@@ -0,0 +1,291 @@
+"""On-disk archive of resolved incidents
+
+The incident repository keeps live incidents in memory. Resolved
+incidents older than a configurable age are moved here, so the in-memory
+map, and every scan over it, only holds recent incidents however long
+the Control Room runs.
+
+Archived incidents are appended in blocks to one segment file per day
+(``incidents-YYYY-MM-DD.seg``). Each block has a fixed header followed by
+the zlib-compressed JSON lines of the incidents archived together::
+
+    magic          4 bytes  b"INCB"
+    length         u32      compressed payload bytes
+    count          u32      incidents in the block
+    first_created  f64      earliest created_at (epoch seconds, UTC)
+    last_created   f64      latest created_at
+
+Lookups go through two small in-memory indexes:
+
+- by ID: a sorted numpy array of IDs with the block and line number of
+  each (about 44 bytes per archived incident), searched with binary
+  search, so a lookup decodes a single JSON line,
+- by time: the created_at and resolved_at range of every block, so a
+  time range query only decompresses the blocks overlapping it (the
+  resolved_at range is taken from the incidents when the block is
+  written or loaded; it is not part of the header).
+
+Recently read blocks are cached decompressed (as undecoded lines). Segments are only
+appended to; the indexes are rebuilt by scanning the segments when the
+store is opened again.
+"""
+
+import datetime
+import logging
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from communication import serialization
+from control_room.model.incident import Incident
+
+logger = logging.getLogger(__name__)
+
+BLOCK_MAGIC = b"INCB"
+BLOCK_CACHE_SIZE = 8
+DEFAULT_ARCHIVE_AFTER = 3600.0  # seconds after resolution
+DEFAULT_ARCHIVE_INTERVAL = 60.0  # seconds between archival passes
+
+_BLOCK_HEADER = struct.Struct("<4sIIdd")
+
+
+def epoch(moment: Optional[datetime.datetime]) -> float:
+    """Epoch seconds of a naive UTC datetime (as stored on incidents)"""
+    if moment is None:
+        return 0.0
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.timestamp()
+
+
+class _Block(NamedTuple):
+    path: str
+    offset: int  # of the payload, after the header
+    length: int
+    count: int
+    first_created: float
+    last_created: float
+    first_resolved: float
+    last_resolved: float
+
+
+class ColdIncidentStore:
+    """Append-only, compressed store of archived incidents"""
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory: Directory holding the segment files; created if missing
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._write_lock = threading.Lock()
+        self._blocks: List[_Block] = []
+        # (sorted IDs, block number, line in block); replaced as a whole, so readers need no lock
+        self._index = (np.array([], dtype="S1"), np.array([], dtype=np.int32), np.array([], dtype=np.int32))
+        self._cache: "OrderedDict[int, List[bytes]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._index[0])
+
+    def __contains__(self, incident_id: str) -> bool:
+        return self._find(incident_id) is not None
+
+    # ---------------- Writing ----------------
+
+    def append(self, incidents: Iterable[Incident]) -> int:
+        """
+        Archive incidents as one block
+
+        Args:
+            incidents: Incidents to archive (not already archived)
+
+        Returns:
+            Number of incidents written
+        """
+        incidents = list(incidents)
+        if not incidents:
+            return 0
+        payload = zlib.compress("\n".join(serialization.dumps(incident) for incident in incidents).encode())
+        created = [epoch(incident.created_at) for incident in incidents]
+        resolved = [epoch(incident.resolved_at) for incident in incidents]
+        header = _BLOCK_HEADER.pack(BLOCK_MAGIC, len(payload), len(incidents), min(created), max(created))
+
+        with self._write_lock:
+            day = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d")
+            path = os.path.join(self.directory, f"incidents-{day}.seg")
+            with open(path, "ab") as f:
+                offset = f.tell() + _BLOCK_HEADER.size
+                f.write(header + payload)
+            self._add_block(
+                _Block(path, offset, len(payload), len(incidents), min(created), max(created),
+                       min(resolved), max(resolved)),
+                [incident.id for incident in incidents]
+            )
+        return len(incidents)
+
+    def _add_block(self, block: _Block, ids: List[str]):
+        block_number = len(self._blocks)
+        self._blocks.append(block)
+        new_ids = np.array([incident_id.encode() for incident_id in ids])
+        order = np.argsort(new_ids)
+        new_ids = new_ids[order]
+
+        ids_index, block_index, line_index = self._index
+        if new_ids.dtype.itemsize > ids_index.dtype.itemsize:
+            ids_index = ids_index.astype(new_ids.dtype)
+        positions = np.searchsorted(ids_index, new_ids)
+        self._index = (
+            np.insert(ids_index, positions, new_ids),
+            np.insert(block_index, positions, np.full(len(new_ids), block_number, dtype=np.int32)),
+            np.insert(line_index, positions, order.astype(np.int32))
+        )
+
+    def _load(self):
+        """Rebuild the indexes from the segment files"""
+        segments = sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith("incidents-") and name.endswith(".seg")
+        )
+        for name in segments:
+            path = os.path.join(self.directory, name)
+            with open(path, "rb") as f:
+                data = f.read()
+            offset = 0
+            while offset + _BLOCK_HEADER.size <= len(data):
+                magic, length, count, first_created, last_created = _BLOCK_HEADER.unpack_from(data, offset)
+                start = offset + _BLOCK_HEADER.size
+                if magic != BLOCK_MAGIC or start + length > len(data):
+                    logger.warning(f"Ignoring damaged archive data in {path} from byte {offset}")
+                    break
+                records = [Incident.from_dict(serialization.loads(line))
+                           for line in zlib.decompress(data[start:start + length]).splitlines()]
+                resolved = [epoch(incident.resolved_at) for incident in records]
+                self._add_block(
+                    _Block(path, start, length, count, first_created, last_created, min(resolved), max(resolved)),
+                    [incident.id for incident in records]
+                )
+                offset = start + length
+        if segments:
+            logger.info(f"Opened incident archive with {len(self)} incidents in {len(self._blocks)} blocks")
+
+    # ---------------- Reading ----------------
+
+    def get(self, incident_id: str) -> Optional[Incident]:
+        """Archived incident by ID, or None"""
+        location = self._find(incident_id)
+        if location is None:
+            return None
+        block_number, line = location
+        return Incident.from_dict(serialization.loads(self._read_block(block_number)[line]))
+
+    def find_by_created(self, start: Optional[datetime.datetime] = None,
+                        end: Optional[datetime.datetime] = None) -> List[Incident]:
+        """
+        Archived incidents created in [start, end)
+
+        Args:
+            start: Earliest created_at (inclusive); unbounded if None
+            end: Latest created_at (exclusive); unbounded if None
+
+        Returns:
+            Matching incidents, oldest first
+        """
+        return self._find_between("created", start, end)
+
+    def find_by_resolved(self, start: Optional[datetime.datetime] = None,
+                         end: Optional[datetime.datetime] = None) -> List[Incident]:
+        """
+        Archived incidents resolved in [start, end)
+
+        Args:
+            start: Earliest resolved_at (inclusive); unbounded if None
+            end: Latest resolved_at (exclusive); unbounded if None
+
+        Returns:
+            Matching incidents, earliest resolution first
+        """
+        return self._find_between("resolved", start, end)
+
+    def _find_between(self, field: str, start: Optional[datetime.datetime],
+                      end: Optional[datetime.datetime]) -> List[Incident]:
+        low = epoch(start) if start is not None else float("-inf")
+        high = epoch(end) if end is not None else float("inf")
+        found = []
+        for block_number, block in enumerate(list(self._blocks)):
+            if getattr(block, f"last_{field}") < low or getattr(block, f"first_{field}") >= high:
+                continue
+            for line in self._read_block(block_number):
+                incident = Incident.from_dict(serialization.loads(line))
+                if low <= epoch(getattr(incident, f"{field}_at")) < high:
+                    found.append(incident)
+        found.sort(key=lambda incident: epoch(getattr(incident, f"{field}_at")))
+        return found
+
+    def _find(self, incident_id: str) -> Optional[Tuple[int, int]]:
+        ids, blocks, lines = self._index
+        key = incident_id.encode()
+        if len(key) > ids.dtype.itemsize:
+            return None
+        position = int(np.searchsorted(ids, key))
+        if position < len(ids) and ids[position] == key:
+            return int(blocks[position]), int(lines[position])
+        return None
+
+    def _read_block(self, block_number: int) -> List[bytes]:
+        with self._cache_lock:
+            lines = self._cache.get(block_number)
+            if lines is not None:
+                self._cache.move_to_end(block_number)
+                return lines
+        block = self._blocks[block_number]
+        with open(block.path, "rb") as f:
+            f.seek(block.offset)
+            lines = zlib.decompress(f.read(block.length)).splitlines()
+        with self._cache_lock:
+            self._cache[block_number] = lines
+            while len(self._cache) > BLOCK_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return lines
+
+
+class IncidentArchiver:
+    """Background thread moving old resolved incidents to the cold store"""
+
+    def __init__(self, repository, archive_after: float = DEFAULT_ARCHIVE_AFTER,
+                 interval: float = DEFAULT_ARCHIVE_INTERVAL):
+        """
+        Args:
+            repository: InMemoryIncidentRepository with a cold store
+            archive_after: Seconds after resolution before an incident is archived
+            interval: Seconds between archival passes
+        """
+        self.repository = repository
+        self.archive_after = archive_after
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="incident-archiver", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.archive_after)
+            try:
+                archived = self.repository.archive_resolved(cutoff)
+                if archived:
+                    logger.info(f"Archived {archived} resolved incident(s)")
+            except Exception as e:
+                logger.error(f"Failed to archive incidents: {e}")
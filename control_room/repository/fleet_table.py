@@ -0,0 +1,210 @@
+"""Shared-memory table of unit positions and statuses
+
+Lets API worker processes serve fleet reads without a copy of the
+Control Room's state and without touching its GIL. The Control Room
+process is the only writer: it periodically copies the unit position
+index into a ``multiprocessing.shared_memory`` segment. Any number of
+reader processes attach to the segment by name.
+
+Consistency uses a seqlock. The header holds a sequence number that the
+writer makes odd before it changes anything and even again afterwards.
+A reader notes the sequence, copies the table, and keeps the copy only
+if the sequence was even and did not change meanwhile; otherwise it
+retries. Readers never block the writer, and the writer never waits for
+readers.
+
+The segment has a fixed capacity. Unit and incident IDs are stored as
+fixed-width UTF-8 (``ID_BYTES``) and re-encoded only when the index
+reports that an ID or assignment changed.
+"""
+
+import logging
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+from control_room.repository.position_index import FREE, UnitPositionIndex
+
+logger = logging.getLogger(__name__)
+
+ID_BYTES = 40
+DEFAULT_CAPACITY = 65536
+DEFAULT_PUBLISH_INTERVAL = 0.05  # seconds
+MAX_READ_ATTEMPTS = 1000
+
+HEADER = np.dtype([
+    ("seq", "<u8"),
+    ("count", "<u8"),
+    ("capacity", "<u8"),
+    ("published_at", "<f8"),
+])
+RECORD = np.dtype([
+    ("id", f"S{ID_BYTES}"),
+    ("assigned", f"S{ID_BYTES}"),
+    ("x", "<f8"),
+    ("y", "<f8"),
+    ("vx", "<f8"),
+    ("vy", "<f8"),
+    ("reported_at", "<f8"),
+    ("status", "i1"),
+    ("busy", "?"),
+])
+
+
+class FleetSnapshot:
+    """A consistent copy of the table"""
+
+    def __init__(self, records: np.ndarray, published_at: float):
+        live = records["status"] != FREE
+        self.records = records[live]
+        self.published_at = published_at
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
+class SharedFleetTable:
+    """Seqlock-protected unit table in shared memory"""
+
+    def __init__(self, memory: shared_memory.SharedMemory, owner: bool):
+        self.memory = memory
+        self.owner = owner
+        self._header = np.ndarray((), dtype=HEADER, buffer=memory.buf)
+        capacity = int(self._header["capacity"])
+        self._records = np.ndarray((capacity,), dtype=RECORD, buffer=memory.buf, offset=HEADER.itemsize)
+        self._labels_version = -1
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    @property
+    def capacity(self) -> int:
+        return len(self._records)
+
+    @classmethod
+    def create(cls, capacity: int = DEFAULT_CAPACITY, name: Optional[str] = None) -> "SharedFleetTable":
+        """
+        Create the segment (writer side)
+
+        Args:
+            capacity: Maximum number of index slots the table can hold
+            name: Segment name; derived from the process ID if omitted
+        """
+        memory = shared_memory.SharedMemory(
+            name=name or f"stjabah_fleet_{os.getpid()}",
+            create=True,
+            size=HEADER.itemsize + capacity * RECORD.itemsize
+        )
+        header = np.ndarray((), dtype=HEADER, buffer=memory.buf)
+        header["seq"] = 0
+        header["count"] = 0
+        header["capacity"] = capacity
+        header["published_at"] = 0.0
+        return cls(memory, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedFleetTable":
+        """Open an existing segment (reader side)"""
+        # Not tracked: only the creating process may unlink the segment
+        return cls(shared_memory.SharedMemory(name=name, track=False), owner=False)
+
+    def close(self):
+        # numpy views must go before the buffer can be released
+        self._header = self._records = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+    # ---------------- Writer ----------------
+
+    def publish(self, index: UnitPositionIndex):
+        """Copy the position index into the table (single writer only)"""
+        header, records = self._header, self._records
+        with index.lock:
+            n = index.size
+            if n > len(records):
+                logger.warning(f"Fleet table holds {len(records)} units, index has {n} slots; truncating")
+                n = len(records)
+
+            seq = int(header["seq"])
+            header["seq"] = seq + 1  # odd: write in progress
+            records["x"][:n] = index.x[:n]
+            records["y"][:n] = index.y[:n]
+            records["vx"][:n] = index.vx[:n]
+            records["vy"][:n] = index.vy[:n]
+            records["reported_at"][:n] = index.reported_at[:n]
+            records["status"][:n] = index.status[:n]
+            records["busy"][:n] = index.busy[:n]
+            if index.labels_version != self._labels_version:
+                records["id"][:n] = [unit_id.encode() if unit_id else b"" for unit_id in index.ids[:n]]
+                records["assigned"][:n] = [
+                    incident_id.encode() if incident_id else b"" for incident_id in index.assigned[:n]
+                ]
+                self._labels_version = index.labels_version
+            header["count"] = n
+            header["published_at"] = time.time()
+            header["seq"] = seq + 2  # even: consistent again
+
+    # ---------------- Readers ----------------
+
+    def read(self) -> FleetSnapshot:
+        """
+        Copy the table consistently
+
+        Raises:
+            RuntimeError: If no consistent copy could be taken (writer stuck mid-publish)
+        """
+        header, records = self._header, self._records
+        for _ in range(MAX_READ_ATTEMPTS):
+            seq = int(header["seq"])
+            if seq & 1:
+                time.sleep(0)  # let the writer finish
+                continue
+            count = int(header["count"])
+            copy = records[:count].copy()
+            published_at = float(header["published_at"])
+            if int(header["seq"]) == seq:
+                return FleetSnapshot(copy, published_at)
+        raise RuntimeError("Fleet table is being written continuously; no consistent read")
+
+
+class FleetTablePublisher:
+    """Background thread publishing the index whenever it changed"""
+
+    def __init__(self, table: SharedFleetTable, index: UnitPositionIndex,
+                 interval: float = DEFAULT_PUBLISH_INTERVAL):
+        """
+        Args:
+            table: Table created by this process
+            index: Unit position index to mirror
+            interval: Seconds between change checks (the readers' maximum staleness)
+        """
+        self.table = table
+        self.index = index
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="fleet-table-publisher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        published = None
+        while not self._stop.wait(self.interval):
+            version = self.index.version
+            if version == published:
+                continue
+            try:
+                self.table.publish(self.index)
+                published = version
+            except Exception as e:
+                logger.error(f"Failed to publish fleet table: {e}")
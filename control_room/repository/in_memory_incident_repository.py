@@ -1,17 +1,44 @@
-"""In-memory implementation of Incident repository (for testing/development)"""
+"""In-memory implementation of Incident repository (for testing/development)
+
+With a cold store, resolved incidents past a given age are moved out of
+memory into compressed on-disk segments (``cold_incident_store.py``) and
+stay reachable by ID and by time range. ``get_all()`` then only returns
+the hot (in-memory) incidents. Archived incidents are read-only:
+``update()`` and ``delete()`` raise ``IncidentArchivedError`` for them.
+
+In-memory incidents are also indexed by created_at and resolved_at
+(``time_index.py``), so time range queries bisect into the matching
+incidents instead of walking all of them. Changing either time on a
+stored incident must be followed by ``update()`` to keep them current.
+"""
 import uuid
 import datetime
 from abc import abstractmethod
 from typing import Optional, List
-from control_room.model.incident import Incident
+from control_room.model.incident import Incident, IncidentStatus
 from control_room.repository.incident_repository import IncidentRepository
+from control_room.repository.snapshot_storage import SnapshotStorage
+from control_room.repository.cold_incident_store import ColdIncidentStore, epoch
+from control_room.repository.time_index import TimeIndex
+
+
+class IncidentArchivedError(ValueError):
+    """Raised when changing or deleting an incident that was archived"""
 
 
 class InMemoryIncidentRepository(IncidentRepository):
     """In-memory implementation of Incident repository using dictionary storage"""
 
-    def __init__(self):
-        self._storage: dict[str, Incident] = {}
+    def __init__(self, cold_store: Optional[ColdIncidentStore] = None):
+        """
+        Args:
+            cold_store: Archive for old resolved incidents (see archive_resolved)
+        """
+        # Safe to share between Flask, hub and handler threads; see snapshot_storage.py
+        self._storage: SnapshotStorage[Incident] = SnapshotStorage()
+        self._created = TimeIndex()
+        self._resolved = TimeIndex()
+        self.cold_store = cold_store
 
     def create(self, entity: Incident) -> Incident:
         """
@@ -27,7 +54,9 @@ class InMemoryIncidentRepository(IncidentRepository):
         entity.id = str(uuid.uuid4())
         entity.created_at = datetime.datetime.utcnow()
 
-        self._storage[entity.id] = entity
+        with self._storage.write_lock:
+            self._storage.put(entity.id, entity)
+            self._index(entity)
         return entity
 
     def get_by_id(self, entity_id: str) -> Optional[Incident]:
@@ -38,9 +67,13 @@ class InMemoryIncidentRepository(IncidentRepository):
             entity_id: ID of the entity to retrieve
         
         Returns:
-            Entity object if found, None otherwise
+            Entity object if found, None otherwise (archived incidents are
+            returned as read-only copies)
         """
-        return self._storage.get(entity_id)
+        incident = self._storage.get(entity_id)
+        if incident is None and self.cold_store is not None:
+            return self.cold_store.get(entity_id)
+        return incident
 
     def update(self, entity: Incident) -> Incident:
         """
@@ -51,12 +84,43 @@ class InMemoryIncidentRepository(IncidentRepository):
         
         Returns:
             Updated entity
+
+        Raises:
+            IncidentArchivedError: If the incident was archived
+            ValueError: If the incident does not exist
         """
-        if entity.id in self._storage:
-            self._storage[entity.id] = entity
-            return entity
+        with self._storage.write_lock:
+            # Checked under the lock, so a concurrent delete() cannot leave index rows behind
+            stored = self._storage.get(entity.id)
+            if stored is not None:
+                if stored is not entity:
+                    self._storage.put(entity.id, entity)
+                # Changed in place otherwise: only the time indexes may need a refresh
+                self._index(entity)
+                return entity
+        self._check_not_archived(entity.id)
         raise ValueError(f"Entity with ID {entity.id} does not exist.")
     
+    def compare_and_set_status(self, entity_id: str, expected: IncidentStatus,
+                               status: IncidentStatus) -> bool:
+        """
+        Change an incident's status only if it still has the expected one
+
+        Args:
+            entity_id: ID of the incident (archived ones are never changed)
+            expected: Status the incident must have
+            status: Status to set
+
+        Returns:
+            True if the status was changed, False otherwise
+        """
+        with self._storage.write_lock:
+            incident = self._storage.get(entity_id)
+            if incident is None or incident.status != expected:
+                return False
+            incident.status = status
+            return True
+
     def delete(self, entity_id: str) -> bool:
         """
         Delete entity by ID
@@ -66,17 +130,113 @@ class InMemoryIncidentRepository(IncidentRepository):
         
         Returns:
             True if deleted, False otherwise
+
+        Raises:
+            IncidentArchivedError: If the incident was archived
         """
-        if entity_id in self._storage:
-            del self._storage[entity_id]
-            return True
+        with self._storage.write_lock:
+            self._unindex(entity_id)
+            if self._storage.pop(entity_id):
+                return True
+        self._check_not_archived(entity_id)
         return False
+
+    def _check_not_archived(self, entity_id: str):
+        if self.cold_store is not None and entity_id in self.cold_store:
+            raise IncidentArchivedError(f"Incident with ID {entity_id} is archived.")
     
     def get_all(self) -> Incident:
         """
         Get all entities
         
         Returns:
-            List of all entities
+            List of all entities in memory (not the archived ones)
+        """
+        return list(self._storage.snapshot())
+
+    def get_by_time_range(self, start: Optional[datetime.datetime] = None,
+                          end: Optional[datetime.datetime] = None) -> List[Incident]:
+        """
+        Get incidents created in [start, end), archived ones included
+
+        Args:
+            start: Earliest created_at (inclusive); unbounded if None
+            end: Latest created_at (exclusive); unbounded if None
+
+        Returns:
+            Matching incidents, oldest first
+        """
+        return self._between(self._created, "created", start, end)
+
+    def get_by_resolved_range(self, start: Optional[datetime.datetime] = None,
+                              end: Optional[datetime.datetime] = None) -> List[Incident]:
+        """
+        Get incidents resolved in [start, end), archived ones included
+
+        Args:
+            start: Earliest resolved_at (inclusive); unbounded if None
+            end: Latest resolved_at (exclusive); unbounded if None
+
+        Returns:
+            Matching incidents, earliest resolution first
+        """
+        return self._between(self._resolved, "resolved", start, end)
+
+    def _between(self, index: TimeIndex, field: str, start: Optional[datetime.datetime],
+                 end: Optional[datetime.datetime]) -> List[Incident]:
+        low = epoch(start) if start is not None else float("-inf")
+        high = epoch(end) if end is not None else float("inf")
+        found = [self._storage.get(entity_id) for entity_id in index.between(low, high)]
+        # An incident deleted or archived since the index lookup is None here
+        found = [incident for incident in found if incident is not None]
+        if self.cold_store is not None:
+            archived = getattr(self.cold_store, f"find_by_{field}")(start, end)
+            if archived:
+                # An incident archived meanwhile may show up in both
+                found.extend(incident for incident in archived if incident.id not in self._storage)
+                found.sort(key=lambda incident: epoch(getattr(incident, f"{field}_at")))
+        return found
+
+    def _index(self, incident: Incident):
+        # Writers call this under write_lock, for incidents still in storage
+        if incident.created_at is not None:
+            self._created.add(incident.id, epoch(incident.created_at))
+        if incident.resolved_at is not None:
+            self._resolved.add(incident.id, epoch(incident.resolved_at))
+        elif incident.id in self._resolved:
+            self._resolved.remove(incident.id)
+
+    def _unindex(self, entity_id: str):
+        self._created.remove(entity_id)
+        self._resolved.remove(entity_id)
+
+    def archive_resolved(self, resolved_before: datetime.datetime) -> int:
+        """
+        Move incidents resolved before a cutoff to the cold store
+
+        The incidents are written to the archive first and only then
+        removed from memory, so readers find them in one place or the
+        other at any moment.
+
+        Args:
+            resolved_before: Archive incidents with resolved_at before this (naive UTC)
+
+        Returns:
+            Number of incidents archived
         """
-        return list(self._storage.values())
\ No newline at end of file
+        if self.cold_store is None:
+            return 0
+        candidates = [
+            incident for incident in map(self._storage.get, self._resolved.between(end=epoch(resolved_before)))
+            if incident is not None and incident.status == IncidentStatus.RESOLVED
+        ]
+        if not candidates:
+            return 0
+        self.cold_store.append(candidates)
+        with self._storage.write_lock:
+            for incident in candidates:
+                # Leave it alone if it was replaced meanwhile (the archived copy is kept)
+                if self._storage.get(incident.id) is incident:
+                    self._unindex(incident.id)
+                    self._storage.pop(incident.id)
+        return len(candidates)
\ No newline at end of file
@@ -6,12 +6,17 @@ from typing import Optional, List
 from control_room.model.incident import Incident
 from control_room.model.unit import Unit
 from control_room.repository.unit_repository import UnitRepository
+from control_room.repository.position_index import UnitPositionIndex
+from control_room.repository.snapshot_storage import SnapshotStorage
 
 class InMemoryUnitRepository(UnitRepository):
     """In-memory implementation of Unit repository using dictionary storage"""
 
     def __init__(self):
-        self._storage: dict[str, Unit] = {}
+        # Safe to share between Flask, hub and handler threads; see snapshot_storage.py
+        self._storage: SnapshotStorage[Unit] = SnapshotStorage()
+        # Columnar copy of positions/status for fleet-wide (vectorized) queries
+        self.positions = UnitPositionIndex()
 
     def create(self, entity: Unit) -> Unit:
         """
@@ -23,7 +28,9 @@ class InMemoryUnitRepository(UnitRepository):
         Returns:
             Created entity with ID
         """
-        self._storage[entity.id] = entity
+        with self._storage.write_lock:
+            self._storage.put(entity.id, entity)
+            self.positions.upsert(entity)
         return entity
 
     def get_by_id(self, entity_id: str) -> Optional[Unit]:
@@ -48,9 +55,13 @@ class InMemoryUnitRepository(UnitRepository):
         Returns:
             Updated entity
         """
-        if entity.id in self._storage:
-            self._storage[entity.id] = entity
-            return entity
+        # Under the lock, so a concurrent delete cannot slip in between the
+        # existence check and the index update and leave a stale index row
+        with self._storage.write_lock:
+            if entity.id in self._storage:
+                self._storage.put(entity.id, entity)
+                self.positions.upsert(entity)
+                return entity
         raise ValueError(f"Entity with ID {entity.id} does not exist.")
     
     def delete(self, entity_id: str) -> bool:
@@ -63,10 +74,11 @@ class InMemoryUnitRepository(UnitRepository):
         Returns:
             True if deleted, False otherwise
         """
-        if entity_id in self._storage:
-            del self._storage[entity_id]
-            return True
-        return False
+        with self._storage.write_lock:
+            if not self._storage.pop(entity_id):
+                return False
+            self.positions.remove(entity_id)
+        return True
     
     def get_all(self) -> Incident:
         """
@@ -75,4 +87,4 @@ class InMemoryUnitRepository(UnitRepository):
         Returns:
             List of all entities
         """
-        return list(self._storage.values())
\ No newline at end of file
+        return list(self._storage.snapshot())
\ No newline at end of file
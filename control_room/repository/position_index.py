@@ -0,0 +1,143 @@
+"""Columnar index of unit positions for vectorized queries
+
+The unit repository stores ``Unit`` objects in a dict, which is fine for
+lookups but means any fleet-wide computation has to loop over Python
+objects. This index mirrors the fields such computations need into NumPy
+arrays, one slot per unit, kept up to date by the repository on every
+create/update/delete. Freed slots are reused, and the arrays double in
+size when full.
+
+Units report a velocity along with their position (see
+ert/service/location_reporter.py), so ``extrapolate()`` can dead-reckon
+the whole fleet to the current time in one pass.
+
+``version`` changes on every write and ``labels_version`` only when a
+unit ID or assignment changes, so a copy of the index (the shared-memory
+fleet table) knows when, and how much, to refresh.
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from control_room.model.unit import Unit, UnitStatus
+
+# Status codes stored in the index; 0 marks a free slot
+STATUS_CODES = {status: code for code, status in enumerate(UnitStatus, start=1)}
+STATUS_BY_CODE = {code: status for status, code in STATUS_CODES.items()}
+FREE = 0
+
+
+def dead_reckon(x: np.ndarray, y: np.ndarray, vx: np.ndarray, vy: np.ndarray, reported_at: np.ndarray,
+                now: float, horizon: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Extrapolate positions from the last report
+
+    Returns:
+        (x, y, seconds since the report); units without a report time are not moved
+    """
+    age = now - reported_at
+    elapsed = np.clip(np.nan_to_num(age, nan=0.0), 0.0, horizon)
+    return x + vx * elapsed, y + vy * elapsed, age
+
+
+class UnitPositionIndex:
+    """NumPy arrays of unit coordinates, status and assignment"""
+
+    def __init__(self, capacity: int = 1024):
+        self.lock = threading.RLock()  # writers: WebSocket loop; readers: Flask threads
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.status = np.zeros(capacity, dtype=np.int8)
+        self.busy = np.zeros(capacity, dtype=bool)  # assigned to an incident it has not resolved yet
+        self.vx = np.zeros(capacity, dtype=np.float64)
+        self.vy = np.zeros(capacity, dtype=np.float64)
+        self.reported_at = np.full(capacity, np.nan)
+        self.ids: List[Optional[str]] = [None] * capacity
+        self.assigned: List[Optional[str]] = [None] * capacity  # assigned incident ID
+        self._slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        self.size = 0  # high-water mark; slots beyond it were never used
+        self.version = 0
+        self.labels_version = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def slot_of(self, unit_id: str) -> Optional[int]:
+        """Slot of a unit, or None if it is not indexed"""
+        return self._slots.get(unit_id)
+
+    def upsert(self, unit: Unit):
+        """Insert a unit or refresh its row"""
+        with self.lock:
+            slot = self._slots.get(unit.id)
+            if slot is None:
+                slot = self._allocate()
+                self._slots[unit.id] = slot
+                self.ids[slot] = unit.id
+                self.labels_version += 1
+            if self.assigned[slot] != unit.assigned_incident:
+                self.assigned[slot] = unit.assigned_incident
+                self.labels_version += 1
+            self.x[slot] = unit.x if unit.x is not None else np.nan
+            self.y[slot] = unit.y if unit.y is not None else np.nan
+            self.status[slot] = STATUS_CODES.get(unit.status, FREE)
+            self.busy[slot] = unit.assigned_incident is not None and unit.status != UnitStatus.RESOLVED
+            self.vx[slot] = unit.vx
+            self.vy[slot] = unit.vy
+            self.reported_at[slot] = unit.reported_at if unit.reported_at is not None else np.nan
+            self.version += 1
+
+    def remove(self, unit_id: str):
+        with self.lock:
+            slot = self._slots.pop(unit_id, None)
+            if slot is None:
+                return
+            self.ids[slot] = None
+            self.assigned[slot] = None
+            self.status[slot] = FREE
+            self.busy[slot] = False
+            self.reported_at[slot] = np.nan
+            self._free.append(slot)
+            self.version += 1
+            self.labels_version += 1
+
+    def extrapolate(self, now: float, horizon: float) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Estimate every unit's current position from its last report
+
+        Args:
+            now: Time to estimate for (epoch seconds)
+            horizon: Stop extrapolating this many seconds after a report
+
+        Returns:
+            (unit IDs, x, y, seconds since the last report) for units with a position
+        """
+        with self.lock:
+            n = self.size
+            slots = np.flatnonzero((self.status[:n] != FREE) & ~np.isnan(self.x[:n]))
+            x, y, age = dead_reckon(self.x[slots], self.y[slots], self.vx[slots], self.vy[slots],
+                                    self.reported_at[slots], now, horizon)
+            ids = [self.ids[slot] for slot in slots]
+        return ids, x, y, age
+
+    def _allocate(self) -> int:
+        if self._free:
+            return self._free.pop()
+        if self.size == len(self.x):
+            self._grow()
+        slot = self.size
+        self.size += 1
+        return slot
+
+    def _grow(self):
+        capacity = len(self.x) * 2
+        for name in ("x", "y", "status", "busy", "vx", "vy", "reported_at"):
+            old = getattr(self, name)
+            new = np.full(capacity, np.nan) if name == "reported_at" else np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        self.ids.extend([None] * (capacity - len(self.ids)))
+        self.assigned.extend([None] * (capacity - len(self.assigned)))
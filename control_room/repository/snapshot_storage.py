@@ -0,0 +1,68 @@
+"""Dictionary storage shared by the REST, hub and handler threads
+
+The in-memory repositories are used from Flask request threads, the
+hub's event loop thread and the main loop running the WebSocket
+handlers, all at once. This storage keeps them correct without making
+readers wait on each other:
+
+- writers (create/update/delete) hold ``write_lock``, so check-then-act
+  sequences such as "update only if it still exists" are atomic, and
+  anything kept next to the dict (the unit position index) changes in
+  the same critical section,
+- readers never take the lock: ``get()`` is a single dict lookup, and
+  ``snapshot()`` returns an immutable tuple of all values. The tuple is
+  rebuilt from an (atomic) copy of the dict only after the set of
+  entities changed; until then every reader shares it. Updates that store
+  the same object again, e.g. a location report, leave it valid.
+
+Writers bump a generation counter; a snapshot is tagged with the
+generation read before copying, so one built while a writer was busy is
+simply rebuilt by the next reader instead of being served stale.
+"""
+
+import threading
+from typing import Dict, Generic, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+class SnapshotStorage(Generic[T]):
+    """ID -> entity map with lock-free reads and copy-on-change snapshots"""
+
+    def __init__(self):
+        self._items: Dict[str, T] = {}
+        self._generation = 0
+        self._snapshot: Optional[Tuple[int, Tuple[T, ...]]] = None  # (generation, values)
+        self.write_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._items
+
+    def get(self, key: str) -> Optional[T]:
+        return self._items.get(key)
+
+    def snapshot(self) -> Tuple[T, ...]:
+        """All values at one point in time; never changes after it is returned"""
+        generation = self._generation
+        cached = self._snapshot
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        values = tuple(self._items.copy().values())
+        self._snapshot = (generation, values)
+        return values
+
+    # Writers must hold write_lock
+
+    def put(self, key: str, value: T):
+        if self._items.get(key) is not value:
+            self._items[key] = value
+            self._generation += 1
+
+    def pop(self, key: str) -> bool:
+        if self._items.pop(key, None) is None:
+            return False
+        self._generation += 1
+        return True
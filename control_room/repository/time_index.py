@@ -0,0 +1,89 @@
+"""Time-ordered index of incident IDs for range queries
+
+The incident repository stores incidents in a dict keyed by ID, so
+"incidents created between T1 and T2" or "resolved in the last hour"
+would otherwise walk every incident. This index keeps ``(timestamp, id)``
+keys in a sorted list, maintained by the repository on every write, and
+answers range queries with two binary searches (``bisect``) plus a slice.
+
+Incidents are created in time order, so inserts into the created index
+land at the end of the list and cost no shifting. Timestamps are epoch
+seconds (see ``cold_incident_store.epoch``).
+"""
+
+import bisect
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+class TimeIndex:
+    """Sorted (timestamp, ID) keys with bisect range lookups"""
+
+    def __init__(self):
+        self.lock = threading.Lock()  # writers: repository; readers: Flask threads
+        self._keys: List[Tuple[float, str]] = []
+        self._times: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, entity_id: str) -> bool:
+        return entity_id in self._times
+
+    def get(self, entity_id: str) -> Optional[float]:
+        """Indexed timestamp of an ID, or None"""
+        return self._times.get(entity_id)
+
+    def add(self, entity_id: str, timestamp: float):
+        """Index an ID at a timestamp, moving it if it was indexed already"""
+        with self.lock:
+            previous = self._times.get(entity_id)
+            if previous == timestamp:
+                return
+            if previous is not None:
+                self._discard((previous, entity_id))
+            key = (timestamp, entity_id)
+            if not self._keys or self._keys[-1] <= key:
+                self._keys.append(key)
+            else:
+                bisect.insort(self._keys, key)
+            self._times[entity_id] = timestamp
+
+    def remove(self, entity_id: str) -> bool:
+        """Drop an ID; False if it was not indexed"""
+        with self.lock:
+            previous = self._times.pop(entity_id, None)
+            if previous is None:
+                return False
+            self._discard((previous, entity_id))
+            return True
+
+    def between(self, start: float = float("-inf"), end: float = float("inf")) -> List[str]:
+        """
+        IDs with a timestamp in [start, end)
+
+        Args:
+            start: Earliest timestamp (inclusive)
+            end: Latest timestamp (exclusive)
+
+        Returns:
+            IDs in timestamp order
+        """
+        with self.lock:
+            low, high = self._bounds(start, end)
+            return [entity_id for _, entity_id in self._keys[low:high]]
+
+    def count(self, start: float = float("-inf"), end: float = float("inf")) -> int:
+        """Number of IDs with a timestamp in [start, end), without listing them"""
+        with self.lock:
+            low, high = self._bounds(start, end)
+            return max(0, high - low)
+
+    def _bounds(self, start: float, end: float) -> Tuple[int, int]:
+        # "" sorts before every ID, so (t, "") is the first key at time t
+        return bisect.bisect_left(self._keys, (start, "")), bisect.bisect_left(self._keys, (end, ""))
+
+    def _discard(self, key: Tuple[float, str]):
+        position = bisect.bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            del self._keys[position]
@@ -0,0 +1,258 @@
+"""Joint assignment of units to open incidents
+
+Dispatching every incident to its own nearest units is greedy: the first
+incident can take the only unit that a second incident could use, while
+another unit that is almost as close sits idle. This service solves the
+assignment for all pending incidents at once, minimizing the total ETA.
+
+Each incident that needs ``k`` units becomes ``k`` rows of a cost matrix
+whose columns are available units, and the rectangular assignment
+problem is solved with the Hungarian method. Two kinds of pruning keep
+the matrix small:
+
+- column reduction: only units that are among the few nearest to some
+  row become columns, so a few hundred incidents against thousands of
+  units solve on a matrix of a few hundred columns,
+- an optional ``max_eta``: pairs above it are forbidden, and rows that can
+  only be served by forbidden pairs stay unassigned.
+
+Only idle units are assigned. A unit only counts as busy once its
+acknowledgment is recorded, so ``claim()`` also reserves the units it
+hands to a dispatch until that dispatch settles; a concurrent dispatch
+cannot pick them meanwhile.
+
+SciPy's ``linear_sum_assignment`` is used when SciPy is installed;
+otherwise a NumPy implementation of the same algorithm is used.
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from control_room.model.incident import Incident
+from control_room.model.unit import UnitStatus
+from control_room.repository.position_index import FREE, STATUS_CODES, UnitPositionIndex
+from control_room.service.candidate_service import SpeedModel
+
+try:
+    from scipy.optimize import linear_sum_assignment as _scipy_assignment
+except ImportError:  # optional: the NumPy solver below is used instead
+    _scipy_assignment = None
+
+# Cost of a forbidden pair; finite so the solver's arithmetic stays exact
+FORBIDDEN = 1e9
+DEFAULT_CANDIDATES_PER_ROW = 8
+
+
+def solve_assignment(cost: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Minimum-cost assignment on a rectangular cost matrix
+
+    Args:
+        cost: (rows, cols) matrix
+
+    Returns:
+        (row indices, column indices) of the assigned pairs
+    """
+    if cost.size == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    if _scipy_assignment is not None:
+        return _scipy_assignment(cost)
+    if cost.shape[0] > cost.shape[1]:
+        cols, rows = _hungarian(cost.T)
+        order = np.argsort(rows)
+        return rows[order], cols[order]
+    return _hungarian(cost)
+
+
+def _hungarian(cost: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Shortest augmenting path Hungarian method for rows <= cols, O(rows^2 * cols)"""
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    owner = np.zeros(m + 1, dtype=np.intp)  # owner[j]: row (1-based) holding column j, 0 if free
+    way = np.zeros(m + 1, dtype=np.intp)
+    padded = np.zeros((n + 1, m + 1))
+    padded[1:, 1:] = cost
+
+    for row in range(1, n + 1):
+        owner[0] = row
+        col = 0
+        min_reduced = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[col] = True
+            current_row = owner[col]
+            free = ~used
+            free[0] = False
+            reduced = padded[current_row] - u[current_row] - v
+            better = free & (reduced < min_reduced)
+            min_reduced[better] = reduced[better]
+            way[better] = col
+            candidates = np.where(free, min_reduced, np.inf)
+            next_col = int(np.argmin(candidates))
+            delta = candidates[next_col]
+            u[owner[used]] += delta
+            v[used] -= delta
+            min_reduced[free] -= delta
+            col = next_col
+            if owner[col] == 0:
+                break
+        # Flip the augmenting path
+        while col:
+            previous = way[col]
+            owner[col] = owner[previous]
+            col = previous
+
+    cols = np.flatnonzero(owner[1:])
+    rows = owner[1:][cols] - 1
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+class AssignmentService:
+    """Assigns available units to incidents, minimizing total ETA"""
+
+    def __init__(
+        self,
+        index: UnitPositionIndex,
+        speed_model: Optional[SpeedModel] = None,
+        max_eta: Optional[float] = None,
+        candidates_per_row: int = DEFAULT_CANDIDATES_PER_ROW
+    ):
+        """
+        Args:
+            index: Position index of the unit repository
+            speed_model: Converts distance to ETA (shared with candidate ranking)
+            max_eta: Never assign a unit further away than this many seconds
+            candidates_per_row: Nearest units kept per required unit before solving
+        """
+        self.index = index
+        self.speed_model = speed_model or SpeedModel()
+        self.max_eta = max_eta
+        self.candidates_per_row = candidates_per_row
+        self._claim_lock = threading.RLock()  # claim() plans while holding it
+        self._reserved: Dict[str, float] = {}  # ert_id -> reserved until (monotonic)
+
+    def claim(self, incidents: List[Incident], incident_id: str, hold: float) -> List[dict]:
+        """
+        Plan the assignment and reserve the units it gives one incident
+
+        The incident claimed comes first: if the joint plan leaves it
+        without units while idle units exist, it is planned alone.
+
+        Args:
+            incidents: Incidents planned together (the one claimed included)
+            incident_id: Incident whose units are reserved
+            hold: Seconds the reservation lasts unless released earlier
+
+        Returns:
+            The incident's units, as in plan()
+        """
+        with self._claim_lock:
+            units = self.plan(incidents).get(incident_id, [])
+            if not units:
+                claimed = [incident for incident in incidents if incident.id == incident_id]
+                units = self.plan(claimed).get(incident_id, [])
+            until = time.monotonic() + hold
+            for unit in units:
+                self._reserved[unit["ert_id"]] = until
+            return units
+
+    def release(self, ert_ids: Iterable[str]):
+        """End the reservation of units that did not take their dispatch"""
+        with self._claim_lock:
+            for ert_id in ert_ids:
+                self._reserved.pop(ert_id, None)
+
+    def _reserved_ids(self) -> List[str]:
+        now = time.monotonic()
+        with self._claim_lock:
+            for ert_id in [ert_id for ert_id, until in self._reserved.items() if until <= now]:
+                del self._reserved[ert_id]
+            return list(self._reserved)
+
+    def plan(self, incidents: List[Incident]) -> Dict[str, List[dict]]:
+        """
+        Compute the assignment for a set of incidents
+
+        Units that are busy, or reserved by a dispatch in progress, are
+        left out.
+
+        Args:
+            incidents: Incidents to staff; each needs ``required_units`` units
+
+        Returns:
+            incident_id -> [{"ert_id", "eta_seconds"}] ordered by ETA;
+            incidents that could not be staffed map to an empty list
+        """
+        plan: Dict[str, List[dict]] = {incident.id: [] for incident in incidents}
+        rows = [incident for incident in incidents for _ in range(max(1, incident.required_units))]
+        if not rows:
+            return plan
+
+        reserved = self._reserved_ids()  # before index.lock: claim() takes the locks in this order
+        index = self.index
+        with index.lock:
+            n = index.size
+            status = index.status[:n]
+            available = (
+                (status != FREE)
+                & (status != STATUS_CODES[UnitStatus.UNAVAILABLE])
+                & ~index.busy[:n]
+                & ~np.isnan(index.x[:n])
+            )
+            for ert_id in reserved:
+                slot = index.slot_of(ert_id)
+                if slot is not None and slot < n:
+                    available[slot] = False
+            slots = np.flatnonzero(available)
+            if slots.size == 0:
+                return plan
+            unit_x = index.x[slots]
+            unit_y = index.y[slots]
+            unit_ids = [index.ids[slot] for slot in slots]
+
+        row_x = np.array([incident.x for incident in rows], dtype=np.float64)
+        row_y = np.array([incident.y for incident in rows], dtype=np.float64)
+
+        columns = self._candidate_columns(row_x, row_y, unit_x, unit_y, len(rows))
+        distance = np.hypot(row_x[:, None] - unit_x[columns][None, :], row_y[:, None] - unit_y[columns][None, :])
+        cost = self.speed_model.eta(distance, np.zeros_like(distance, dtype=bool))
+        if self.max_eta is not None:
+            cost = np.where(cost > self.max_eta, FORBIDDEN, cost)
+
+        assigned_rows, assigned_cols = solve_assignment(cost)
+        for row, col in zip(assigned_rows, assigned_cols):
+            eta = cost[row, col]
+            if eta >= FORBIDDEN:
+                continue
+            plan[rows[row].id].append({
+                "ert_id": unit_ids[columns[col]],
+                "eta_seconds": round(float(eta), 1)
+            })
+        for units in plan.values():
+            units.sort(key=lambda entry: entry["eta_seconds"])
+        return plan
+
+    def _candidate_columns(self, row_x: np.ndarray, row_y: np.ndarray, unit_x: np.ndarray,
+                           unit_y: np.ndarray, row_count: int) -> np.ndarray:
+        """Units that are among the k nearest of at least one row, with k large enough for a full assignment"""
+        unit_count = unit_x.size
+        k = self.candidates_per_row
+        while True:
+            if k >= unit_count:
+                return np.arange(unit_count)
+            # Squared distances are enough for ranking; one row block at a time bounds memory
+            chosen = []
+            for start in range(0, row_count, 256):
+                dx = row_x[start:start + 256, None] - unit_x[None, :]
+                dy = row_y[start:start + 256, None] - unit_y[None, :]
+                nearest = np.argpartition(dx * dx + dy * dy, k - 1, axis=1)[:, :k]
+                chosen.append(nearest.ravel())
+            columns = np.unique(np.concatenate(chosen))
+            if columns.size >= min(row_count, unit_count):
+                return columns
+            k *= 2
@@ -0,0 +1,158 @@
+"""Arrival/departure detection around incidents
+
+Every incident gets a circular fence. Location updates are checked only
+against fences registered in the unit's grid cell (plus the fences the
+unit is currently inside), so an update costs the same whether there is
+one open incident or hundreds.
+
+Enter and exit use different radii: a unit arrives when it comes within
+``enter_radius`` and only departs once it is further than
+``exit_radius``. GPS jitter around the boundary therefore cannot make a
+unit flap between arrived and departed.
+"""
+
+import math
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Set, Tuple
+
+from communication.metrics import REGISTRY
+
+DEFAULT_ENTER_RADIUS = 20.0
+DEFAULT_EXIT_RADIUS = 30.0
+DEFAULT_CELL_SIZE = 100.0
+
+GEOFENCE_EVENTS = REGISTRY.counter(
+    "cr_geofence_events_total", "Geofence arrival/departure events", ("type",)
+)
+
+
+class _Fence:
+    __slots__ = ("fence_id", "x", "y", "cells")
+
+    def __init__(self, fence_id: str, x: float, y: float, cells: List[Tuple[int, int]]):
+        self.fence_id = fence_id
+        self.x = x
+        self.y = y
+        self.cells = cells
+
+
+class GeofenceEngine:
+    """Incremental point-in-fence tracking with hysteresis"""
+
+    def __init__(
+        self,
+        enter_radius: float = DEFAULT_ENTER_RADIUS,
+        exit_radius: float = DEFAULT_EXIT_RADIUS,
+        cell_size: float = DEFAULT_CELL_SIZE
+    ):
+        """
+        Args:
+            enter_radius: Distance at which a unit counts as arrived
+            exit_radius: Distance beyond which an arrived unit counts as departed
+            cell_size: Side of a spatial grid cell, in map units
+        """
+        if exit_radius < enter_radius:
+            raise ValueError("exit_radius must not be smaller than enter_radius")
+        self.enter_radius = enter_radius
+        self.exit_radius = exit_radius
+        self.cell_size = cell_size
+        self._fences: Dict[str, _Fence] = {}
+        self._grid: Dict[Tuple[int, int], Set[str]] = defaultdict(set)
+        self._inside: Dict[str, Set[str]] = defaultdict(set)  # unit -> fences it has arrived at
+        self._lock = threading.Lock()  # fences change from Flask threads, updates come from the WebSocket loop
+
+    def __len__(self) -> int:
+        return len(self._fences)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def add_fence(self, fence_id: str, x: float, y: float):
+        """Add (or move) the fence of an incident"""
+        # Register in every cell the exit circle touches
+        r = self.exit_radius
+        (col0, row0), (col1, row1) = self._cell(x - r, y - r), self._cell(x + r, y + r)
+        cells = [(col, row) for col in range(col0, col1 + 1) for row in range(row0, row1 + 1)]
+        with self._lock:
+            self._remove(fence_id)
+            self._fences[fence_id] = _Fence(fence_id, x, y, cells)
+            for cell in cells:
+                self._grid[cell].add(fence_id)
+
+    def remove_fence(self, fence_id: str):
+        with self._lock:
+            self._remove(fence_id)
+
+    def _remove(self, fence_id: str):
+        fence = self._fences.pop(fence_id, None)
+        if fence is None:
+            return
+        for cell in fence.cells:
+            members = self._grid.get(cell)
+            if members is not None:
+                members.discard(fence_id)
+                if not members:
+                    del self._grid[cell]
+        for fences in self._inside.values():
+            fences.discard(fence_id)
+
+    def forget_unit(self, unit_id: str):
+        """Drop a unit's state (e.g. when it disconnects) without emitting events"""
+        with self._lock:
+            self._inside.pop(unit_id, None)
+
+    def is_inside(self, unit_id: str, fence_id: str) -> bool:
+        with self._lock:
+            return fence_id in self._inside.get(unit_id, ())
+
+    def update(self, unit_id: str, x: float, y: float) -> List[dict]:
+        """
+        Process a location update
+
+        Args:
+            unit_id: ID of the unit that moved
+            x: New x coordinate
+            y: New y coordinate
+
+        Returns:
+            Events caused by the move: {"type": "arrival"|"departure", "ert_id",
+            "incident_id", "x", "y", "distance", "at"}
+        """
+        events = []
+        with self._lock:
+            inside = self._inside.get(unit_id)
+            nearby = self._grid.get(self._cell(x, y), ())
+            if not nearby and not inside:
+                return events
+            candidates = set(nearby)
+            if inside:
+                candidates |= inside
+            for fence_id in candidates:
+                fence = self._fences[fence_id]
+                distance = math.hypot(x - fence.x, y - fence.y)
+                was_inside = inside is not None and fence_id in inside
+                if not was_inside and distance <= self.enter_radius:
+                    self._inside[unit_id].add(fence_id)
+                    events.append(self._event("arrival", unit_id, fence_id, x, y, distance))
+                elif was_inside and distance > self.exit_radius:
+                    inside.discard(fence_id)
+                    events.append(self._event("departure", unit_id, fence_id, x, y, distance))
+            if inside is not None and not inside:
+                del self._inside[unit_id]
+        for event in events:
+            GEOFENCE_EVENTS.inc((event["type"],))
+        return events
+
+    @staticmethod
+    def _event(kind: str, unit_id: str, fence_id: str, x: float, y: float, distance: float) -> dict:
+        return {
+            "type": kind,
+            "ert_id": unit_id,
+            "incident_id": fence_id,
+            "x": x,
+            "y": y,
+            "distance": round(distance, 2),
+            "at": datetime.now(timezone.utc).isoformat()
+        }
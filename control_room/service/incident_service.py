@@ -1,28 +1,53 @@
 """Business logic for Control Room incident management"""
 
+import asyncio
+import datetime
 import uuid
-from typing import List
+from typing import Dict, List, Optional
 from control_room.repository.in_memory_incident_repository import InMemoryIncidentRepository
 from control_room.model.incident import Incident, IncidentStatus
+from control_room.repository.cold_incident_store import epoch
+from control_room.service.assignment_service import AssignmentService
+from control_room.service.geofence_service import GeofenceEngine
 from communication.websocket_communication import WebSocketCommunication
 
+MAX_STATS_BUCKETS = 10000
+ACK_RECORD_GRACE = 5.0  # seconds for a responder's acknowledgment to be recorded after its reply
+
+
+class NoUnitAvailableError(Exception):
+    """Raised when no idle unit can be given an incident"""
+
+
+class IncidentNotWaitingError(Exception):
+    """Raised when an incident to dispatch was already dispatched"""
+
 
 class IncidentService:
     def __init__(
         self,
         incident_repository: InMemoryIncidentRepository,
-        communication_channel: WebSocketCommunication
+        communication_channel: WebSocketCommunication,
+        ack_timeout: float = 10.0,
+        assignment_service: Optional[AssignmentService] = None,
+        geofence_engine: Optional[GeofenceEngine] = None
     ):
         self.incident_repository = incident_repository
         self.communication_channel = communication_channel
+        self.ack_timeout = ack_timeout
+        self.assignment_service = assignment_service
+        self.geofence_engine = geofence_engine
 
-    def create_incident(self, x: float, y: float) -> Incident:
+    def create_incident(self, x: float, y: float, required_units: int = 1) -> Incident:
         incident = Incident(
             x=x,
             y=y,
-            status=IncidentStatus.CREATED
+            status=IncidentStatus.CREATED,
+            required_units=required_units
         )
         created_incident = self.incident_repository.create(incident)
+        if self.geofence_engine is not None:
+            self.geofence_engine.add_fence(created_incident.id, x, y)
         return created_incident
 
     def get_incident_by_id(self, incident_id: str):
@@ -35,12 +60,105 @@ class IncidentService:
         incident.x = x
         incident.y = y
         updated_incident = self.incident_repository.update(incident)
+        if self.geofence_engine is not None:
+            self.geofence_engine.add_fence(incident_id, x, y)
         return updated_incident
 
     def get_all_incidents(self) -> List[Incident]:
         return self.incident_repository.get_all()
 
+    def find_incidents(
+        self,
+        created_after: Optional[datetime.datetime] = None,
+        created_before: Optional[datetime.datetime] = None,
+        resolved_after: Optional[datetime.datetime] = None,
+        resolved_before: Optional[datetime.datetime] = None
+    ) -> List[Incident]:
+        """
+        Incidents by creation and/or resolution time, archived ones included
+
+        The repository's time indexes answer the resolution range when one
+        is given (it is usually the narrower one), the creation range
+        otherwise; the other range is then checked per incident.
+
+        Args:
+            created_after: Earliest created_at (inclusive)
+            created_before: Latest created_at (exclusive)
+            resolved_after: Earliest resolved_at (inclusive)
+            resolved_before: Latest resolved_at (exclusive)
+
+        Returns:
+            Matching incidents, ordered by the time the lookup used
+        """
+        if resolved_after is not None or resolved_before is not None:
+            incidents = self.incident_repository.get_by_resolved_range(resolved_after, resolved_before)
+            if created_after is not None or created_before is not None:
+                incidents = [
+                    incident for incident in incidents
+                    if (created_after is None or incident.created_at >= created_after)
+                    and (created_before is None or incident.created_at < created_before)
+                ]
+            return incidents
+        return self.incident_repository.get_by_time_range(created_after, created_before)
+
+    @staticmethod
+    def incident_stats(incidents: List[Incident], by: str = "created",
+                       bucket_seconds: Optional[float] = None) -> dict:
+        """
+        Counts and time-to-resolve aggregates, overall and per time window
+
+        Args:
+            incidents: Incidents to aggregate (e.g. from find_incidents)
+            by: "created" or "resolved": the timestamp windows are cut on
+            bucket_seconds: Window length, aligned to the epoch (e.g. 3600 for
+                hours); no per-window breakdown if None
+
+        Returns:
+            {"count", "resolved", "open", "mean_time_to_resolve_seconds",
+             "max_time_to_resolve_seconds", "buckets"}; buckets run from the
+            first to the last non-empty window, empty ones included
+
+        Raises:
+            ValueError: If that would be more than MAX_STATS_BUCKETS windows
+        """
+        def aggregate(group: List[Incident]) -> dict:
+            durations = [
+                (incident.resolved_at - incident.created_at).total_seconds()
+                for incident in group
+                if incident.resolved_at is not None and incident.created_at is not None
+            ]
+            return {
+                "count": len(group),
+                "resolved": len(durations),
+                "open": sum(1 for incident in group if incident.status != IncidentStatus.RESOLVED),
+                "mean_time_to_resolve_seconds": round(sum(durations) / len(durations), 3) if durations else None,
+                "max_time_to_resolve_seconds": round(max(durations), 3) if durations else None,
+            }
+
+        stats = aggregate(incidents)
+        stats["by"] = by
+        if bucket_seconds:
+            windows: Dict[int, List[Incident]] = {}
+            for incident in incidents:
+                moment = getattr(incident, f"{by}_at")
+                if moment is not None:
+                    windows.setdefault(int(epoch(moment) // bucket_seconds), []).append(incident)
+            if windows and max(windows) - min(windows) >= MAX_STATS_BUCKETS:
+                raise ValueError(f"More than {MAX_STATS_BUCKETS} windows; use a longer bucket or a shorter range")
+            stats["buckets"] = [
+                dict(
+                    start=datetime.datetime.fromtimestamp(
+                        window * bucket_seconds, datetime.timezone.utc
+                    ).replace(tzinfo=None).isoformat(),
+                    **aggregate(windows.get(window, []))
+                )
+                for window in (range(min(windows), max(windows) + 1) if windows else ())
+            ]
+        return stats
+
     def delete_incident(self, incident_id: str) -> bool:
+        if self.geofence_engine is not None:
+            self.geofence_engine.remove_fence(incident_id)
         return self.incident_repository.delete(incident_id)
 
     def get_open_incidents(self) -> List[Incident]:
@@ -51,16 +169,115 @@ class IncidentService:
         ]
         return open_incidents
 
-    async def dispatch_incident(self, incident_id: str):
+    def get_waiting_incidents(self) -> List[Incident]:
+        """Incidents created but not dispatched yet, oldest first"""
+        return [
+            incident for incident in self.incident_repository.get_all()
+            if incident.status == IncidentStatus.CREATED
+        ]
+
+    def plan_assignments(self, incidents: Optional[List[Incident]] = None) -> Dict[str, List[dict]]:
+        """
+        Jointly assign available units to incidents, minimizing total ETA
+
+        Args:
+            incidents: Incidents to staff (default: all not yet dispatched)
+
+        Returns:
+            incident_id -> [{"ert_id", "eta_seconds"}]; empty without an assignment service
+        """
+        if incidents is None:
+            incidents = self.get_waiting_incidents()
+        if self.assignment_service is None:
+            return {incident.id: [] for incident in incidents}
+        return self.assignment_service.plan(incidents)
+
+    async def dispatch_incident(self, incident_id: str, timeout: Optional[float] = None) -> List[dict]:
+        """
+        Dispatch an incident and wait for the ERT units to acknowledge it
+
+        The incident is first claimed (CREATED -> DISPATCHING under the
+        repository lock), so only one of several concurrent dispatches of
+        it goes ahead; it goes back to CREATED if no unit can be given it
+        or none acknowledges it in time.
+
+        The incident is sent only to the idle units the joint assignment
+        (this incident plus the ones still waiting) gives it; it is never
+        broadcast to the fleet. The units stay reserved while the dispatch
+        is in progress, so a concurrent dispatch cannot pick them too.
+
+        A direct dispatch goes through the hub's replay and retry path, so
+        a unit that is reconnecting still gets it, and it is retained for
+        its unit, so a unit that restarts while on the incident gets it
+        again (cleared when the unit resolves, or when none of the units
+        answers in time).
+
+        Args:
+            incident_id: ID of the incident to dispatch
+            timeout: Seconds to wait for acknowledgments (default: ack_timeout)
+
+        Returns:
+            One entry per acknowledging unit: {"ert_id", "rtt_ms", "acknowledgment"}.
+            Empty if no unit acknowledged before the deadline.
+
+        Raises:
+            ValueError: If the incident does not exist
+            IncidentNotWaitingError: If the incident is not waiting to be dispatched
+            NoUnitAvailableError: If no idle unit can be assigned to it
+        """
         incident = self.incident_repository.get_by_id(incident_id)
         if incident is None:
             raise ValueError(f"Incident with ID {incident_id} does not exist.")
-        incident.status = IncidentStatus.DISPATCHED
-        self.incident_repository.update(incident)
-        await self.communication_channel.publish(
+        repository = self.incident_repository
+        if not repository.compare_and_set_status(incident_id, IncidentStatus.CREATED, IncidentStatus.DISPATCHING):
+            raise IncidentNotWaitingError(f"Incident with ID {incident_id} was already dispatched.")
 
-             topic="incident",
-            message=incident.to_dict()
-        )
+        timeout = self.ack_timeout if timeout is None else timeout
+        try:
+            waiting = [other for other in self.get_waiting_incidents() if other.id != incident.id]
+            assigned = []
+            if self.assignment_service is not None:
+                # Responders stay reserved until their acknowledgment marks them busy
+                assigned = self.assignment_service.claim(
+                    [incident] + waiting, incident.id, hold=timeout + ACK_RECORD_GRACE
+                )
+            if not assigned:
+                raise NoUnitAvailableError(f"No unit available for incident {incident_id}.")
+        except BaseException:
+            repository.compare_and_set_status(incident_id, IncidentStatus.DISPATCHING, IncidentStatus.CREATED)
+            raise
 
-        return True
+        # Set before sending: acknowledgments move it on to ACKNOWLEDGED
+        repository.compare_and_set_status(incident_id, IncidentStatus.DISPATCHING, IncidentStatus.DISPATCHED)
+
+        payload = incident  # encoded from its cached JSON
+        try:
+            replies = await asyncio.gather(*(
+                self.communication_channel.request(
+                    unit["ert_id"], payload, timeout=timeout, topic="incident", retain=True
+                )
+                for unit in assigned
+            ))
+        except BaseException:
+            self.assignment_service.release(unit["ert_id"] for unit in assigned)
+            repository.compare_and_set_status(incident_id, IncidentStatus.DISPATCHED, IncidentStatus.CREATED)
+            raise
+        responses = [response for reply in replies for response in reply]
+        responders = {response["responder"] for response in responses}
+        silent = [unit["ert_id"] for unit in assigned if unit["ert_id"] not in responders]
+        for ert_id in silent:
+            # Must not get it on restart: the incident may go to other units
+            await self.communication_channel.clear_retained("incident", ert_id)
+        self.assignment_service.release(silent)
+        if not responses:
+            # Left alone if a late acknowledgment got in first
+            repository.compare_and_set_status(incident_id, IncidentStatus.DISPATCHED, IncidentStatus.CREATED)
+
+        return [
+            {
+                "ert_id": response["responder"],
+                "rtt_ms": round(response["rtt"] * 1000, 1),
+                "acknowledgment": response["payload"]
+            }
+            for response in responses
+        ]
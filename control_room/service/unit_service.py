@@ -1,12 +1,17 @@
 """Business logic for Control Room incident management"""
 
 import json
+import time
 import uuid
 from control_room.model.incident import Incident, IncidentStatus
 from control_room.repository.in_memory_unit_repository import InMemoryUnitRepository
 from control_room.model.unit import Unit, UnitStatus
 from communication.websocket_communication import WebSocketCommunication
-from typing import List
+from typing import List, Optional
+
+# Positions are extrapolated at most this long after a report; units send a
+# heartbeat at least every 30 s, so anything older is a lost unit, not a moving one
+DEAD_RECKONING_HORIZON = 30.0
 
 class UnitService:
     """Service layer for unit operations"""
@@ -15,13 +20,15 @@ class UnitService:
         self.unit_repository = unit_repository
         self.communication_channel = communication_channel
     
-    def create_unit(self,id, x, y: float) -> Unit:
+    def create_unit(self,id, x, y: float, vx: float = 0.0, vy: float = 0.0) -> Unit:
         """
         Create a new unit in the system
         
         Args:
             x: X coordinate
             y: Y coordinate
+            vx: Reported x velocity
+            vy: Reported y velocity
         
         Returns:
             Created unit object
@@ -30,6 +37,9 @@ class UnitService:
             id=id,
             x=x,
             y=y,
+            vx=vx or 0.0,
+            vy=vy or 0.0,
+            reported_at=time.time() if x is not None else None
         )
         created_unit = self.unit_repository.create(unit)
 
@@ -50,7 +60,8 @@ class UnitService:
         """
         return self.unit_repository.get_by_id(unit_id)
     
-    def update_unit(self, unit_id: str, x: float, y: float):
+    def update_unit(self, unit_id: str, x: float, y: float, vx: Optional[float] = None,
+                    vy: Optional[float] = None):
         """
         Update unit coordinates
 
@@ -58,13 +69,26 @@ class UnitService:
             unit_id: ID of the unit
             x: New x coordinate
             y: New y coordinate
+            vx: Reported x velocity; derived from the previous report if omitted
+            vy: Reported y velocity; derived from the previous report if omitted
         """
         unit = self.unit_repository.get_by_id(unit_id)
         if not unit:
             raise ValueError(f"Unit with ID {unit_id} does not exist.")
         
+        now = time.time()
+        if vx is None or vy is None:
+            # Units that do not report a velocity: estimate it from the last two reports
+            elapsed = now - unit.reported_at if unit.reported_at is not None else 0.0
+            if elapsed > 0 and unit.x is not None and unit.y is not None:
+                vx, vy = (x - unit.x) / elapsed, (y - unit.y) / elapsed
+            else:
+                vx = vy = 0.0
         unit.x = x
         unit.y = y
+        unit.vx = vx
+        unit.vy = vy
+        unit.reported_at = now
         updated_unit = self.unit_repository.update(unit)
         return updated_unit
         
@@ -74,6 +98,30 @@ class UnitService:
         """
         return self.unit_repository.get_all()
     
+    def get_estimated_positions(self, at: Optional[float] = None,
+                                horizon: float = DEAD_RECKONING_HORIZON) -> List[dict]:
+        """
+        Dead-reckoned positions of all units
+
+        Args:
+            at: Time to estimate for (epoch seconds), now if omitted
+            horizon: Stop extrapolating this many seconds after a report
+
+        Returns:
+            [{"id", "x", "y", "age"}], age being seconds since the last report (None if never reported)
+        """
+        now = time.time() if at is None else at
+        ids, xs, ys, ages = self.unit_repository.positions.extrapolate(now, horizon)
+        return [
+            {
+                "id": unit_id,
+                "x": round(float(x), 2),
+                "y": round(float(y), 2),
+                "age": None if age != age else round(float(age), 1)  # NaN: no report yet
+            }
+            for unit_id, x, y, age in zip(ids, xs, ys, ages)
+        ]
+
     def delete_unit(self, unit_id: str) -> bool:
         """
         Delete a unit from the system
@@ -126,5 +174,7 @@ class UnitService:
             raise ValueError(f"Unit with ID {unit_id} does not exist.")
         
         unit.assigned_incident = incident_id
+        # A unit that resolved its previous incident is working again
+        unit.status = UnitStatus.ACTIVE
         updated_unit = self.unit_repository.update(unit)
         return updated_unit
@@ -5,14 +5,16 @@ import logging
 import asyncio
 
 from ert.service.unit_service import UnitService
+from ert.service.path_service import PathService
 
 logger = logging.getLogger(__name__)
 
 ert_bp = Blueprint('ert', __name__)
 
-def init_ert_api(unit_service: UnitService):
+def init_ert_api(unit_service: UnitService, path_service: PathService = None):
     """Initialize the ERT API with service dependencies"""
     ert_bp.unit_service = unit_service
+    ert_bp.path_service = path_service
     return ert_bp
 
 @ert_bp.route('/unit/location', methods=['GET'])
@@ -67,4 +69,49 @@ def resolve_incident():
         logger.error(f"Error resolving incident: {str(e)}")
         return jsonify({
             'error': 'Internal server error'
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+@ert_bp.route('/route', methods=['GET'])
+def get_route():
+    """Route from the unit's position to the assigned incident (or to ?x=&y=)"""
+    try:
+        if ert_bp.path_service is None:
+            return jsonify({
+                'error': 'Path planning is not available'
+            }), 503
+
+        with open("ert/unit_info.json", "r") as f:
+            unit_info = json.load(f)
+
+        if 'x' in request.args and 'y' in request.args:
+            dest_x = request.args.get('x', type=float)
+            dest_y = request.args.get('y', type=float)
+            if dest_x is None or dest_y is None:
+                return jsonify({
+                    'error': 'x and y must be numbers'
+                }), 400
+        elif unit_info["assigned_incident"] is not None:
+            dest_x = unit_info["assigned_incident"]["x"]
+            dest_y = unit_info["assigned_incident"]["y"]
+        else:
+            return jsonify({
+                'error': 'No incident assigned to this unit'
+            }), 400
+
+        route = ert_bp.path_service.route(unit_info["x"], unit_info["y"], dest_x, dest_y)
+        if route is None:
+            return jsonify({
+                'error': 'Destination cannot be reached'
+            }), 404
+
+        return jsonify({
+            'from': {'x': unit_info["x"], 'y': unit_info["y"]},
+            'to': {'x': dest_x, 'y': dest_y},
+            **route.to_dict()
+        }), 200
+    except Exception as e:
+        logger.error(f"Error planning route: {str(e)}")
+        return jsonify({
+            'error': 'Internal server error'
+        }), 500
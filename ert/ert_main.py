@@ -4,6 +4,7 @@ import threading
 import logging
 from pathlib import Path
 from service.unit_service import UnitService
+from service.path_service import PathService
 from flask import json, Flask
 from flask_cors import CORS
 
@@ -11,13 +12,15 @@ from flask_cors import CORS
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from communication.websocket_communication import WebSocketCommunication
+from communication.qos import CRITICAL_TOPICS, RETAINED_TOPICS
+from communication.metrics import instrument_blueprint, metrics_response
+from communication.logging_setup import setup_logging
+from communication.serialization import install_json_provider
 from ert.api.unit_api import init_ert_api
+from ert.service.location_reporter import AdaptiveReporter
 
 # ---------------- Logging ----------------
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+setup_logging("ert")
 logger = logging.getLogger(__name__)
 
 # ---------------- Load Unit Info ----------------
@@ -26,38 +29,67 @@ with open("ert/unit_info.json", "r") as f:
     ert_id = unit_info["id"]
 
 # ---------------- Communication ----------------
-ert_comms = WebSocketCommunication()
+# Resolutions are sent at-least-once so the Control Room never misses one
+ert_comms = WebSocketCommunication(qos_topics=CRITICAL_TOPICS, retain_topics=RETAINED_TOPICS)
 
+# ---------------- Path Planning ----------------
+path_service = PathService.from_file("ert/map.json")
 
-# ---------------- Callbacks ----------------
-async def on_new_incident(data):
-    """Handle incoming incident from control room"""
-
-    print(f"\n[ERT-{ert_id}] 🚨 RECEIVED INCIDENT: {data}")
-    print(f"[ERT-{ert_id}] Preparing vehicle...")
+# ---------------- Location Reporting ----------------
+# GPS is sampled every second; only samples that the Control Room cannot
+# extrapolate from the previous report are published
+GPS_SAMPLE_SECONDS = 1.0
+location_reporter = AdaptiveReporter()
 
-    incident_id = data.get("id")
 
+# ---------------- Callbacks ----------------
+async def on_new_incident(data):
+    """Handle incoming incident from control room (validated by the hub's 'incident' schema)"""
+
+    incident_id = data["id"]
+    current = unit_info.get("assigned_incident")
+    if current and current.get("id") != incident_id:
+        # No reply: the Control Room counts this unit as not having taken it
+        logger.warning("Refusing incident while assigned to another one",
+                       extra={"ert_id": ert_id, "incident_id": incident_id})
+        return None
+    logger.info("🚨 RECEIVED INCIDENT, preparing vehicle...", extra={"ert_id": ert_id, "incident_id": incident_id})
+
+    # Position as last written by the GPS loop
+    with open("ert/unit_info.json", "r") as f:
+        position = json.load(f)
+    unit_info["x"], unit_info["y"] = position["x"], position["y"]
     unit_info["assigned_incident"] = data
     unit_info["status"] = "dispatched"
 
     with open("ert/unit_info.json", "w") as f:
         json.dump(unit_info, f, indent=4)
 
-    print(f"[ERT-{ert_id}] Updated unit info with assigned incident: {incident_id}")
+    # One A* search for the ETA; the distance field for re-routing is built in the background
+    route = await asyncio.to_thread(
+        path_service.plan, unit_info["x"], unit_info["y"], data["x"], data["y"]
+    )
+    asyncio.get_running_loop().run_in_executor(None, path_service.prepare, data["x"], data["y"])
+
+    logger.info("Updated unit info with assigned incident", extra={"ert_id": ert_id, "incident_id": incident_id})
 
     acknowledgment = {
         "ert_id": ert_id,
         "incident_id": incident_id,
-        "x": data.get("x", 100),
-        "y": data.get("y", 200),
+        "x": data["x"],
+        "y": data["y"],
         "message": "Incident received successfully. ERT unit dispatched.",
-        "status": "acknowledged"
+        "status": "acknowledged",
+        "eta_seconds": round(route.eta_seconds, 1) if route else None,
+        "distance": round(route.distance, 2) if route else None
     }
 
     await ert_comms.publish("acknowledgment", acknowledgment)
 
-    print(f"[ERT-{ert_id}] ✅ Acknowledgment sent")
+    logger.info("✅ Acknowledgment sent", extra={"ert_id": ert_id, "incident_id": incident_id})
+
+    # Returned as the reply when the Control Room dispatched via request()
+    return acknowledgment
 
 
 # ---------------- Main Async Logic ----------------
@@ -70,17 +102,18 @@ async def main(unit_service: UnitService):
         client_id=ert_id
     )
 
-    print(f"[ERT-{ert_id}] Connected and registered with hub")
+    logger.info("Connected and registered with hub", extra={"ert_id": ert_id})
 
     # Subscribe
     await ert_comms.subscribe("incident", on_new_incident)
 
-    print(f"[ERT-{ert_id}] Subscribed to incident notifications")
+    logger.info("Subscribed to incident notifications", extra={"ert_id": ert_id})
 
     # GPS LOOP
+    loop = asyncio.get_running_loop()
     while True:
         # Update simulated GPS
-        unit_service.update_gps_location()
+        unit_service.update_gps_location(GPS_SAMPLE_SECONDS)
 
         # Read updated coordinates
         with open("ert/unit_info.json", "r") as f:
@@ -88,17 +121,28 @@ async def main(unit_service: UnitService):
             x = unit_info["x"]
             y = unit_info["y"]
 
-        location_data = {
-            "ert_id": ert_id,
-            "x": x,
-            "y": y
-        }
+        report = location_reporter.sample(x, y, loop.time())
+        if report is not None:
+            location_data = {
+                "ert_id": ert_id,
+                "x": x,
+                "y": y,
+                "vx": report["vx"],
+                "vy": report["vy"]
+            }
 
-        print(f"[ERT-{ert_id}] 📍 Sending Location: ({x}, {y})")
+            # Re-route on every report; a cached distance field makes this a lookup
+            incident = unit_info["assigned_incident"]
+            if incident is not None:
+                route = path_service.route(x, y, incident["x"], incident["y"])
+                location_data["eta_seconds"] = round(route.eta_seconds, 1) if route else None
 
-        await ert_comms.publish("location", location_data)
+            logger.info(f"📍 Sending Location: ({x}, {y}) [{report['reason']}]",
+                        extra={"event": "location.sent", "ert_id": ert_id})
 
-        await asyncio.sleep(5)
+            await ert_comms.publish("location", location_data)
+
+        await asyncio.sleep(GPS_SAMPLE_SECONDS)
 
 
 # ---------------- Application Entry ----------------
@@ -111,12 +155,13 @@ if __name__ == "__main__":
 
     # Flask App
     app = Flask(__name__)
-    app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
+    install_json_provider(app)
     CORS(app)
 
     logger.info("📋 Registering ERT Unit API blueprints...")
 
-    ert_bp_instance = init_ert_api(unit_service)
+    ert_bp_instance = init_ert_api(unit_service, path_service)
+    instrument_blueprint(ert_bp_instance)
     app.register_blueprint(ert_bp_instance, url_prefix='/ert')
 
     # Health Check
@@ -128,6 +173,11 @@ if __name__ == "__main__":
             'component': f'ert-{ert_id}'
         }, 200
 
+    # Prometheus scrape endpoint
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return metrics_response()
+
     logger.info("✓ Flask application configured successfully")
 
     # Run Flask in Thread
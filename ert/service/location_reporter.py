@@ -0,0 +1,130 @@
+"""Send-on-delta location reporting
+
+Instead of publishing every GPS sample, the unit publishes its position
+together with a velocity, and the Control Room extrapolates
+(dead-reckons) from the last report. The reporter runs the same
+prediction locally and only sends when reality drifts away from it:
+
+- the actual position is more than ``distance_threshold`` from where the
+  Control Room thinks the unit is,
+- the heading turned by more than ``heading_threshold`` degrees,
+- the unit started or stopped moving,
+- or ``heartbeat`` seconds passed since the last report (so the Control
+  Room can tell a parked unit from a disconnected one).
+
+A parked unit therefore sends one heartbeat per ``heartbeat`` seconds,
+while a moving one reports as often as ``min_interval`` allows when it
+turns. The Control Room's estimate is never further than
+``distance_threshold`` from the true position, up to one sample period.
+"""
+
+import math
+from typing import Optional
+
+from communication.metrics import REGISTRY
+
+DEFAULT_DISTANCE_THRESHOLD = 10.0  # map units
+DEFAULT_HEADING_THRESHOLD = 30.0   # degrees
+DEFAULT_HEARTBEAT = 30.0           # seconds
+DEFAULT_MIN_INTERVAL = 1.0         # seconds
+DEFAULT_MIN_SPEED = 1.0            # map units per second; slower counts as parked
+
+LOCATION_REPORTS = REGISTRY.counter(
+    "ert_location_reports_total", "Location reports sent, by trigger", ("reason",)
+)
+LOCATION_SAMPLES_SUPPRESSED = REGISTRY.counter(
+    "ert_location_samples_suppressed_total", "GPS samples not sent because the prediction still held"
+)
+
+
+class AdaptiveReporter:
+    """Decides which GPS samples are worth publishing"""
+
+    def __init__(
+        self,
+        distance_threshold: float = DEFAULT_DISTANCE_THRESHOLD,
+        heading_threshold: float = DEFAULT_HEADING_THRESHOLD,
+        heartbeat: float = DEFAULT_HEARTBEAT,
+        min_interval: float = DEFAULT_MIN_INTERVAL,
+        min_speed: float = DEFAULT_MIN_SPEED
+    ):
+        """
+        Args:
+            distance_threshold: Allowed error of the Control Room's extrapolated position
+            heading_threshold: Heading change (degrees) that forces a report
+            heartbeat: Maximum seconds between two reports
+            min_interval: Minimum seconds between two reports (heartbeats excepted)
+            min_speed: Speed below which the unit counts as stationary
+        """
+        self.distance_threshold = distance_threshold
+        self.heading_threshold = math.radians(heading_threshold)
+        self.heartbeat = heartbeat
+        self.min_interval = min_interval
+        self.min_speed = min_speed
+
+        # Last GPS sample, for the velocity estimate
+        self._sample: Optional[tuple] = None  # (x, y, t)
+        # Last report, i.e. what the Control Room extrapolates from
+        self._sent: Optional[tuple] = None    # (x, y, vx, vy, t)
+
+        self.sent = 0
+        self.suppressed = 0
+
+    def sample(self, x: float, y: float, now: float) -> Optional[dict]:
+        """
+        Feed a GPS sample
+
+        Args:
+            x: Current x coordinate
+            y: Current y coordinate
+            now: Sample time in seconds (any monotonic clock)
+
+        Returns:
+            The report to publish ({"x", "y", "vx", "vy", "reason"}), or None
+            if the Control Room's extrapolation is still good enough
+        """
+        vx = vy = 0.0
+        if self._sample is not None:
+            px, py, pt = self._sample
+            dt = now - pt
+            if dt > 0:
+                vx, vy = (x - px) / dt, (y - py) / dt
+        self._sample = (x, y, now)
+
+        reason = self._reason(x, y, vx, vy, now)
+        if reason is None:
+            self.suppressed += 1
+            LOCATION_SAMPLES_SUPPRESSED.inc()
+            return None
+
+        if math.hypot(vx, vy) < self.min_speed:
+            vx = vy = 0.0
+        self._sent = (x, y, vx, vy, now)
+        self.sent += 1
+        LOCATION_REPORTS.inc((reason,))
+        return {"x": x, "y": y, "vx": round(vx, 3), "vy": round(vy, 3), "reason": reason}
+
+    def _reason(self, x: float, y: float, vx: float, vy: float, now: float) -> Optional[str]:
+        if self._sent is None:
+            return "initial"
+        sx, sy, svx, svy, st = self._sent
+        elapsed = now - st
+        if elapsed >= self.heartbeat:
+            return "heartbeat"
+        if elapsed < self.min_interval:
+            return None
+
+        # Where the Control Room currently believes the unit is
+        predicted_x, predicted_y = sx + svx * elapsed, sy + svy * elapsed
+        if math.hypot(x - predicted_x, y - predicted_y) > self.distance_threshold:
+            return "distance"
+
+        moving = math.hypot(vx, vy) >= self.min_speed
+        was_moving = svx != 0.0 or svy != 0.0
+        if moving != was_moving:
+            return "started" if moving else "stopped"
+        if moving:
+            turn = abs(math.atan2(vy, vx) - math.atan2(svy, svx))
+            if min(turn, 2 * math.pi - turn) > self.heading_threshold:
+                return "heading"
+        return None
@@ -0,0 +1,305 @@
+"""Local path planning for an ERT unit
+
+The unit's map is a grid of square cells loaded from ``ert/map.json``;
+blocked cells (buildings, water, closed roads) cannot be entered. Routes
+use 8-connected moves without cutting corners.
+
+Two ways of answering "how do I get to X":
+
+- ``plan()`` runs A* with the octile-distance heuristic, which never
+  overestimates the true cost on this grid, so the route is optimal.
+  Used once, e.g. to put an ETA in the acknowledgment.
+- ``route()`` first looks for a distance field for the destination: the
+  cost to the destination from every cell, built once with a reverse
+  Dijkstra. With a field, re-routing after a GPS tick is a walk down the
+  gradient, proportional to the route length, with no search at all.
+  Fields are kept in a small LRU cache per destination cell.
+
+Everything works on flat lists indexed by ``row * width + col`` so it
+stays well within a Raspberry Pi's CPU budget.
+"""
+
+import heapq
+import json
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_MAP_FILE = "ert/map.json"
+DEFAULT_SPEED = 15.0  # map units per second
+DEFAULT_FIELD_CACHE = 8
+
+SQRT2 = math.sqrt(2.0)
+# (d_col, d_row, cost in cells)
+MOVES = (
+    (1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+    (1, 1, SQRT2), (1, -1, SQRT2), (-1, 1, SQRT2), (-1, -1, SQRT2),
+)
+INF = float("inf")
+
+
+class GridMap:
+    """Occupancy grid in map coordinates"""
+
+    def __init__(self, width: int, height: int, cell_size: float, blocked: Optional[bytearray] = None):
+        """
+        Args:
+            width: Number of columns
+            height: Number of rows
+            cell_size: Side of a cell in map units
+            blocked: One byte per cell, non-zero when the cell cannot be entered
+        """
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.blocked = blocked if blocked is not None else bytearray(width * height)
+        self.neighbors = self._build_neighbors()
+
+    @classmethod
+    def from_file(cls, path: str) -> "GridMap":
+        """
+        Load a map file
+
+        The file holds ``width``, ``height``, ``cell_size`` and a list of
+        ``blocked`` rectangles ``[col0, row0, col1, row1]`` (inclusive cells).
+        """
+        with open(path, "r") as f:
+            data = json.load(f)
+        grid = bytearray(data["width"] * data["height"])
+        for col0, row0, col1, row1 in data.get("blocked", []):
+            for row in range(max(row0, 0), min(row1, data["height"] - 1) + 1):
+                start = row * data["width"]
+                for col in range(max(col0, 0), min(col1, data["width"] - 1) + 1):
+                    grid[start + col] = 1
+        return cls(data["width"], data["height"], float(data["cell_size"]), grid)
+
+    def _build_neighbors(self) -> List[Tuple[Tuple[int, float], ...]]:
+        """Precompute the (cell, cost) moves out of every free cell"""
+        width, height, blocked = self.width, self.height, self.blocked
+        neighbors = []
+        for cell in range(width * height):
+            if blocked[cell]:
+                neighbors.append(())
+                continue
+            row, col = divmod(cell, width)
+            moves = []
+            for dc, dr, cost in MOVES:
+                c, r = col + dc, row + dr
+                if not (0 <= c < width and 0 <= r < height) or blocked[r * width + c]:
+                    continue
+                # No corner cutting: both side cells of a diagonal must be free
+                if dc and dr and (blocked[row * width + c] or blocked[r * width + col]):
+                    continue
+                moves.append((r * width + c, cost))
+            neighbors.append(tuple(moves))
+        return neighbors
+
+    def cell_of(self, x: float, y: float) -> int:
+        col = min(max(int(x // self.cell_size), 0), self.width - 1)
+        row = min(max(int(y // self.cell_size), 0), self.height - 1)
+        return row * self.width + col
+
+    def center_of(self, cell: int) -> Tuple[float, float]:
+        row, col = divmod(cell, self.width)
+        return ((col + 0.5) * self.cell_size, (row + 0.5) * self.cell_size)
+
+    def nearest_free(self, cell: int) -> Optional[int]:
+        """The closest free cell (breadth-first), for positions inside obstacles"""
+        if not self.blocked[cell]:
+            return cell
+        width, height = self.width, self.height
+        seen = {cell}
+        frontier = [cell]
+        while frontier:
+            next_frontier = []
+            for current in frontier:
+                row, col = divmod(current, width)
+                for dc, dr, _ in MOVES:
+                    c, r = col + dc, row + dr
+                    if not (0 <= c < width and 0 <= r < height):
+                        continue
+                    candidate = r * width + c
+                    if candidate in seen:
+                        continue
+                    if not self.blocked[candidate]:
+                        return candidate
+                    seen.add(candidate)
+                    next_frontier.append(candidate)
+            frontier = next_frontier
+        return None
+
+
+class Route:
+    """A planned route from a position to a destination"""
+
+    def __init__(self, cells: List[int], cost: float, grid: GridMap, speed: float, source: str):
+        self.cells = cells
+        self.distance = cost * grid.cell_size
+        self.eta_seconds = self.distance / speed if speed > 0 else INF
+        self.source = source  # "astar" or "field"
+        self._grid = grid
+
+    def waypoints(self) -> List[Tuple[float, float]]:
+        """Cell centers where the route changes direction"""
+        cells = self.cells
+        if len(cells) <= 2:
+            return [self._grid.center_of(c) for c in cells]
+        points = [cells[0]]
+        for prev, current, nxt in zip(cells, cells[1:], cells[2:]):
+            if current - prev != nxt - current:
+                points.append(current)
+        points.append(cells[-1])
+        return [self._grid.center_of(c) for c in points]
+
+    def to_dict(self) -> dict:
+        return {
+            "distance": round(self.distance, 2),
+            "eta_seconds": round(self.eta_seconds, 1),
+            "waypoints": [[round(x, 2), round(y, 2)] for x, y in self.waypoints()],
+            "source": self.source,
+        }
+
+
+class PathService:
+    """Plans and re-plans routes on the unit's local map"""
+
+    def __init__(self, grid: GridMap, speed: float = DEFAULT_SPEED, field_cache_size: int = DEFAULT_FIELD_CACHE):
+        self.grid = grid
+        self.speed = speed
+        self.field_cache_size = field_cache_size
+        self._fields: "OrderedDict[int, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()  # Flask threads and the asyncio loop share the cache
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_MAP_FILE, **kwargs) -> "PathService":
+        with open(path, "r") as f:
+            speed = json.load(f).get("speed", DEFAULT_SPEED)
+        kwargs.setdefault("speed", speed)
+        return cls(GridMap.from_file(path), **kwargs)
+
+    # ---------------- Distance fields ----------------
+
+    def distance_field(self, goal: int) -> List[float]:
+        """
+        Get the cost (in cells) from every cell to the goal, building it if needed
+
+        Moves are symmetric, so a Dijkstra outwards from the goal gives
+        the cost to reach it from everywhere.
+        """
+        with self._lock:
+            field = self._fields.get(goal)
+            if field is not None:
+                self._fields.move_to_end(goal)
+                return field
+
+        field = [INF] * (self.grid.width * self.grid.height)
+        neighbors = self.grid.neighbors
+        field[goal] = 0.0
+        heap = [(0.0, goal)]
+        while heap:
+            cost, cell = heapq.heappop(heap)
+            if cost > field[cell]:
+                continue
+            for nxt, step in neighbors[cell]:
+                new_cost = cost + step
+                if new_cost < field[nxt]:
+                    field[nxt] = new_cost
+                    heapq.heappush(heap, (new_cost, nxt))
+
+        with self._lock:
+            self._fields[goal] = field
+            while len(self._fields) > self.field_cache_size:
+                self._fields.popitem(last=False)
+        return field
+
+    def has_field(self, x: float, y: float) -> bool:
+        goal = self.grid.nearest_free(self.grid.cell_of(x, y))
+        with self._lock:
+            return goal in self._fields
+
+    def prepare(self, x: float, y: float):
+        """Build the distance field for a destination ahead of re-routing"""
+        goal = self.grid.nearest_free(self.grid.cell_of(x, y))
+        if goal is not None:
+            self.distance_field(goal)
+
+    # ---------------- Routing ----------------
+
+    def route(self, x: float, y: float, dest_x: float, dest_y: float) -> Optional[Route]:
+        """
+        Route from a position to a destination
+
+        Uses the cached distance field of the destination when there is
+        one; otherwise falls back to A*.
+
+        Returns:
+            Route, or None if the destination cannot be reached
+        """
+        start, goal = self._endpoints(x, y, dest_x, dest_y)
+        if start is None or goal is None:
+            return None
+        with self._lock:
+            field = self._fields.get(goal)
+            if field is not None:
+                self._fields.move_to_end(goal)
+        if field is None:
+            return self._astar(start, goal)
+        return self._descend(field, start, goal)
+
+    def plan(self, x: float, y: float, dest_x: float, dest_y: float) -> Optional[Route]:
+        """Route with A*, ignoring any cached field"""
+        start, goal = self._endpoints(x, y, dest_x, dest_y)
+        if start is None or goal is None:
+            return None
+        return self._astar(start, goal)
+
+    def _endpoints(self, x, y, dest_x, dest_y) -> Tuple[Optional[int], Optional[int]]:
+        grid = self.grid
+        return grid.nearest_free(grid.cell_of(x, y)), grid.nearest_free(grid.cell_of(dest_x, dest_y))
+
+    def _descend(self, field: List[float], start: int, goal: int) -> Optional[Route]:
+        if field[start] == INF:
+            return None
+        neighbors = self.grid.neighbors
+        cells = [start]
+        cell = start
+        while cell != goal:
+            # The neighbor on a shortest path satisfies field[n] + step == field[cell]
+            cell = min(neighbors[cell], key=lambda move: field[move[0]] + move[1])[0]
+            cells.append(cell)
+        return Route(cells, field[start], self.grid, self.speed, "field")
+
+    def _astar(self, start: int, goal: int) -> Optional[Route]:
+        grid = self.grid
+        neighbors = grid.neighbors
+        width = grid.width
+        goal_row, goal_col = divmod(goal, width)
+        diagonal_extra = SQRT2 - 1.0
+
+        def heuristic(cell: int) -> float:
+            row, col = divmod(cell, width)
+            dx, dy = abs(col - goal_col), abs(row - goal_row)
+            return (dx + dy) + diagonal_extra * min(dx, dy) - min(dx, dy)
+
+        best: Dict[int, float] = {start: 0.0}
+        came_from: Dict[int, int] = {}
+        heap = [(heuristic(start), 0.0, start)]
+        while heap:
+            _, cost, cell = heapq.heappop(heap)
+            if cell == goal:
+                cells = [cell]
+                while cell in came_from:
+                    cell = came_from[cell]
+                    cells.append(cell)
+                cells.reverse()
+                return Route(cells, cost, grid, self.speed, "astar")
+            if cost > best.get(cell, INF):
+                continue
+            for nxt, step in neighbors[cell]:
+                new_cost = cost + step
+                if new_cost < best.get(nxt, INF):
+                    best[nxt] = new_cost
+                    came_from[nxt] = cell
+                    heapq.heappush(heap, (new_cost + heuristic(nxt), new_cost, nxt))
+        return None
@@ -1,7 +1,14 @@
 """Business logic for ERT unit operations"""
 
 import json
-from random import random
+import logging
+import math
+from random import gauss
+
+logger = logging.getLogger(__name__)
+
+DRIVE_SPEED = 15.0  # map units per second, as in ert/map.json
+GPS_NOISE = 0.2     # standard deviation of the simulated GPS error
 
 
 class UnitService:
@@ -10,22 +17,32 @@ class UnitService:
     def __init__(self, communication_channel=None):
         self.communication_channel = communication_channel
     
-    def update_gps_location(self):
+    def update_gps_location(self, dt: float = 1.0):
         """
-        Update unit location and stream to Control Room
-        
+        Advance the simulated GPS position by dt seconds
+
+        A unit with an assigned incident drives straight towards it;
+        otherwise it is parked and only the GPS noise moves it.
+
         Args:
-            unit_id: ID of the ERT unit
-            coordinates: Tuple of (x, y) GPS coordinates
+            dt: Seconds since the previous sample
         """
-        # generate random coordinates for simulation
-        x = random() * 100
-        y = random() * 100
-        print(f"Updated GPS location: ({x:.2f}, {y:.2f})")
         with open("ert/unit_info.json", "r") as f:
             unit_info = json.load(f)
-            unit_info["x"] = x
-            unit_info["y"] = y
+        x, y = unit_info["x"], unit_info["y"]
+        incident = unit_info["assigned_incident"]
+        if incident is not None:
+            dx, dy = incident["x"] - x, incident["y"] - y
+            distance = math.hypot(dx, dy)
+            travel = min(DRIVE_SPEED * dt, distance)
+            if distance > 0:
+                x += dx / distance * travel
+                y += dy / distance * travel
+        x += gauss(0.0, GPS_NOISE)
+        y += gauss(0.0, GPS_NOISE)
+        logger.debug(f"Updated GPS location: ({x:.2f}, {y:.2f})", extra={"event": "gps.updated"})
+        unit_info["x"] = x
+        unit_info["y"] = y
         with open("ert/unit_info.json", "w") as f:
             json.dump(unit_info, f, indent=4)
     
@@ -55,5 +72,6 @@ class UnitService:
             resolution_data = {
                 "ert_id": unit_info["id"],
             }
-            print(f"[ERT-{unit_info['id']}] 🎉 Incident resolved, notifying Control Room...")
+            logger.info("🎉 Incident resolved, notifying Control Room...",
+                        extra={"ert_id": unit_info["id"], "incident_id": incident_id})
             await self.communication_channel.publish("resolution", resolution_data)
\ No newline at end of file
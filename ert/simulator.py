@@ -0,0 +1,320 @@
+"""Multi-unit ERT simulator
+
+Runs many virtual ERT units in one asyncio loop. Every unit has its own
+state and its own WebSocketCommunication connection, so the hub and the
+Control Room see exactly what they would see from real vehicles:
+
+- units patrol with smooth, heading-based movement inside the map,
+- an idle unit that receives an incident acknowledges it (also as the RPC
+  reply to the Control Room's dispatch), drives to it, spends some time on
+  scene and then sends a resolution,
+- every unit reports its position at a fixed interval, or with
+  ``--adaptive`` samples at that interval and only reports what the
+  Control Room cannot dead-reckon (see ert/service/location_reporter.py).
+
+All randomness comes from a per-unit generator derived from one seed, so
+a run can be reproduced exactly.
+
+Usage:
+    python ert/simulator.py --units 2000 --seed 7
+    python ert/simulator.py --units 500 --report-interval 1 --duration 120
+    python ert/simulator.py --units 2000 --report-interval 1 --adaptive
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+# Add parent directory to Python path to resolve imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from communication.websocket_communication import WebSocketCommunication
+from communication.qos import CRITICAL_TOPICS, RETAINED_TOPICS
+from communication.logging_setup import setup_logging
+from ert.service.location_reporter import AdaptiveReporter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HUB_URL = "ws://localhost:8765"
+MAP_SIZE = 1000.0
+CONNECT_BATCH = 100
+
+
+class VirtualUnit:
+    """One simulated ERT vehicle with its own connection to the hub"""
+
+    def __init__(
+        self,
+        ert_id: str,
+        rng: random.Random,
+        hub_url: str = DEFAULT_HUB_URL,
+        map_size: float = MAP_SIZE,
+        patrol_speed: float = 8.0,
+        response_speed: float = 20.0,
+        on_scene: tuple = (5.0, 20.0),
+        resolve_after: Optional[float] = None,
+        adaptive: bool = False
+    ):
+        """
+        Args:
+            ert_id: Unit ID used to register with the hub
+            rng: Random generator owned by this unit
+            hub_url: Hub WebSocket URL
+            map_size: Side length of the square map, in map units
+            patrol_speed: Speed while idle, in map units per second
+            response_speed: Speed while driving to an incident
+            on_scene: (min, max) seconds spent at the incident before resolving
+            resolve_after: Resolve this many seconds after acknowledging,
+                regardless of travel (fixed timing for load tests)
+            adaptive: Report only the samples the Control Room cannot extrapolate
+        """
+        self.ert_id = ert_id
+        self.rng = rng
+        self.hub_url = hub_url
+        self.map_size = map_size
+        self.patrol_speed = patrol_speed
+        self.response_speed = response_speed
+        self.on_scene = on_scene
+        self.resolve_after = resolve_after
+        self.reporter = AdaptiveReporter() if adaptive else None
+
+        self.x = rng.uniform(0, map_size)
+        self.y = rng.uniform(0, map_size)
+        self.heading = rng.uniform(0, 2 * math.pi)
+        self.status = "available"
+        self.assigned_incident: Optional[dict] = None
+        self._on_scene_until: Optional[float] = None
+        self._resolve_timer: Optional[asyncio.TimerHandle] = None
+
+        self.locations_sent = 0
+        self.resolutions_sent = 0
+        self.late_ticks = 0
+
+        self.comms = WebSocketCommunication(
+            qos_topics=CRITICAL_TOPICS, retain_topics=RETAINED_TOPICS, sync_callback_workers=1
+        )
+
+    async def start(self):
+        """Connect, register and subscribe to incidents"""
+        await self.comms.connect(self.hub_url, client_type="ert", client_id=self.ert_id)
+        await self.comms.subscribe("incident", self.on_incident)
+
+    async def stop(self):
+        if self._resolve_timer:
+            self._resolve_timer.cancel()
+        await self.comms.disconnect()
+
+    # ---------------- Incidents ----------------
+
+    async def on_incident(self, data: dict):
+        """Acknowledge the incident if idle; busy units stay silent"""
+        if self.status == "dispatched":
+            return None
+
+        self.assigned_incident = data
+        self.status = "dispatched"
+        self._on_scene_until = None
+        acknowledgment = {
+            "ert_id": self.ert_id,
+            "incident_id": data["id"],
+            "x": self.x,
+            "y": self.y,
+            "message": "Incident received successfully. ERT unit dispatched.",
+            "status": "acknowledged"
+        }
+        await self.comms.publish("acknowledgment", acknowledgment)
+
+        if self.resolve_after is not None:
+            self._resolve_timer = asyncio.get_running_loop().call_later(
+                self.resolve_after, lambda: asyncio.ensure_future(self.resolve())
+            )
+        # Returned as the reply when the Control Room dispatched via request()
+        return acknowledgment
+
+    async def resolve(self):
+        self._resolve_timer = None
+        if self.status != "dispatched":
+            return
+        self.status = "available"
+        self.assigned_incident = None
+        self._on_scene_until = None
+        self.resolutions_sent += 1
+        await self.comms.publish("resolution", {"ert_id": self.ert_id, "status": "resolved"})
+
+    # ---------------- Movement ----------------
+
+    def step(self, dt: float):
+        """Advance the unit's position by dt seconds"""
+        incident = self.assigned_incident
+        if incident is not None and self.resolve_after is None:
+            self._drive_to(incident, dt)
+        else:
+            self._patrol(dt)
+
+    def _patrol(self, dt: float):
+        # Gentle random turns: a smooth path instead of jumps
+        self.heading += self.rng.gauss(0.0, 0.3) * math.sqrt(dt)
+        speed = self.patrol_speed * self.rng.uniform(0.8, 1.2)
+        self._move(speed * dt)
+
+    def _drive_to(self, incident: dict, dt: float):
+        if self._on_scene_until is not None:
+            if time.monotonic() >= self._on_scene_until:
+                asyncio.ensure_future(self.resolve())
+            return
+
+        dx = incident.get("x", self.x) - self.x
+        dy = incident.get("y", self.y) - self.y
+        distance = math.hypot(dx, dy)
+        travel = self.response_speed * dt
+        if distance <= travel:
+            self.x, self.y = incident.get("x", self.x), incident.get("y", self.y)
+            self._on_scene_until = time.monotonic() + self.rng.uniform(*self.on_scene)
+            return
+        self.heading = math.atan2(dy, dx)
+        self.x += dx / distance * travel
+        self.y += dy / distance * travel
+
+    def _move(self, distance: float):
+        x = self.x + math.cos(self.heading) * distance
+        y = self.y + math.sin(self.heading) * distance
+        # Bounce off the map edges
+        if not 0 <= x <= self.map_size:
+            self.heading = math.pi - self.heading
+            x = min(max(x, 0.0), self.map_size)
+        if not 0 <= y <= self.map_size:
+            self.heading = -self.heading
+            y = min(max(y, 0.0), self.map_size)
+        self.x, self.y = x, y
+
+    # ---------------- Reporting ----------------
+
+    async def report_location(self, interval: float, stop_at: Optional[float] = None):
+        """Move every interval seconds until stop_at (loop time), publishing the position"""
+        loop = asyncio.get_running_loop()
+        # Spread units over the interval so updates do not arrive in lockstep
+        await asyncio.sleep(self.rng.uniform(0, interval))
+        next_tick = loop.time()
+        while stop_at is None or loop.time() < stop_at:
+            self.step(interval)
+            await self._publish_location(loop.time())
+            next_tick += interval
+            delay = next_tick - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.late_ticks += 1
+                next_tick = loop.time()
+
+
+    async def _publish_location(self, now: float):
+        location = {"ert_id": self.ert_id, "x": self.x, "y": self.y}
+        if self.reporter is not None:
+            report = self.reporter.sample(self.x, self.y, now)
+            if report is None:
+                return
+            location["vx"], location["vy"] = report["vx"], report["vy"]
+        location["sent_at"] = time.time()
+        await self.comms.publish("location", location)
+        self.locations_sent += 1
+
+
+class Simulator:
+    """Fleet of virtual units sharing one event loop"""
+
+    def __init__(self, count: int, seed: int = 0, id_prefix: str = "SIM", **unit_options):
+        """
+        Args:
+            count: Number of virtual units
+            seed: Seed for the whole fleet; unit i uses seed + i
+            id_prefix: Prefix of the generated unit IDs
+            **unit_options: Passed to every VirtualUnit
+        """
+        self.units: List[VirtualUnit] = [
+            VirtualUnit(f"{id_prefix}-{i:05d}", random.Random(seed + i), **unit_options)
+            for i in range(count)
+        ]
+
+    async def start(self):
+        """Connect all units, in batches so the hub's accept queue is not flooded"""
+        for i in range(0, len(self.units), CONNECT_BATCH):
+            await asyncio.gather(*(unit.start() for unit in self.units[i:i + CONNECT_BATCH]))
+
+    async def run(self, report_interval: float, duration: Optional[float] = None):
+        """Report locations until duration seconds have passed (forever if None)"""
+        loop = asyncio.get_running_loop()
+        stop_at = loop.time() + duration if duration else None
+        await asyncio.gather(*(unit.report_location(report_interval, stop_at) for unit in self.units))
+
+    async def stop(self):
+        await asyncio.gather(*(unit.stop() for unit in self.units), return_exceptions=True)
+
+    def summary(self) -> dict:
+        return {
+            "units": len(self.units),
+            "dispatched": sum(1 for unit in self.units if unit.status == "dispatched"),
+            "locations_sent": sum(unit.locations_sent for unit in self.units),
+            "locations_suppressed": sum(unit.reporter.suppressed for unit in self.units if unit.reporter),
+            "resolutions_sent": sum(unit.resolutions_sent for unit in self.units),
+            "late_ticks": sum(unit.late_ticks for unit in self.units),
+        }
+
+
+async def log_summary(simulator: Simulator, every: float):
+    while True:
+        await asyncio.sleep(every)
+        logger.info("Simulator status", extra=simulator.summary())
+
+
+async def main(args):
+    simulator = Simulator(
+        args.units,
+        seed=args.seed,
+        id_prefix=args.prefix,
+        hub_url=args.hub,
+        patrol_speed=args.patrol_speed,
+        response_speed=args.response_speed,
+        on_scene=(args.on_scene_min, args.on_scene_max),
+        adaptive=args.adaptive
+    )
+    started = time.perf_counter()
+    await simulator.start()
+    logger.info(f"🚑 {args.units} virtual units connected in {time.perf_counter() - started:.1f}s")
+
+    status_task = asyncio.create_task(log_summary(simulator, args.status_every))
+    try:
+        await simulator.run(args.report_interval, args.duration)
+    finally:
+        status_task.cancel()
+        logger.info("Simulator finished", extra=simulator.summary())
+        await simulator.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many virtual ERT units in one process")
+    parser.add_argument("--units", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prefix", default="SIM", help="Unit ID prefix")
+    parser.add_argument("--hub", default=DEFAULT_HUB_URL)
+    parser.add_argument("--report-interval", type=float, default=5.0, help="Seconds between location reports")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Treat --report-interval as the GPS sample period and send on delta")
+    parser.add_argument("--patrol-speed", type=float, default=8.0)
+    parser.add_argument("--response-speed", type=float, default=20.0)
+    parser.add_argument("--on-scene-min", type=float, default=5.0)
+    parser.add_argument("--on-scene-max", type=float, default=20.0)
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--status-every", type=float, default=10.0, help="Seconds between status log lines")
+    args = parser.parse_args()
+
+    setup_logging("ert-simulator")
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        pass
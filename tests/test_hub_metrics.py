@@ -0,0 +1,69 @@
+"""Tests for the label values of the hub metrics"""
+
+import asyncio
+
+import pytest
+
+from communication.priority import PriorityOutbox
+from control_room import hub_server
+
+
+class NullSocket:
+    async def send(self, frame):
+        pass
+
+
+@pytest.fixture
+def subscribers():
+    """Subscribers of a known and an unknown topic, with a known and an unknown client type"""
+    sockets = [NullSocket(), NullSocket()]
+    hub_server.client_info[sockets[0]] = {"type": "ert", "id": "ERT-1"}
+    hub_server.client_info[sockets[1]] = {"type": "made-up", "id": "X-1"}
+    for topic in ("location", "made-up-topic"):
+        hub_server.subscriptions[topic] = set(sockets)
+
+    async def attach():
+        for socket in sockets:
+            hub_server.outboxes[socket] = PriorityOutbox(socket.send)
+    asyncio.run(attach())
+    yield sockets
+    for socket in sockets:
+        hub_server.client_info.pop(socket, None)
+        hub_server.outboxes.pop(socket, None)
+    for topic in ("location", "made-up-topic"):
+        hub_server.subscriptions.pop(topic, None)
+
+
+def test_labels():
+    assert hub_server.topic_label("incident") == "incident"
+    assert hub_server.topic_label("x" * 1000) == "other"
+    assert hub_server.topic_label(None) == "None"
+    assert hub_server.client_type_label("cr") == "cr"
+    assert hub_server.client_type_label(None) == "unregistered"
+    assert hub_server.client_type_label("x" * 1000) == "other"
+
+
+def test_fan_out_labels_unknown_topics_and_client_types_as_other(subscribers):
+    before = hub_server.MESSAGES_OUT.samples()
+
+    async def publish():
+        await hub_server.fan_out("location", '{"topic":"location"}')
+        await hub_server.fan_out("made-up-topic", '{"topic":"made-up-topic"}')
+    asyncio.run(publish())
+
+    after = hub_server.MESSAGES_OUT.samples()
+    added = {labels: value - before.get(labels, 0) for labels, value in after.items()
+             if value != before.get(labels, 0)}
+    assert added == {
+        ("location", "ert"): 1,
+        ("location", "other"): 1,
+        ("other", "ert"): 1,
+        ("other", "other"): 1,
+    }
+
+
+def test_subscriber_gauge_groups_unknown_topics(subscribers):
+    counts = hub_server._by_topic((topic, len(sockets)) for topic, sockets in hub_server.subscriptions.items())
+    assert counts[("location",)] == 2
+    assert counts[("other",)] >= 2
+    assert ("made-up-topic",) not in counts
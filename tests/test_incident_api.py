@@ -0,0 +1,82 @@
+"""Tests for the Control Room incident endpoints on archived incidents"""
+
+import datetime
+
+import pytest
+from flask import Flask
+
+from communication.serialization import install_json_provider
+from control_room.api.incident_api import init_control_room_api
+from control_room.model.incident import IncidentStatus
+from control_room.repository.cold_incident_store import ColdIncidentStore
+from control_room.repository.in_memory_incident_repository import InMemoryIncidentRepository
+from control_room.service.incident_service import IncidentService
+
+
+@pytest.fixture
+def repository(tmp_path):
+    return InMemoryIncidentRepository(cold_store=ColdIncidentStore(str(tmp_path)))
+
+
+@pytest.fixture
+def client(repository):
+    app = Flask(__name__)
+    install_json_provider(app)
+    service = IncidentService(repository, communication_channel=None)
+    app.register_blueprint(init_control_room_api(service, unit_service=None), url_prefix='/cr')
+    return app.test_client()
+
+
+def archived_incident(repository: InMemoryIncidentRepository) -> str:
+    """Create a resolved incident and move it to the cold store"""
+    incident = IncidentService(repository, communication_channel=None).create_incident(1.0, 2.0)
+    incident.status = IncidentStatus.RESOLVED
+    incident.resolved_at = datetime.datetime.utcnow() - datetime.timedelta(hours=2)
+    repository.update(incident)
+    assert repository.archive_resolved(datetime.datetime.utcnow()) == 1
+    return incident.id
+
+
+def test_get_archived_incident(client, repository):
+    incident_id = archived_incident(repository)
+
+    response = client.get(f'/cr/incidents/{incident_id}')
+
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'resolved'
+
+
+def test_update_archived_incident_conflicts(client, repository):
+    incident_id = archived_incident(repository)
+
+    response = client.put(f'/cr/incidents/{incident_id}', json={'x': 5.0, 'y': 6.0})
+
+    assert response.status_code == 409
+    assert response.get_json()['error'] == 'Incident archived'
+    assert repository.get_by_id(incident_id).x == 1.0
+
+
+def test_delete_archived_incident_conflicts(client, repository):
+    incident_id = archived_incident(repository)
+
+    response = client.delete(f'/cr/incidents/{incident_id}')
+
+    assert response.status_code == 409
+    assert response.get_json()['error'] == 'Incident archived'
+    assert repository.get_by_id(incident_id) is not None
+
+
+def test_update_and_delete_unknown_incident(client):
+    assert client.put('/cr/incidents/missing', json={'x': 5.0, 'y': 6.0}).status_code == 404
+    assert client.delete('/cr/incidents/missing').status_code == 404
+
+
+def test_update_and_delete_live_incident(client, repository):
+    incident = IncidentService(repository, communication_channel=None).create_incident(1.0, 2.0)
+
+    response = client.put(f'/cr/incidents/{incident.id}', json={'x': 5.0, 'y': 6.0})
+    assert response.status_code == 200
+    assert response.get_json()['x'] == 5.0
+
+    assert client.delete(f'/cr/incidents/{incident.id}').status_code == 200
+    assert repository.get_by_id(incident.id) is None
@@ -0,0 +1,214 @@
+"""Tests for at-least-once (QoS 1) delivery: acks, retries, dedup and resume"""
+
+import asyncio
+import json
+import time
+
+import pytest
+import websockets
+
+from communication.qos import CRITICAL_TOPICS, DedupWindow
+from communication.websocket_communication import WebSocketCommunication
+from control_room import hub_server
+from control_room.hub.delivery import DeliveryTracker, DepartedSubscribers
+
+
+def test_dedup_window_evicts_by_size():
+    window = DedupWindow(max_size=2)
+    window.add("a")
+    assert "a" in window and "b" not in window
+    window.add("b")
+    window.add("c")
+    assert "c" in window
+    assert "a" not in window
+
+
+def test_departed_subscribers_expire_after_the_window():
+    departed = DepartedSubscribers(window=0.05)
+    departed.add("ERT-1", ["incident"])
+    assert departed.keys("incident") == ["ERT-1"]
+    departed.discard("ERT-1", "incident")
+    assert departed.keys("incident") == []
+
+    departed.add("ERT-2", ["incident"])
+    asyncio.run(asyncio.sleep(0.1))
+    assert departed.keys("incident") == []
+
+
+def run_tracker(acks, max_attempts=3):
+    """Track one message to two recipients; acks maps recipient -> attempt it acks on"""
+    sent = []
+
+    async def main():
+        tracker = None
+
+        async def send(key, frame):
+            sent.append((key, frame))
+            if key in acks and sum(1 for k, _ in sent if k == key) == acks[key]:
+                await tracker.ack("m1", key)
+            return True
+
+        tracker = DeliveryTracker(send, retry_interval=0.01, max_attempts=max_attempts)
+        # Tracked before the fan-out, as the hub does, so no early ack is missed
+        await tracker.track("m1", "frame", "CR", ["ERT-1", "ERT-2"])
+        for recipient in ("ERT-1", "ERT-2"):
+            await send(recipient, "frame")
+        while tracker.in_flight:
+            await asyncio.sleep(0.01)
+        return tracker
+
+    asyncio.run(main())
+    reports = [json.loads(frame) for key, frame in sent if key == "CR"]
+    resends = {key: sum(1 for k, _ in sent if k == key) for key in ("ERT-1", "ERT-2")}
+    return reports, resends
+
+
+def test_tracker_retries_until_acked():
+    # ERT-1 acks the fan-out itself, ERT-2 only the second retry
+    reports, resends = run_tracker({"ERT-1": 1, "ERT-2": 3})
+    assert resends == {"ERT-1": 1, "ERT-2": 3}
+    assert len(reports) == 1
+    assert sorted(reports[0]["delivered"]) == ["ERT-1", "ERT-2"] and reports[0]["failed"] == []
+
+
+def test_tracker_reports_silent_recipients_as_failed():
+    reports, resends = run_tracker({"ERT-1": 1}, max_attempts=3)
+    assert resends == {"ERT-1": 1, "ERT-2": 3}
+    assert reports == [{"type": "delivery", "msg_id": "m1", "delivered": ["ERT-1"], "failed": ["ERT-2"]}]
+
+
+class RecordingOutbox:
+    def __init__(self):
+        self.frames = []
+
+    def put(self, frame, priority):
+        self.frames.append(json.loads(frame))
+        return True
+
+
+class RecordingExecutor:
+    def __init__(self):
+        self.payloads = []
+
+    async def submit(self, topic, callbacks, payload, on_result):
+        self.payloads.append(payload)
+
+
+@pytest.fixture
+def receiver():
+    channel = WebSocketCommunication(qos_topics=CRITICAL_TOPICS)
+    channel._outbox = RecordingOutbox()
+    channel.executor = RecordingExecutor()
+    channel.subscriptions["incident"] = [lambda payload: None]
+    channel.last_seq["incident"] = 5
+    return channel
+
+
+def acked(channel):
+    return [frame["msg_id"] for frame in channel._outbox.frames if frame["type"] == "ack"]
+
+
+def test_receiver_handles_then_acks(receiver):
+    frame = {"type": "message", "topic": "incident", "seq": 6, "msg_id": "m6", "payload": {"id": "I"}}
+    asyncio.run(receiver._dispatch(frame))
+
+    assert receiver.executor.payloads == [{"id": "I"}]
+    assert acked(receiver) == ["m6"]
+    assert receiver.last_seq["incident"] == 6
+
+
+def test_receiver_acks_a_retry_again_without_handling_it(receiver):
+    frame = {"type": "message", "topic": "incident", "seq": 6, "msg_id": "m6", "payload": {"id": "I"}}
+
+    async def deliver_twice():
+        await receiver._dispatch(frame)
+        await receiver._dispatch(dict(frame))  # retry: the first ack was lost
+    asyncio.run(deliver_twice())
+
+    assert receiver.executor.payloads == [{"id": "I"}]
+    assert acked(receiver) == ["m6", "m6"]
+
+
+def test_receiver_never_acks_a_stale_frame_it_did_not_handle(receiver):
+    frame = {"type": "message", "topic": "incident", "seq": 4, "msg_id": "m4", "payload": {"id": "I"}}
+    asyncio.run(receiver._dispatch(frame))
+
+    assert receiver.executor.payloads == []
+    assert acked(receiver) == []
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    """Short QoS retries on the hub, with a tracker of its own for the test's event loop"""
+    tracker = DeliveryTracker(hub_server.send_to_client, retry_interval=0.2, max_attempts=3)
+    monkeypatch.setattr(hub_server, "delivery_tracker", tracker)
+    monkeypatch.setattr(hub_server, "departed", DepartedSubscribers(0.6))
+
+
+async def start_hub():
+    server = await websockets.serve(hub_server.handler, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, f"ws://127.0.0.1:{port}"
+
+
+def test_reconnecting_subscriber_gets_the_message_once(hub):
+    async def main():
+        server, url = await start_hub()
+        received = []
+
+        async def on_resolution(payload):
+            received.append(payload)
+
+        subscriber = WebSocketCommunication(qos_topics=CRITICAL_TOPICS, reconnect_base_delay=0.05)
+        await subscriber.connect(url, client_type="cr", client_id="CR-TEST")
+        await subscriber.subscribe("resolution", on_resolution)
+        publisher = WebSocketCommunication(qos_topics=CRITICAL_TOPICS)
+        await publisher.connect(url, client_type="ert", client_id="ERT-TEST")
+        await asyncio.sleep(0.2)
+
+        # The subscriber drops and takes a while to come back
+        reopen = subscriber._open
+
+        async def slow_open():
+            await asyncio.sleep(0.3)
+            await reopen()
+        subscriber._open = slow_open
+        subscriber.connection.transport.abort()
+        await asyncio.sleep(0.05)
+
+        delivered = await publisher.publish("resolution", {"ert_id": "ERT-TEST"})
+        await asyncio.sleep(0.5)  # leave time for retries of the same message
+        await subscriber.disconnect()
+        await publisher.disconnect()
+        server.close()
+        await server.wait_closed()
+        return delivered, received
+
+    delivered, received = asyncio.run(main())
+    assert delivered is True
+    assert received == [{"ert_id": "ERT-TEST"}]
+
+
+def test_publish_fails_once_the_subscriber_is_gone_for_good(hub):
+    async def main():
+        server, url = await start_hub()
+        subscriber = WebSocketCommunication(qos_topics=CRITICAL_TOPICS)
+        await subscriber.connect(url, client_type="cr", client_id="CR-GONE")
+        await subscriber.subscribe("resolution", lambda payload: None)
+        publisher = WebSocketCommunication(qos_topics=CRITICAL_TOPICS)
+        await publisher.connect(url, client_type="ert", client_id="ERT-GONE")
+        await asyncio.sleep(0.2)
+        await subscriber.disconnect()
+        await asyncio.sleep(0.1)
+
+        started = time.monotonic()
+        delivered = await publisher.publish("resolution", {"ert_id": "ERT-GONE"})
+        elapsed = time.monotonic() - started
+        await publisher.disconnect()
+        server.close()
+        await server.wait_closed()
+        return delivered, elapsed
+
+    delivered, elapsed = asyncio.run(main())
+    assert delivered is False
+    assert elapsed < 5.0  # reported by the hub after its retries, not a publisher timeout
@@ -0,0 +1,53 @@
+"""Tests for the hub traffic log"""
+
+import struct
+
+from control_room.hub.recorder import TrafficLog, TrafficRecorder
+
+
+def test_round_trip_long_client_id_and_topic(tmp_path):
+    path = str(tmp_path / "traffic.log")
+    client_id = "c" * 70000
+    topic = "t" * 70000
+    recorder = TrafficRecorder(path)
+    recorder.record(1.5, 3, client_id, topic, '{"type": "publish"}')
+    recorder.record(2.5, 4, None, None, b"raw")
+    recorder.close()
+
+    with TrafficLog(path) as log:
+        frames = list(log)
+
+    assert recorder.records == 2 and recorder.failures == 0
+    assert [(f.timestamp, f.connection, f.client_id, f.topic) for f in frames] == [
+        (1.5, 3, client_id, topic), (2.5, 4, "", "")
+    ]
+    assert frames[0].frame == b'{"type": "publish"}'
+    assert frames[1].frame == b"raw"
+
+
+def test_unrecordable_frame_is_skipped(tmp_path):
+    path = str(tmp_path / "traffic.log")
+    recorder = TrafficRecorder(path)
+    recorder.record(1.0, 1, "ERT-1", "location", "ok")
+    recorder.record(1.0, -1, "ERT-1", "location", "negative connection number")
+    recorder.close()
+
+    with TrafficLog(path) as log:
+        assert [f.frame for f in log] == [b"ok"]
+    assert recorder.failures == 1
+
+
+def test_first_version_log(tmp_path):
+    path = tmp_path / "traffic.log"
+    record = struct.Struct("<dIHHI")
+    path.write_bytes(b"STJREC01" + record.pack(1.0, 7, 5, 8, 2) + b"ERT-1" + b"location" + b"{}")
+
+    with TrafficLog(str(path)) as log:
+        frames = list(log)
+    assert [(f.connection, f.client_id, f.topic, f.frame) for f in frames] == [(7, "ERT-1", "location", b"{}")]
+
+    # Not appended to: moved aside, and a new log is started
+    TrafficRecorder(str(path)).close()
+    assert (tmp_path / "traffic.log.v1").exists()
+    with TrafficLog(str(path)) as log:
+        assert list(log) == []
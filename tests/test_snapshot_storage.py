@@ -0,0 +1,105 @@
+"""Tests for SnapshotStorage and the repositories reading it without a lock"""
+
+import threading
+
+from control_room.model.incident import Incident
+from control_room.repository.in_memory_incident_repository import InMemoryIncidentRepository
+from control_room.repository.snapshot_storage import SnapshotStorage
+
+
+def test_snapshot_is_reused_until_the_entities_change():
+    storage = SnapshotStorage()
+    first, second = object(), object()
+    with storage.write_lock:
+        storage.put("a", first)
+    snapshot = storage.snapshot()
+
+    with storage.write_lock:
+        storage.put("a", first)  # same object again: nothing changed
+    assert storage.snapshot() is snapshot
+
+    with storage.write_lock:
+        storage.put("b", second)
+    assert storage.snapshot() == (first, second)
+    assert snapshot == (first,)  # the old snapshot never changes
+
+    with storage.write_lock:
+        assert storage.pop("a")
+        assert not storage.pop("a")
+    assert storage.snapshot() == (second,)
+
+
+def test_snapshots_stay_consistent_under_concurrent_writes():
+    """Readers only ever see a state the writer went through: IDs 0..k, in order"""
+    storage = SnapshotStorage()
+    count = 5000
+    done = threading.Event()
+    errors = []
+
+    def write():
+        try:
+            for number in range(count):
+                with storage.write_lock:
+                    storage.put(str(number), number)
+        finally:
+            done.set()
+
+    def read():
+        while not done.is_set():
+            values = storage.snapshot()
+            if list(values) != list(range(len(values))):
+                errors.append(values)
+                return
+
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    writer = threading.Thread(target=write)
+    for thread in readers + [writer]:
+        thread.start()
+    for thread in readers + [writer]:
+        thread.join()
+
+    assert not errors
+    assert list(storage.snapshot()) == list(range(count))
+
+
+def test_repository_reads_during_concurrent_updates_and_deletes():
+    repository = InMemoryIncidentRepository()
+    incidents = [repository.create(Incident(x=float(number), y=0.0)) for number in range(200)]
+    done = threading.Event()
+    errors = []
+
+    def update():
+        try:
+            for rounds in range(20):
+                for incident in incidents:
+                    incident.y = float(rounds)
+                    try:
+                        repository.update(incident)
+                    except ValueError:
+                        pass  # deleted meanwhile
+        finally:
+            done.set()
+
+    def delete():
+        for incident in incidents[::2]:
+            repository.delete(incident.id)
+
+    def read():
+        while not done.is_set():
+            for incident in repository.get_all():
+                found = repository.get_by_id(incident.id)
+                if found is not None and found.id != incident.id:
+                    errors.append((incident.id, found.id))
+            if any(incident is None for incident in repository.get_all()):
+                errors.append("None in snapshot")
+
+    threads = [threading.Thread(target=read) for _ in range(2)]
+    threads += [threading.Thread(target=delete)]
+    updater = threading.Thread(target=update)
+    for thread in threads + [updater]:
+        thread.start()
+    for thread in threads + [updater]:
+        thread.join()
+
+    assert not errors
+    assert {incident.id for incident in repository.get_all()} == {incident.id for incident in incidents[1::2]}
@@ -0,0 +1,137 @@
+"""Tests for the incident time indexes and the repository keeping them current"""
+
+import datetime
+import sys
+import threading
+
+from control_room.model.incident import Incident, IncidentStatus
+from control_room.repository.cold_incident_store import ColdIncidentStore, epoch
+from control_room.repository.in_memory_incident_repository import InMemoryIncidentRepository
+from control_room.repository.time_index import TimeIndex
+
+HOUR = datetime.timedelta(hours=1)
+
+
+def test_time_index_add_move_remove():
+    index = TimeIndex()
+    index.add("b", 20.0)
+    index.add("a", 10.0)
+    index.add("c", 20.0)
+
+    assert index.between() == ["a", "b", "c"]
+    assert index.between(10.0, 20.0) == ["a"]
+    assert index.count(20.0) == 2
+
+    index.add("a", 30.0)  # moved, not duplicated
+    assert index.between() == ["b", "c", "a"]
+    assert len(index) == 3 and index.get("a") == 30.0
+
+    assert index.remove("b")
+    assert not index.remove("b")
+    assert index.between() == ["c", "a"]
+    assert "b" not in index
+
+
+def resolve(repository: InMemoryIncidentRepository, incident: Incident, resolved_at: datetime.datetime):
+    incident.status = IncidentStatus.RESOLVED
+    incident.resolved_at = resolved_at
+    repository.update(incident)
+
+
+def test_update_refreshes_the_indexes():
+    repository = InMemoryIncidentRepository()
+    incident = repository.create(Incident(x=1.0, y=2.0))
+    now = datetime.datetime.utcnow()
+    assert repository.get_by_resolved_range() == []
+
+    resolve(repository, incident, now)
+    assert repository.get_by_resolved_range(now - HOUR, now + HOUR) == [incident]
+
+    incident.resolved_at = now - 2 * HOUR  # moved back in time
+    repository.update(incident)
+    assert repository.get_by_resolved_range(now - HOUR, now + HOUR) == []
+    assert repository.get_by_resolved_range(now - 3 * HOUR, now - HOUR) == [incident]
+
+    incident.created_at = now - 5 * HOUR
+    repository.update(incident)
+    assert repository.get_by_time_range(now - 6 * HOUR, now - 4 * HOUR) == [incident]
+    assert repository.get_by_time_range(now - HOUR) == []
+
+    incident.resolved_at = None  # reopened
+    repository.update(incident)
+    assert repository.get_by_resolved_range() == []
+
+
+def test_update_with_a_replaced_object_refreshes_the_indexes():
+    repository = InMemoryIncidentRepository()
+    stored = repository.create(Incident(x=1.0, y=2.0))
+    now = datetime.datetime.utcnow()
+    replacement = Incident(x=3.0, y=4.0, id=stored.id, created_at=stored.created_at,
+                           status=IncidentStatus.RESOLVED, resolved_at=now)
+
+    repository.update(replacement)
+
+    assert repository.get_by_resolved_range(now - HOUR, now + HOUR) == [replacement]
+
+
+def test_delete_removes_the_index_rows():
+    repository = InMemoryIncidentRepository()
+    incident = repository.create(Incident(x=1.0, y=2.0))
+    resolve(repository, incident, datetime.datetime.utcnow())
+
+    assert repository.delete(incident.id)
+
+    assert repository.get_by_time_range() == []
+    assert repository.get_by_resolved_range() == []
+    assert incident.id not in repository._created and incident.id not in repository._resolved
+
+
+def test_archive_moves_incidents_out_of_the_indexes(tmp_path):
+    repository = InMemoryIncidentRepository(cold_store=ColdIncidentStore(str(tmp_path)))
+    now = datetime.datetime.utcnow()
+    old = repository.create(Incident(x=1.0, y=2.0))
+    recent = repository.create(Incident(x=3.0, y=4.0))
+    resolve(repository, old, now - 2 * HOUR)
+    resolve(repository, recent, now)
+
+    assert repository.archive_resolved(now - HOUR) == 1
+
+    assert old.id not in repository._created and old.id not in repository._resolved
+    assert recent.id in repository._resolved
+    # Found once, from the cold store, alongside the in-memory one
+    found = repository.get_by_resolved_range(now - 3 * HOUR, now + HOUR)
+    assert [incident.id for incident in found] == [old.id, recent.id]
+    assert [incident.id for incident in repository.get_by_time_range()] == [old.id, recent.id]
+    assert epoch(found[0].resolved_at) == epoch(old.resolved_at)
+
+
+def test_concurrent_update_and_delete_leave_no_stale_rows():
+    repository = InMemoryIncidentRepository()
+    now = datetime.datetime.utcnow()
+    incidents = [repository.create(Incident(x=float(number), y=0.0)) for number in range(500)]
+
+    def update():
+        for incident in incidents:
+            incident.resolved_at = now
+            try:
+                repository.update(incident)
+            except ValueError:
+                pass  # deleted first
+
+    def delete():
+        for incident in incidents:
+            repository.delete(incident.id)
+
+    threads = [threading.Thread(target=update), threading.Thread(target=delete)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads often, so the two really interleave
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert len(repository._created) == 0
+    assert len(repository._resolved) == 0